@@ -613,18 +613,20 @@ model += pl.lpSum([C_Eij[i, j] * x[i, j] for i in range(1, 4) for j in range(1,
 
 # ---------------------------------------------------------------
 # **Resolver el modelo**
-status = model.solve()
-
-# **Verificar el estado del modelo antes de acceder a la solución**
-print("Status:", pl.LpStatus[model.status])
-
-# **Si la solución es óptima, mostrar los resultados**
-if pl.LpStatus[model.status] == "Optimal":
-    # Imprimir los valores de las variables
-    for v in model.variables():
-        print(v.name, "=", v.varValue)
-
-    # Mostrar el valor de la función objetivo
-    print("Total Cost of Water Supply = ", pl.value(model.objective))
-else:
-    print("No se encontró una solución óptima.")
\ No newline at end of file
+# (solo al ejecutar el script; importarlo construye el modelo sin resolverlo)
+if __name__ == "__main__":
+    status = model.solve()
+
+    # **Verificar el estado del modelo antes de acceder a la solución**
+    print("Status:", pl.LpStatus[model.status])
+
+    # **Si la solución es óptima, mostrar los resultados**
+    if pl.LpStatus[model.status] == "Optimal":
+        # Imprimir los valores de las variables
+        for v in model.variables():
+            print(v.name, "=", v.varValue)
+
+        # Mostrar el valor de la función objetivo
+        print("Total Cost of Water Supply = ", pl.value(model.objective))
+    else:
+        print("No se encontró una solución óptima.")
\ No newline at end of file
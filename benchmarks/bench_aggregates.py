@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: shared aggregates (``build_model(aggregates=True)``) vs. dense rows.
+
+For each size reports the nonzeros and objective terms, the time of
+``build_model`` (including the sharing pass), of ``to_pulp`` (the PuLP
+expressions the script builds, where every term is a Python object) and
+of a HiGHS solve, with and without shared aggregates, and checks that
+the objectives agree.
+
+Usage: python benchmarks/bench_aggregates.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_model as wm  # noqa: E402
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return out, min(times)
+
+
+def run(label, params, equity, repeat, with_pulp=True):
+    rows = []
+    for aggregates in (False, True):
+        compiled, t_build = best(lambda: wm.build_model(params, equity=equity, aggregates=aggregates), repeat)
+        t_pulp = best(lambda: wm.to_pulp(compiled), min(repeat, 3))[1] if with_pulp else np.nan
+        result, t_solve = best(lambda: wm.solve(compiled, backend="highs"), repeat)
+        rows.append((compiled.nnz, np.count_nonzero(compiled.c), t_build, t_pulp, t_solve, result["objective"]))
+    (nnz0, obj0, b0, p0, s0, f0), (nnz1, obj1, b1, p1, s1, f1) = rows
+    print("%-16s %9d %9d %9d %9d %8.2f %8.2f %8.1f %8.1f %8.1f %8.1f %9.1e" % (
+        label, nnz0, nnz1, obj0, obj1, b0 * 1e3, b1 * 1e3, p0 * 1e3, p1 * 1e3, s0 * 1e3, s1 * 1e3,
+        abs(f1 - f0) / max(1.0, abs(f0))))
+
+
+def main():
+    wm.to_pulp(wm.build_model())  # import PuLP outside the timings
+    print("%-16s %19s %19s %17s %17s %17s %9s" % ("", "nonzeros", "objective terms", "build ms",
+                                                  "to_pulp ms", "HiGHS ms", ""))
+    print("%-16s %9s %9s %9s %9s %8s %8s %8s %8s %8s %8s %9s" % (
+        "case", "dense", "shared", "dense", "shared", "dense", "shared", "dense", "shared", "dense", "shared",
+        "obj gap"))
+    run("3x3", wm.default_parameters(), "pairwise", 20)
+    run("30x30 pairwise", wm.synthetic_parameters(30, 30), "pairwise", 3)
+    run("100x100 common", wm.synthetic_parameters(100, 100), "common", 3)
+    run("300x300 common", wm.synthetic_parameters(300, 300), "common", 1, with_pulp=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: solver backends of ``water_model.solve``.
+
+Times one solve of an already compiled model with CBC through PuLP (MPS
+file + subprocess), in-process HiGHS and ``scipy.optimize.linprog``, and
+checks that the backends agree on status and objective.
+
+Usage: python benchmarks/bench_backends.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_model as wm  # noqa: E402
+
+BACKENDS = ("cbc", "highs", "linprog")
+
+
+def main():
+    cases = [
+        ("3x3", wm.default_parameters(), 50),
+        ("30x30", wm.synthetic_parameters(30, 30), 5),
+        ("100x100", wm.synthetic_parameters(100, 100), 1),
+    ]
+    print("per solve, milliseconds")
+    print("%-8s" % "size" + "".join("%12s" % b for b in BACKENDS) + "   objective")
+    for label, params, repeat in cases:
+        compiled = wm.build_model(params)
+        times = []
+        objectives = set()
+        for backend in BACKENDS:
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                result = wm.solve(compiled, backend=backend)
+            times.append((time.perf_counter() - t0) / repeat)
+            objectives.add("%s %.3f" % (result["status"], result["objective"]))
+        print("%-8s" % label + "".join("%12.2f" % (t * 1e3) for t in times) + "   " + " | ".join(sorted(objectives)))
+
+
+if __name__ == "__main__":
+    main()
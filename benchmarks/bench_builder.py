@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: vectorized model builder vs. the script's dict/lpSum construction.
+
+Times ``water_model.build_model`` on the shipped 3x3 instance and on
+synthetic 100x100 and 1000x1000 networks, next to the construction style of
+CODE-JCR-WATER-V7-B-25.py (tuple-keyed dicts and one ``pl.lpSum`` per
+constraint) where that is still tractable.
+
+At 1000x1000 the pairwise equity block of condition 28 alone has
+M*(M-1)*2N = 2e9 nonzeros, so that size uses the linear-size
+``equity="common"`` formulation.
+
+Usage: python benchmarks/bench_builder.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_model as wm  # noqa: E402
+
+
+def build_lpsum(p):
+    """Dict/lpSum construction as in the script, generalized to N x M."""
+    import pulp as pl
+
+    n, m = len(p["A"]), len(p["D"])
+    I = range(1, n + 1)
+    J = range(1, m + 1)
+    tab = {k: {(i, j): p[k][i - 1, j - 1] for i in I for j in J}
+           for k in ("Aij", "Tr", "L", "ENij", "Sij", "tij", "Qij", "C_Eij")}
+    vec = {k: {i: p[k][i - 1] for i in I} for k in ("Cij", "COij", "CEij", "CMij", "CENij", "A")}
+    A, Cij, COij, CEij, CMij, CENij = (vec[k] for k in ("A", "Cij", "COij", "CEij", "CMij", "CENij"))
+    D = {j: p["D"][j - 1] for j in J}
+    Dijmax = {j: p["Dijmax"][j - 1] for j in J}
+    last = m
+
+    model = pl.LpProblem("Water_Management", pl.LpMinimize)
+    x = pl.LpVariable.dicts("x", [(i, j) for i in I for j in J], lowBound=0, cat='Continuous')
+    cost = pl.lpSum([Cij[i] * x[i, j] + COij[i] * x[i, j] + CEij[i] * x[i, j] + CMij[i] * x[i, j]
+                     + CENij[i] * x[i, j] for i in I for j in J])
+    model += cost, "Total_Cost"
+    for i in I:
+        model += pl.lpSum([x[i, j] for j in J]) <= A[i], f"Water_Availability_Source_{i}"
+    for j in J:
+        model += pl.lpSum([x[i, j] for i in I]) >= D[j], f"Sector_Demand_{j}"
+    model += pl.lpSum([x[i, j] for i in I for j in J]) <= p["Ct"], "Treatment_Capacity"
+    model += pl.lpSum([Cij[i] * x[i, j] + COij[i] * x[i, j] + CEij[i] * x[i, j] + CMij[i] * x[i, j]
+                       + CENij[i] * x[i, j] for i in I for j in J]) <= p["B"], "Max_Budget"
+    model += pl.lpSum([x[i, j] * tab["Aij"][i, j] for i in I for j in J]) <= p["Amax"], "Protection_Aquifers"
+    model += pl.lpSum([x[i, j] * tab["Tr"][i, j] for i in I for j in J]) <= \
+        p["Cinfra"] * pl.lpSum([x[i, j] for i in I for j in J]), "Infrastructure_Capacity"
+    model += pl.lpSum([x[i, j] for i in I for j in J]) >= p["R_drought"], "Resilience_Droughts"
+    model += pl.lpSum([x[i, last] for i in I]) <= p["R_strategic"], "Maintenance_Strategic_Reserves"
+    for i in I:
+        for j in J:
+            model += x[i, j] <= p["L_norm"], f"Compliance_Local_Regulations_{i}_{j}"
+    model += pl.lpSum([x[i, j] for i in I for j in J]) >= p["B_hidro"], "Water_Balance"
+    for j in J:
+        for k in J:
+            if j != k:
+                model += (pl.lpSum([x[i, j] for i in I]) / D[j]) >= \
+                         (pl.lpSum([x[i, k] for i in I]) / D[k]), f"Equitable_Distribution_Scarcity_{j}_{k}"
+    model += pl.lpSum([tab["L"][i, j] * x[i, j] for i in I for j in J]) <= \
+        p["L_max"] * pl.lpSum([x[i, j] for i in I for j in J]), "Minimize_Leak_Losses"
+    model += pl.lpSum([x[i, j] for i in I for j in J]) <= p["E_safe"], "Aquatic_Ecosystem_Protection"
+    model += pl.lpSum([CEij[i] * x[i, j] for i in I for j in J]) <= p["Emax"], "Environmental_Sustainability"
+    for j in range(1, m):
+        model += pl.lpSum([x[i, j] for i in I]) / D[j] == \
+            pl.lpSum([x[i, j + 1] for i in I]) / D[j + 1], f"Equity_Distribution_{j}_{j + 1}"
+    model += pl.lpSum([tab["ENij"][i, j] * x[i, j] for i in I for j in J]) <= p["ENlim"], "Energy_Efficiency"
+    grey = p["greywater_sources"]
+    rain = p["stormwater_sources"]
+    model += pl.lpSum([x[i, j] for i in grey for j in J]) >= \
+        p["Rmin"] * pl.lpSum([x[i, j] for i in I for j in J]), "Use_of_Wastewater"
+    model += pl.lpSum([x[i, j] for i in p["potable_sources"] for j in J]) <= p["Pmax"], "Limit_Drinking_Water"
+    model += pl.lpSum([x[i, j] for i in rain for j in J]) >= \
+        p["Lmin"] * pl.lpSum([x[i, j] for i in I for j in J]), "Use_of_Rainwater"
+    for j in J:
+        model += pl.lpSum([x[i, j] for i in I]) <= Dijmax[j], f"Max_Daily_Consumption_Sector_{j}"
+    model += pl.lpSum([x[i, j] * tab["Sij"][i, j] for i in I for j in J]) <= p["Smax"], "Storage_Capacity"
+    model += pl.lpSum([tab["tij"][i, j] * x[i, j] for i in I for j in J]) <= p["Treq"], "Delivery_Time_Limit"
+    model += pl.lpSum([tab["Qij"][i, j] * x[i, j] for i in I for j in J]) >= \
+        p["Qmin"] * pl.lpSum([x[i, j] for i in I for j in J]), "Maintaining_Water_Quality"
+    model += pl.lpSum([tab["Qij"][i, j] * x[i, j] for i in I for j in J]) <= p["Q_max"], "Water_Quality_Cost"
+    model += pl.lpSum([tab["C_Eij"][i, j] * x[i, j] for i in I for j in J]) <= p["E_cost_max"], \
+        "Energy_Cost_Optimization"
+    return model
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    cases = [
+        ("3x3", wm.default_parameters(), "pairwise", True),
+        ("100x100", wm.synthetic_parameters(100, 100), "pairwise", True),
+        ("1000x1000", wm.synthetic_parameters(1000, 1000), "common", False),
+    ]
+    print("%-10s %10s %10s %12s %12s %12s" % ("size", "rows", "cols", "nnz", "vectorized", "lpSum"))
+    for label, params, equity, run_lpsum in cases:
+        compiled, t_vec = timed(wm.build_model, params, equity=equity)
+        t_ref = "-"
+        if run_lpsum:
+            _, t = timed(build_lpsum, params)
+            t_ref = "%.3fs" % t
+        print("%-10s %10d %10d %12d %11.3fs %12s" % (
+            label, compiled.n_rows, compiled.n_cols, compiled.nnz, t_vec, t_ref))
+        if equity != "pairwise":
+            print("           (equity=%r)" % equity)
+
+
+if __name__ == "__main__":
+    main()
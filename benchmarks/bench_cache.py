@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: cold solve vs. cache hit with ``water_cache.SolutionCache``.
+
+For each size, times building and solving a model on a miss, then the
+lookup alone (``get`` by key), hashing the compiled model
+(``model_key``) and a full ``build_model`` + ``SolutionCache.solve`` hit.
+
+Usage: python benchmarks/bench_cache.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_cache as wc  # noqa: E402
+import water_model as wm  # noqa: E402
+
+
+def per_call(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    cases = [("3x3", wm.default_parameters()), ("30x30", wm.synthetic_parameters(30, 30)),
+             ("100x100", wm.synthetic_parameters(100, 100))]
+    with tempfile.TemporaryDirectory() as path:
+        cache = wc.SolutionCache(path)
+        print("%-8s %12s %10s %10s %14s" % ("size", "miss", "get", "hash", "build + hit"))
+        for label, params in cases:
+            t0 = time.perf_counter()
+            compiled = wm.build_model(params, equity="common")
+            cache.solve(compiled)
+            miss = time.perf_counter() - t0
+            key = wc.model_key(compiled)
+            get = per_call(lambda: cache.get(key), 10000)
+            digest = per_call(lambda: wc.model_key(compiled), 1000)
+            hit = per_call(lambda: cache.solve(wm.build_model(params, equity="common")), 20)
+            print("%-8s %10.2fms %8.2fus %8.2fus %12.2fms" % (label, miss * 1e3, get * 1e6, digest * 1e6, hit * 1e3))
+        print("hits %d, misses %d, entries %d" % (cache.hits, cache.misses, len(cache)))
+
+
+if __name__ == "__main__":
+    main()
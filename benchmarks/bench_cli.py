@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: cold start of the command-line entry point.
+
+Runs each command in a fresh interpreter and reports the wall time from
+process start to exit (best of ``repeat``): the original script (build
+and CBC solve at import), ``water_cli.py validate`` and
+``water_cli.py solve`` with each backend.
+
+Usage: python benchmarks/bench_cli.py [repeat]
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+COMMANDS = [
+    ("script (import = solve)", ["CODE-JCR-WATER-V7-B-25.py"]),
+    ("water_cli validate", ["water_cli.py", "validate"]),
+    ("water_cli solve cbc", ["water_cli.py", "solve", "--backend", "cbc"]),
+    ("water_cli solve highs", ["water_cli.py", "solve", "--backend", "highs"]),
+    ("water_cli solve linprog", ["water_cli.py", "solve", "--backend", "linprog"]),
+]
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print("%-26s %12s" % ("command", "cold start"))
+    for label, args in COMMANDS:
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable] + args, cwd=ROOT, check=False,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - t0)
+        print("%-26s %10.1fms" % (label, best * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: formulations of the equity conditions 7 and 28 as M grows.
+
+For N = 10 sources and a growing number of sectors M, builds the model with
+``equity="pairwise"`` (the script's O(M^2) rows), ``"common"`` (one common
+service ratio, M rows) and ``"minmax"`` (bounding variables, 2M + 1 rows),
+and reports rows, nonzeros, build and HiGHS solve times and the objective.
+
+Usage: python benchmarks/bench_equity.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_model as wm  # noqa: E402
+
+
+def main():
+    print("%5s %-9s %8s %10s %9s %9s  %s" % ("M", "equity", "rows", "nnz", "build", "solve", "objective"))
+    for m in (10, 30, 100, 300):
+        params = wm.synthetic_parameters(10, m)
+        for equity in wm.EQUITY_FORMULATIONS:
+            t0 = time.perf_counter()
+            compiled = wm.build_model(params, equity=equity)
+            t_build = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            result = wm.solve(compiled, backend="highs")
+            t_solve = time.perf_counter() - t0
+            print("%5d %-9s %8d %10d %8.3fs %8.3fs  %s %.4f" % (
+                m, equity, compiled.n_rows, compiled.nnz, t_build, t_solve, result["status"], result["objective"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: printing results as the script does vs. ``water_export.ResultWriter``.
+
+Writes the same solved 30x30 result K times, once as the script's
+``print(v.name, "=", v.varValue)`` text and once to Parquet and Arrow
+files, and reports wall time, file size and the peak Python heap
+(tracemalloc) of the Parquet writer for two chunk sizes, and the time to
+read every x value back.
+
+Usage: python benchmarks/bench_export.py [scenarios]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_export as we  # noqa: E402
+import water_model as wm  # noqa: E402
+
+
+def write_text(path, compiled, result, k):
+    names = compiled.col_names()
+    with open(path, "w") as f:
+        for s in range(k):
+            out = io.StringIO()
+            for name, value in zip(names, result["values"]):
+                print(name, "=", value, file=out)
+            print("Costo total =", result["objective"], file=out)
+            f.write(out.getvalue())
+
+
+def read_text(path, n_cols):
+    x = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith("x_"):
+                x.append(float(line.rsplit("=", 1)[1]))
+    return np.array(x).reshape(-1, n_cols)
+
+
+def write_columnar(path, compiled, result, k, chunk_size):
+    with we.ResultWriter(path, compiled, chunk_size=chunk_size) as writer:
+        for s in range(k):
+            writer.write(s, result, {"scenario": s})
+
+
+def main():
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    compiled = wm.build_model(wm.synthetic_parameters(30, 30), equity="common")
+    result = wm.solve(compiled, backend="highs")
+    print("%d scenarios, %d columns, %d rows" % (k, compiled.n_cols, compiled.n_rows))
+    print("%-24s %10s %10s %12s %10s" % ("format", "write", "size", "peak heap", "read x"))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.txt")
+        t0 = time.perf_counter()
+        write_text(path, compiled, result, k)
+        wall = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        read_text(path, compiled.shape[0] * compiled.shape[1])
+        read = time.perf_counter() - t0
+        print("%-24s %9.2fs %8.1fMB %12s %9.2fs" % ("text (script)", wall, os.path.getsize(path) / 1e6, "-", read))
+        for ext, chunk_size in ((".parquet", 256), (".parquet", 4096), (".arrow", 1024)):
+            path = os.path.join(tmp, "out%d%s" % (chunk_size, ext))
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            write_columnar(path, compiled, result, k, chunk_size)
+            wall = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            t0 = time.perf_counter()
+            we.read_results(path, columns=["values"])
+            read = time.perf_counter() - t0
+            print("%-24s %9.2fs %8.1fMB %10.1fMB %9.2fs" % (
+                "%s chunk %d" % (ext[1:], chunk_size), wall, os.path.getsize(path) / 1e6, peak / 1e6, read))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: batched vs. one-row-at-a-time deletion filtering for the IIS.
+
+Makes the model infeasible by lowering Smax (storage capacity below the
+demand) and finds an IIS with ``water_iis.find_iis``, once with the
+group-wise filter and, where affordable, with the classic filter.
+
+Usage: python benchmarks/bench_iis.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_iis as wi  # noqa: E402
+import water_model as wm  # noqa: E402
+
+
+def main():
+    cases = [
+        ("3x3", wm.default_parameters(), True),
+        ("30x30", wm.synthetic_parameters(30, 30), True),
+        ("100x100", wm.synthetic_parameters(100, 100), False),
+    ]
+    print("%-8s %7s %-9s %7s %8s %9s" % ("size", "rows", "filter", "iis", "solves", "wall"))
+    for label, params, classic in cases:
+        params = wm.apply_overrides(params, {"Smax": 5000.0})
+        compiled = wm.build_model(params, equity="common")
+        for batched in (True, False) if classic else (True,):
+            t0 = time.perf_counter()
+            result = wi.find_iis(compiled, batched=batched)
+            wall = time.perf_counter() - t0
+            print("%-8s %7d %-9s %7d %8d %8.2fs" % (
+                label, compiled.n_rows, "batched" if batched else "classic", len(result["rows"]),
+                result["solves"], wall))
+        if len(result["names"]) <= 6:
+            print("         " + ", ".join(result["names"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: investment MIP with and without the LP-relaxation seed.
+
+Solves the route-opening model of ``water_investment`` on growing
+synthetic grids, with the LP seed and without it, and for HiGHS with 1
+and ``os.cpu_count()`` threads (``applied`` is the thread count the
+solver reports it was given).  The route budget ``F_max`` is scaled
+with the number of routes (half of the tiled 3x3 budget), since
+``synthetic_parameters`` keeps scalar caps at their 3x3 magnitude.
+Reports status, objective, gap and wall time under a time limit.
+
+Usage: python benchmarks/bench_investment.py [--time-limit SECONDS]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_investment as wi  # noqa: E402
+import water_model as wm  # noqa: E402
+
+
+def params_for(n):
+    if n == 3:
+        return wm.default_parameters()
+    p = wm.synthetic_parameters(n, n)
+    p["F_max"] *= n * n / 9.0 / 2.0
+    return p
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--time-limit", type=float, default=20.0)
+    parser.add_argument("--gap", type=float, default=1e-3)
+    args = parser.parse_args(argv)
+    threads = sorted({1, os.cpu_count() or 1})
+    print("%-6s %-7s %-5s %8s %8s %12s %12s %9s %8s %8s" % ("size", "backend", "seed", "threads", "applied",
+                                                         "objective", "LP bound", "gap", "nodes", "wall s"))
+    for n in (3, 8, 12, 20):
+        model = wi.build_investment(params_for(n))
+        runs = [("highs", True, t) for t in threads] + [("highs", False, threads[-1]), ("cbc", True, threads[-1])]
+        for backend, use_seed, t in runs:
+            r = wi.solve_investment(model, backend=backend, time_limit=args.time_limit, gap=args.gap, threads=t,
+                                    use_seed=use_seed)
+            print("%-6s %-7s %-5s %8d %8d %12.4f %12.4f %9.2e %8d %8.2f %s" % (
+                "%dx%d" % (n, n), backend, use_seed, t, r["threads"], r["objective"], r["relaxation"], r["gap"],
+                r["nodes"], r["wall"], r["status"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Monte Carlo throughput of ``water_montecarlo.monte_carlo``.
+
+Samples A[2], D and R_drought and reports scenarios per second per core
+on one core and on all cores, next to rebuilding and re-solving the
+model for every realization.
+
+Usage: python benchmarks/bench_montecarlo.py [n_samples]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_model as wm  # noqa: E402
+import water_montecarlo as mc  # noqa: E402
+
+
+def rebuild_rate(params, samples, count=100):
+    t0 = time.perf_counter()
+    for s in range(count):
+        p = wm.apply_overrides(params, {name: values[s] for name, values in samples.items()})
+        wm.solve(wm.build_model(p), backend="highs")
+    return count / (time.perf_counter() - t0)
+
+
+def main():
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    cases = [("3x3", wm.default_parameters(), k), ("30x30", wm.synthetic_parameters(30, 30), k // 10)]
+    print("%-6s %8s %10s %8s %14s %12s" % ("size", "samples", "feasible", "cores", "scen/s/core", "rebuild/s"))
+    for label, params, count in cases:
+        samples = mc.sample(params, count)
+        rebuild = rebuild_rate(params, samples, min(100, count))
+        for processes in sorted({1, os.cpu_count() or 1}):
+            result = mc.monte_carlo(params, samples, processes=processes)
+            print("%-6s %8d %9.1f%% %8d %14.1f %12.1f" % (
+                label, count, 100.0 * result["feasible"].mean(), result["processes"], result["per_core"], rebuild))
+    print()
+    print(mc.format_result(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: construction and solve of the 365-day multi-period model.
+
+Builds ``water_multiperiod.build_multiperiod`` over a 365-day horizon for
+the shipped 3x3 network and synthetic 10x10 and 30x30 networks, and solves
+the smaller ones with in-process HiGHS, once with every daily cap enforced
+per day and once with the daily caps aggregated over the year.
+
+Usage: python benchmarks/bench_multiperiod.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_model as wm  # noqa: E402
+import water_multiperiod as mp  # noqa: E402
+
+# Caps given per day in the script
+DAILY_CAPS = ("Storage_Capacity", "Energy_Cost_Optimization", "Environmental_Sustainability",
+              "Max_Daily_Consumption_Sector")
+
+
+def main():
+    cases = [
+        ("3x3", wm.default_parameters(), True),
+        ("10x10", wm.synthetic_parameters(10, 10), True),
+        ("30x30", wm.synthetic_parameters(30, 30), False),
+    ]
+    print("%-6s %-7s %9s %9s %10s %9s %9s  %s" % (
+        "size", "caps", "rows", "cols", "nnz", "build", "solve", "objective"))
+    for label, params, solve in cases:
+        for caps, aggregation in (("daily", None), ("annual", {name: "annual" for name in DAILY_CAPS})):
+            t0 = time.perf_counter()
+            model = mp.build_multiperiod(params, periods=365, aggregation=aggregation)
+            t_build = time.perf_counter() - t0
+            t_solve, objective = float("nan"), "-"
+            if solve:
+                t0 = time.perf_counter()
+                result = wm.solve(model, backend="highs")
+                t_solve = time.perf_counter() - t0
+                objective = "%s %.2f" % (result["status"], result["objective"])
+            print("%-6s %-7s %9d %9d %10d %8.2fs %8.2fs  %s" % (
+                label, caps, model.n_rows, model.n_cols, model.nnz, t_build, t_solve, objective))
+
+
+if __name__ == "__main__":
+    main()
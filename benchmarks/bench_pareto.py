@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: adaptive vs. uniform epsilon grids for the cost/CO2 frontier.
+
+Traces the frontier with ``water_pareto.frontier`` and compares it with a
+uniform grid of the same number of points solved by rebuilding the
+model for every epsilon: the largest gap between the true frontier and
+the piecewise-linear interpolation of each point set is reported
+relative to the cost range.
+
+Usage: python benchmarks/bench_pareto.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_model as wm  # noqa: E402
+import water_pareto as wp  # noqa: E402
+
+
+def cold_costs(params, objective, epsilons, equity):
+    model, row, _ = wp.epsilon_model(wm.build_model(params, equity=equity), objective)
+    costs = []
+    for eps in epsilons:
+        model.rhs[row] = eps
+        costs.append(wm.solve(model, backend="highs")["objective"])
+    return np.array(costs)
+
+
+def main():
+    cases = [("3x3", wm.default_parameters(), "pairwise"), ("30x30", wm.synthetic_parameters(30, 30), "common")]
+    print("%-6s %-12s %7s %10s %10s %12s %12s" % (
+        "size", "objective", "points", "adaptive", "uniform", "gap adapt.", "gap uniform"))
+    for label, params, equity in cases:
+        for objective in wp.OBJECTIVES:
+            front = wp.frontier(params, objective, processes=1, equity=equity)
+            values = front[objective]
+            k = len(values)
+            t0 = time.perf_counter()
+            grid = np.linspace(values[0], values[-1], k)
+            uniform = cold_costs(params, objective, grid, equity)
+            wall_uniform = time.perf_counter() - t0
+            # reference frontier on a fine grid
+            fine = np.linspace(values[0], values[-1], 400)
+            truth = cold_costs(params, objective, fine, equity)
+            span = max(truth.max() - truth.min(), 1e-12)
+            gap_adaptive = np.abs(np.interp(fine, values, front["cost"]) - truth).max() / span
+            gap_uniform = np.abs(np.interp(fine, grid, uniform) - truth).max() / span
+            print("%-6s %-12s %7d %9.3fs %9.3fs %12.2e %12.2e" % (
+                label, objective, k, front["wall"], wall_uniform, gap_adaptive, gap_uniform))
+
+
+if __name__ == "__main__":
+    main()
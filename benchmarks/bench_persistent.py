@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: in-place updates of a persistent model vs. cold rebuild and solve.
+
+Walks E_safe and Ct through a sequence of values and, for each change,
+times (a) a cold rebuild solved with CBC through PuLP, as the script does,
+(b) a cold rebuild loaded into a fresh HiGHS instance and (c) an in-place
+update of ``water_highs.PersistentModel`` re-solved from the previous basis.
+
+Usage: python benchmarks/bench_persistent.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_highs as whs  # noqa: E402
+import water_model as wm  # noqa: E402
+
+
+def changes(k):
+    e_safe = np.linspace(350000, 300000, k)
+    ct = np.linspace(600000, 500000, k)
+    return [{"E_safe": float(a), "Ct": float(b)} for a, b in zip(e_safe, ct)]
+
+
+def run(label, params, k, with_cbc):
+    steps = changes(k)
+
+    t_cbc = np.nan
+    if with_cbc:
+        t0 = time.perf_counter()
+        for step in steps:
+            wm.solve(wm.build_model(wm.apply_overrides(params, step)))
+        t_cbc = (time.perf_counter() - t0) / k
+
+    t0 = time.perf_counter()
+    for step in steps:
+        h = whs.make_highs(wm.build_model(wm.apply_overrides(params, step)))
+        h.run()
+    t_cold = (time.perf_counter() - t0) / k
+
+    pm = whs.PersistentModel(wm.build_model(params))
+    pm.solve()
+    iterations = 0
+    t0 = time.perf_counter()
+    for step in steps:
+        for name, value in step.items():
+            pm.set_parameter(name, value)
+        pm.solve()
+        iterations += pm.iterations
+    t_warm = (time.perf_counter() - t0) / k
+
+    print("%-8s %12.2f %12.2f %12.2f %10.1fx %10.1f" % (
+        label, t_cbc * 1e3, t_cold * 1e3, t_warm * 1e3, t_cold / t_warm, iterations / k))
+
+
+def main():
+    print("per re-solve, milliseconds")
+    print("%-8s %12s %12s %12s %11s %10s" % ("size", "cold CBC", "cold HiGHS", "persistent", "gain", "iters"))
+    run("3x3", wm.default_parameters(), 50, True)
+    run("30x30", wm.synthetic_parameters(30, 30), 20, True)
+    run("100x100", wm.synthetic_parameters(100, 100), 5, False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ``water_presolve.presolve`` before the solver.
+
+For each size, solves the compiled model as is and after presolve with
+in-process HiGHS, and prints the row/nonzero reduction, the presolve
+time and the solve wall times.
+
+Usage: python benchmarks/bench_presolve.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_model as wm  # noqa: E402
+import water_presolve as wp  # noqa: E402
+
+
+def main():
+    cases = [
+        ("3x3", wm.default_parameters(), "pairwise"),
+        ("100x100", wm.synthetic_parameters(100, 100), "pairwise"),
+        ("300x300", wm.synthetic_parameters(300, 300), "common"),
+    ]
+    print("%-8s %-9s %16s %20s %9s %9s %12s  %s" % (
+        "size", "equity", "rows", "nonzeros", "presolve", "solve", "+presolve", "objective"))
+    for label, params, equity in cases:
+        compiled = wm.build_model(params, equity=equity)
+        t0 = time.perf_counter()
+        full = wm.solve(compiled, backend="highs")
+        t_full = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        reduced, report = wp.presolve(compiled)
+        t_pre = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        result = wm.solve(reduced, backend="highs")
+        t_red = time.perf_counter() - t0
+
+        print("%-8s %-9s %7d -> %6d %9d -> %8d %8.3fs %8.3fs %11.3fs  %.4f / %.4f" % (
+            label, equity, report.n_rows, report.reduced_rows, report.n_nnz, report.reduced_nnz,
+            t_pre, t_full, t_pre + t_red, full["objective"], result["objective"]))
+
+
+if __name__ == "__main__":
+    main()
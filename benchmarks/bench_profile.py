@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: cost of the ``water_profile`` instrumentation.
+
+Times ``build_model`` without a profiler, with ``profile(memory=False)``
+and with ``profile()`` (tracemalloc on), then prints the phase report of
+one profiled HiGHS solve.
+
+Usage: python benchmarks/bench_profile.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import water_model as wm  # noqa: E402
+import water_profile as wp  # noqa: E402
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    cases = [("3x3", wm.default_parameters(), 50), ("50x50", wm.synthetic_parameters(50, 50), 10),
+             ("200x200", wm.synthetic_parameters(200, 200), 3)]
+    print("%-8s %12s %12s %12s" % ("size", "off", "timing", "timing+mem"))
+    for label, params, repeat in cases:
+        def build():
+            wm.build_model(params, equity="common")
+
+        def build_timing():
+            with wp.profile(memory=False):
+                build()
+
+        def build_memory():
+            with wp.profile():
+                build()
+
+        print("%-8s %10.2fms %10.2fms %10.2fms" % (label, best_of(build, repeat) * 1e3,
+                                                  best_of(build_timing, repeat) * 1e3,
+                                                  best_of(build_memory, repeat) * 1e3))
+    with wp.profile() as prof:
+        wm.solve(wm.build_model(wm.synthetic_parameters(50, 50), equity="common"), backend="highs")
+    print()
+    print(prof.format(top=5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: rolling-horizon steps vs. a cold rebuild per reading.
+
+Feeds a stream of noisy rainfall readings (and a demand change every 10th
+reading) to ``water_rolling.RollingHorizon`` and, for the same readings,
+times a cold ``build_multiperiod`` + HiGHS solve of the horizon from the
+same storage.  Reports the per-reading latency of both and checks that
+the objectives agree.
+
+Usage: python benchmarks/bench_rolling.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_model as wm  # noqa: E402
+import water_multiperiod as wmp  # noqa: E402
+import water_rolling as wro  # noqa: E402
+
+
+def readings(params, k, seed=0):
+    rng = np.random.default_rng(seed)
+    A = np.asarray(params["A"], dtype=float)
+    D = np.asarray(params["D"], dtype=float)
+    rain = np.asarray(params["stormwater_sources"]) - 1
+    out = []
+    for step in range(k):
+        a = A.copy()
+        a[rain] *= rng.uniform(0.8, 1.2, len(rain))
+        reading = {"time": step, "A": a.tolist()}
+        if step % 10 == 9:
+            reading["D"] = (D * rng.uniform(0.97, 1.03, len(D))).tolist()
+        out.append(reading)
+    return out
+
+
+def run(label, params, periods, k, equity):
+    stream = readings(params, k)
+    initial = 5.0 * np.asarray(params["A"], dtype=float)
+    rolling = wro.RollingHorizon(params, periods=periods, storage=initial, equity=equity)
+    warm, cold, gap = [], [], 0.0
+    for reading in stream:
+        start_storage = rolling.storage.copy()
+        t0 = time.perf_counter()
+        record = rolling.step(reading)
+        warm.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        p = dict(params, D=rolling.demand)
+        model = wmp.build_multiperiod(p, periods=periods, inflow=np.tile(reading["A"], (periods, 1)),
+                                      initial_storage=start_storage, equity=equity)
+        result = wm.solve(model, backend="highs")
+        cold.append(time.perf_counter() - t0)
+        if record["objective"] is not None:
+            gap = max(gap, abs(record["objective"] - result["objective"]) / max(1.0, abs(result["objective"])))
+    warm, cold = np.array(warm) * 1e3, np.array(cold) * 1e3
+    print("%-12s %8d %9.3f %9.3f %9.3f %9.3f %7.1fx %10.1e" % (
+        label, rolling.model.n_rows, np.median(cold), np.median(warm), np.percentile(warm, 99), warm.max(),
+        np.median(cold) / np.median(warm), gap))
+
+
+def main():
+    print("per reading, milliseconds")
+    print("%-12s %8s %9s %9s %9s %9s %8s %10s" % (
+        "case", "rows", "cold p50", "warm p50", "warm p99", "warm max", "gain", "max gap"))
+    run("3x3 T=4", wm.default_parameters(), 4, 200, "pairwise")
+    run("3x3 T=96", wm.default_parameters(), 96, 100, "pairwise")
+    run("30x30 T=24", wm.synthetic_parameters(30, 30), 24, 30, "common")
+
+
+if __name__ == "__main__":
+    main()
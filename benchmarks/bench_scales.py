@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark harness: build, solve and extract across problem scales.
+
+Builds and solves the Water_Management model for the shipped 3x3 data,
+synthetic 50x50 and 500x500 grids and multi-period variants, and times
+construction, solve and result extraction separately using the
+``water_profile`` phase records (best of ``--repeat`` runs, without
+tracemalloc).  One further run per case measures the peak traced memory
+of each phase.  Row, column and nonzero counts, the objective and the
+environment (commit, Python and library versions) go to a JSON file so
+two commits or backends can be compared:
+
+    python benchmarks/bench_scales.py --output before.json
+    ... change the builder or the backend ...
+    python benchmarks/bench_scales.py --output after.json
+    python benchmarks/bench_scales.py --compare before.json after.json
+
+Large grids use the linear-size ``equity="common"`` formulation; the
+pairwise rows of a 500x500 grid would need 1.2e8 nonzeros.
+
+Usage: python benchmarks/bench_scales.py [--cases 3x3,50x50] [--backend highs|cbc|linprog]
+       [--repeat 3] [--output FILE] [--compare OLD NEW]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_model as wm  # noqa: E402
+import water_multiperiod as wmp  # noqa: E402
+import water_profile as wpr  # noqa: E402
+
+# Phases summed into each reported stage
+STAGES = {
+    "build": ("build", "build_multiperiod", "to_pulp"),
+    "solve": ("load", "solve", "write", "cbc", "parse"),
+    "extract": ("extract",),
+}
+
+
+def _single(n, m, equity):
+    params = wm.default_parameters() if (n, m) == (3, 3) else wm.synthetic_parameters(n, m)
+    return lambda: wm.build_model(params, equity=equity)
+
+
+def _multi(n, m, periods, equity):
+    params = wm.default_parameters() if (n, m) == (3, 3) else wm.synthetic_parameters(n, m)
+    # a month of storage at the start keeps the rainfall trough of day 1 feasible
+    initial = 30.0 * np.asarray(params["A"], dtype=float)
+    return lambda: wmp.build_multiperiod(params, periods=periods, initial_storage=initial, equity=equity)
+
+
+CASES = {
+    "3x3": _single(3, 3, "pairwise"),
+    "50x50": _single(50, 50, "common"),
+    "500x500": _single(500, 500, "common"),
+    "3x3x365": _multi(3, 3, 365, "pairwise"),
+    "50x50x30": _multi(50, 50, 30, "common"),
+}
+
+
+def environment():
+    import scipy
+
+    env = {"python": platform.python_version(), "numpy": np.__version__, "scipy": scipy.__version__,
+           "machine": platform.machine(), "system": platform.system(), "cpus": os.cpu_count(),
+           "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    for module in ("highspy", "pulp"):
+        try:
+            env[module] = __import__(module).__version__
+        except (ImportError, AttributeError):
+            env[module] = None
+    try:
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+        env["commit"] = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=root, text=True,
+                                                stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        env["commit"] = None
+    return env
+
+
+def run_case(name, backend, repeat):
+    """Return the result record of one case."""
+    build = CASES[name]
+
+    def once(memory):
+        with wpr.profile(memory=memory) as prof:
+            compiled = build()
+            result = wm.solve(compiled, backend=backend)
+        return compiled, result, prof.phases()
+
+    best = {}
+    for _ in range(repeat):
+        compiled, result, phases = once(False)
+        for phase, record in phases.items():
+            best[phase] = min(best.get(phase, np.inf), record["wall"])
+    _, _, mem_phases = once(True)
+    record = {"case": name, "backend": backend, "rows": compiled.n_rows, "cols": compiled.n_cols,
+              "nnz": compiled.nnz, "status": result["status"],
+              "objective": None if np.isnan(result["objective"]) else float(result["objective"]),
+              "phases": {phase: {"wall": best[phase], "peak": mem_phases.get(phase, {}).get("peak")}
+                         for phase in best},
+              # process-wide high-water mark, cases run so far included
+              "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    for stage, phases in STAGES.items():
+        record[stage] = sum(best.get(p, 0.0) for p in phases)
+        peaks = [mem_phases[p]["peak"] for p in phases if p in mem_phases]
+        record[stage + "_peak"] = max(peaks) if peaks else None
+    return record
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print("%s (%s) -> %s (%s)" % (old_path, (old["environment"]["commit"] or "?")[:10],
+                                  new_path, (new["environment"]["commit"] or "?")[:10]))
+    # runs of different backends are compared case by case
+    same = {r["backend"] for r in old["results"]} == {r["backend"] for r in new["results"]}
+
+    def key(r):
+        return (r["case"], r["backend"]) if same else r["case"]
+
+    before = {key(r): r for r in old["results"]}
+    print("%-10s %-14s %25s %25s %25s" % ("case", "backend", "build", "solve", "extract"))
+    for r in new["results"]:
+        o = before.get(key(r))
+        if o is None:
+            continue
+        backend = r["backend"] if o["backend"] == r["backend"] else "%s->%s" % (o["backend"], r["backend"])
+        cells = ["%8.4fs %8.4fs %4.2fx" % (o[s], r[s], r[s] / o[s] if o[s] else np.nan) for s in STAGES]
+        print("%-10s %-14s %s" % (r["case"], backend, " ".join(cells)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated subset of %s" % ", ".join(CASES))
+    parser.add_argument("--backend", default="highs", choices=("highs", "cbc", "linprog"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_scales.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    print("%-10s %8s %8s %10s %10s %10s %10s %12s" % (
+        "case", "rows", "cols", "nnz", "build", "solve", "extract", "peak build"))
+    for name in args.cases.split(","):
+        r = run_case(name, args.backend, args.repeat)
+        results.append(r)
+        print("%-10s %8d %8d %10d %9.4fs %9.4fs %9.4fs %10.1fMB" % (
+            name, r["rows"], r["cols"], r["nnz"], r["build"], r["solve"], r["extract"],
+            (r["build_peak"] or 0) / 1e6))
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=1)
+    print("written to %s" % args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: coefficient ranges and HiGHS solves with and without scaling.
+
+For each case prints the ``water_scaling.condition_stats`` of the model
+as built and after geometric-mean scaling, then solves it with HiGHS
+four ways: its own scaling switched off or on (the default), each on the
+model as built and on the scaled model.  Reports the simplex iterations,
+the solve time (best of 3, load excluded), the objective difference to
+the default solve and the largest relative row violation of the
+unscaled solution.
+
+Usage: python benchmarks/bench_scaling.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_highs as whs  # noqa: E402
+import water_model as wm  # noqa: E402
+import water_multiperiod as wmp  # noqa: E402
+import water_scaling as wsc  # noqa: E402
+
+
+def _solve(compiled, highs_scaling, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        h = whs.make_highs(compiled)
+        if not highs_scaling:
+            h.setOptionValue("simplex_scale_strategy", 0)
+        t0 = time.perf_counter()
+        status = whs.run(h)
+        best = min(best, time.perf_counter() - t0)
+    values = np.asarray(h.getSolution().col_value) if status == "Optimal" else np.full(compiled.n_cols, np.nan)
+    return status, h.getInfo().objective_function_value, values, h.getInfo().simplex_iteration_count, best
+
+
+def run(label, compiled):
+    scaled = wsc.scale(compiled)
+    print("\n%s: %d rows, %d cols, %d nonzeros" % (label, compiled.n_rows, compiled.n_cols, compiled.nnz))
+    print(wsc.format_stats(wsc.condition_stats(compiled), wsc.condition_stats(scaled), labels=["built", "scaled"]))
+    print("%-28s %-10s %8s %10s %12s %12s" % ("model / HiGHS scaling", "status", "iters", "solve ms",
+                                             "obj diff", "violation"))
+    reference = None
+    for name, model in (("built", compiled), ("scaled", scaled)):
+        for highs_scaling in (False, True):
+            status, objective, values, iterations, wall = _solve(model, highs_scaling)
+            if model is scaled:
+                objective /= scaled.obj_scale
+                values = values * scaled.col_scale
+            if name == "built" and highs_scaling:
+                reference = objective
+            slack = wm.row_slack(compiled, compiled.A @ values)
+            violation = np.max(np.maximum(-slack, 0.0) / np.maximum(1.0, np.abs(compiled.rhs)))
+            print("%-28s %-10s %8d %10.3f %12s %12.1e" % (
+                "%s / %s" % (name, "on" if highs_scaling else "off"), status, iterations, wall * 1e3,
+                "" if reference is None else "%.1e" % abs(objective - reference), violation))
+
+
+def main():
+    run("3x3", wm.build_model())
+    run("30x30 pairwise", wm.build_model(wm.synthetic_parameters(30, 30)))
+    run("200x200 common", wm.build_model(wm.synthetic_parameters(200, 200), equity="common"))
+    params = wm.synthetic_parameters(30, 30)
+    run("30x30x30 common", wmp.build_multiperiod(params, periods=30, equity="common",
+                                                 initial_storage=30.0 * np.asarray(params["A"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: one sensitivity call vs. per-row perturbation re-solves.
+
+Computes every shadow price of the model once with
+``water_sensitivity.sensitivity`` and once by perturbing each right-hand
+side by +1 on a warm-started ``PersistentModel``, and compares wall times
+and the largest disagreement on rows whose RHS ranging interval contains
+the perturbed value.
+
+Usage: python benchmarks/bench_sensitivity.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_highs as whs  # noqa: E402
+import water_model as wm  # noqa: E402
+import water_sensitivity as ws  # noqa: E402
+
+
+def perturbation_duals(compiled, step=1.0):
+    pm = whs.PersistentModel(compiled)
+    base = pm.solve()["objective"]
+    rhs = pm.compiled.rhs
+    duals = np.zeros(compiled.n_rows)
+    for r in range(compiled.n_rows):
+        pm.set_rhs_row(r, rhs[r] + step)
+        duals[r] = (pm.solve()["objective"] - base) / step
+        pm.set_rhs_row(r, rhs[r] - step)
+    return duals
+
+
+def main():
+    cases = [
+        ("3x3", wm.apply_overrides(wm.default_parameters(), {"Smax": 12500.0})),
+        ("30x30", wm.apply_overrides(wm.synthetic_parameters(30, 30), {"Smax": 12500.0})),
+    ]
+    print("%-6s %6s %12s %14s %12s" % ("size", "rows", "one call", "perturbation", "max diff"))
+    for label, params in cases:
+        compiled = wm.build_model(params, equity="common")
+        t0 = time.perf_counter()
+        report = ws.sensitivity(compiled)
+        t_one = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        duals = perturbation_duals(compiled)
+        t_fd = time.perf_counter() - t0
+        rows = report["rows"]
+        inside = rows["rhs_upper"] >= compiled.rhs + 1.0
+        diff = np.abs(rows["dual"] - duals)[inside].max()
+        print("%-6s %6d %11.3fs %13.3fs %12.2e" % (label, compiled.n_rows, t_one, t_fd, diff))
+
+
+if __name__ == "__main__":
+    main()
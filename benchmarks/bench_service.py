@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Load generator for ``water_service``.
+
+Starts the service in a subprocess, opens ``--connections`` keep-alive
+connections and sends ``--requests`` POST /solve requests as fast as the
+answers come back.  The mix is
+
+- 60% warm right-hand-side overrides (random ``A[2]``, ``D`` or ``Ct``),
+- 10% cost overrides (``Cij``), which rebuild the model,
+- 30% one popular request, which concurrent clients share through
+  request coalescing.
+
+Reports p50/p99/max latency, requests per second and the service's
+counters, and for reference the latency of one-off processes: the
+original script and ``water_cli.py solve``.
+
+Usage: python benchmarks/bench_service.py [--requests 2000] [--connections 16] [--workers N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+def payloads(k, seed=0):
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(k):
+        u = rng.uniform()
+        if u < 0.3:
+            overrides = {"A[2]": 2000000.0}
+        elif u < 0.4:
+            overrides = {"Cij": [round(v, 4) for v in rng.uniform(0.01, 0.04, 3)]}
+        elif u < 0.6:
+            overrides = {"A[2]": round(float(rng.uniform(1e6, 5e6)), 1)}
+        elif u < 0.8:
+            overrides = {"D": [round(float(v), 1) for v in rng.uniform(0.8, 1.2, 3) * [4360.0, 3052.0, 8720.0]]}
+        else:
+            overrides = {"Ct": round(float(rng.uniform(4e5, 6e5)), 1)}
+        out.append(json.dumps({"overrides": overrides}).encode())
+    return out
+
+
+async def request(reader, writer, body):
+    writer.write(b"POST /solve HTTP/1.1\r\nHost: local\r\nContent-Type: application/json\r\n"
+                 b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port, queue, latencies, codes):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while not queue.empty():
+            body = queue.get_nowait()
+            t0 = time.perf_counter()
+            status, _ = await request(reader, writer, body)
+            latencies.append((time.perf_counter() - t0) * 1e3)
+            codes[status] = codes.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def load(port, bodies, connections):
+    queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+    latencies, codes = [], {}
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(port, queue, latencies, codes) for _ in range(connections)))
+    return np.array(latencies), codes, time.perf_counter() - t0
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET %s HTTP/1.1\r\nHost: local\r\nConnection: close\r\n\r\n" % path.encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return json.loads(data.split(b"\r\n\r\n", 1)[1])
+
+
+def one_off(command, runs=3):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - t0) * 1e3)
+    return np.median(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=8751)
+    args = parser.parse_args(argv)
+
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "water_service.py"), "--port", str(args.port),
+                               "--workers", str(args.workers)], cwd=ROOT, stderr=subprocess.PIPE)
+    try:
+        server.stderr.readline()  # "serving ..." once the workers are up
+        for _ in range(100):
+            try:
+                asyncio.run(get(args.port, "/templates"))
+                break
+            except OSError:
+                time.sleep(0.05)
+        latencies, codes, wall = asyncio.run(load(args.port, payloads(args.requests), args.connections))
+        stats = asyncio.run(get(args.port, "/stats"))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print("%d requests over %d connections, %d workers: %s" % (args.requests, args.connections, args.workers,
+                                                               codes))
+    print("latency p50 %.2f ms  p99 %.2f ms  max %.2f ms, %.0f requests/s" % (
+        np.percentile(latencies, 50), np.percentile(latencies, 99), latencies.max(), len(latencies) / wall))
+    print("service: solved %d, coalesced %d, rejected %d, server-side p50 %.2f ms p99 %.2f ms" % (
+        stats["solved"], stats["coalesced"], stats["rejected"], stats["latency_ms"]["p50"],
+        stats["latency_ms"]["p99"]))
+    print("one-off process per request: script %.0f ms, water_cli.py solve --backend highs %.0f ms" % (
+        one_off([sys.executable, "CODE-JCR-WATER-V7-B-25.py"]),
+        one_off([sys.executable, "water_cli.py", "solve", "--backend", "highs"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: scenario-sweep throughput against the number of worker processes.
+
+Solves the same grid of Ct / E_safe / ENlim overrides on the 3x3 model with
+1, 2, 4, ... processes up to the core count and prints scenarios per second
+and the speed-up over one process.
+
+Usage: python benchmarks/bench_sweep.py [n_scenarios]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_sweep  # noqa: E402
+
+
+def main():
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    side = int(np.ceil(k ** (1.0 / 3.0)))
+    scenarios = water_sweep.grid({
+        "Ct": np.linspace(400000, 600000, side).tolist(),
+        "E_safe": np.linspace(250000, 350000, side).tolist(),
+        "ENlim": np.linspace(150000, 200000, side).tolist(),
+    })[:k]
+
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+
+    print("%d scenarios, %d cores" % (len(scenarios), cores))
+    print("%10s %12s %14s %10s" % ("processes", "wall", "scenarios/s", "speed-up"))
+    base_rate = None
+    for procs in counts:
+        t0 = time.perf_counter()
+        table = water_sweep.sweep(scenarios, processes=procs)
+        wall = time.perf_counter() - t0
+        rate = len(scenarios) / wall
+        base_rate = base_rate or rate
+        print("%10d %11.2fs %14.1f %9.2fx" % (procs, wall, rate, rate / base_rate))
+    print("optimal: %d / %d" % (table["status"].count("Optimal"), len(scenarios)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: peak memory of dict-based PuLP variables against variable blocks.
+
+For 10^5 and 10^6 cells x[i, j] builds the decision variables and three
+of the script's conditions (availability per source, demand per sector,
+treatment capacity over all cells) in two ways:
+
+- ``dict``: ``pl.LpVariable.dicts`` and one ``pl.lpSum`` per row, as in
+  CODE-JCR-WATER-V7-B-25.py;
+- ``block``: one ``water_model.VariableBlock`` with NumPy bounds and the
+  rows assembled by ``water_model._RowBuilder`` through
+  ``VariableBlock.columns``; names are generated for 10 columns only.
+
+Each case runs in a fresh subprocess and reports the ``tracemalloc`` peak,
+the growth of the maximum resident set size and the build time.
+
+Usage: python benchmarks/bench_variables.py
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_model as wm  # noqa: E402
+
+SIZES = ((100, 1000), (1000, 1000))
+
+
+def build_dict(n, m, p):
+    import pulp as pl
+
+    I, J = range(1, n + 1), range(1, m + 1)
+    x = pl.LpVariable.dicts("x", (I, J), lowBound=0, upBound=float(p["L_norm"]))
+    model = pl.LpProblem("Water_Management", pl.LpMinimize)
+    for i in I:
+        model += pl.lpSum([x[i][j] for j in J]) <= float(p["A"][i - 1]), "Water_Availability_Source_%d" % i
+    for j in J:
+        model += pl.lpSum([x[i][j] for i in I]) >= float(p["D"][j - 1]), "Sector_Demand_%d" % j
+    model += pl.lpSum([x[i][j] for i in I for j in J]) <= float(p["Ct"]), "Treatment_Capacity"
+    return model
+
+
+def build_block(n, m, p):
+    x = wm.VariableBlock("x", 0, (n, m))
+    lb = np.zeros(len(x))
+    ub = np.full(len(x), float(p["L_norm"]))
+    cell = x.columns()
+    rb = wm._RowBuilder(len(x))
+    rb.add("Water_Availability_Source", 1, cell // m, cell, np.ones(cell.size), n, wm.LE, p["A"])
+    rb.add("Sector_Demand", 2, cell % m, cell, np.ones(cell.size), m, wm.GE, p["D"])
+    rb.add_dense("Treatment_Capacity", 3, np.ones((n, m)), wm.LE, p["Ct"])
+    A, sense, rhs, families = rb.finish()
+    names = [x.col_name(k) for k in range(10)]
+    return A, lb, ub, names
+
+
+def measure(kind, n, m):
+    # libraries are loaded before measuring, so only the model is counted
+    import pulp  # noqa: F401
+    import scipy.sparse  # noqa: F401
+
+    p = wm.synthetic_parameters(n, m, noise=0.0)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    built = (build_dict if kind == "dict" else build_block)(n, m, p)
+    wall = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    del built
+    return {"peak": peak, "rss": rss * 1024, "wall": wall}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "--case":
+        print(json.dumps(measure(argv[1], int(argv[2]), int(argv[3]))))
+        return
+    print("%-10s %-6s %14s %14s %10s" % ("cells", "kind", "traced peak MB", "max RSS +MB", "build s"))
+    for n, m in SIZES:
+        for kind in ("dict", "block"):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", kind, str(n), str(m)],
+                                 capture_output=True, text=True, check=True).stdout
+            r = json.loads(out)
+            print("%-10d %-6s %14.1f %14.1f %10.2f" % (n * m, kind, r["peak"] / 2 ** 20, r["rss"] / 2 ** 20,
+                                                      r["wall"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: screening candidate allocations for violated conditions.
+
+Draws random candidate allocations around the optimum and checks them
+(a) one by one through PuLP, setting ``varValue`` and calling
+``LpConstraint.valid`` on every constraint, and (b) in batches with
+``water_violations.screen``.  Reports candidates per second and checks
+that both agree on feasibility.
+
+Usage: python benchmarks/bench_violations.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import water_model as wm  # noqa: E402
+import water_violations as wvi  # noqa: E402
+
+
+def candidates(compiled, k, seed=0):
+    """``k`` allocations: the optimum scaled by U(0.95, 1.05), every other one also cell by cell."""
+    x = wm.solve(compiled, backend="highs")["x"]
+    rng = np.random.default_rng(seed)
+    X = x[None] * rng.uniform(0.95, 1.05, (k, 1, 1))
+    X[1::2] *= rng.uniform(0.99, 1.01, X[1::2].shape)
+    X[0] = x
+    return X
+
+
+def pulp_check(compiled, X, tol):
+    model, cols = wm.to_pulp(compiled)
+    constraints = list(model.constraints.values())
+    feasible = np.empty(len(X), dtype=bool)
+    for k, x in enumerate(X):
+        for var, value in zip(cols, x.ravel()):
+            var.varValue = value
+        feasible[k] = all(c.valid(eps=tol * max(1.0, abs(c.constant))) for c in constraints)
+    return feasible
+
+
+def run(label, params, k, k_pulp):
+    compiled = wm.build_model(params)
+    X = candidates(compiled, k)
+    t0 = time.perf_counter()
+    ref = pulp_check(compiled, X[:k_pulp], 1e-6)
+    t_pulp = (time.perf_counter() - t0) / k_pulp
+    wvi.screen(compiled, X[:1000])
+    t0 = time.perf_counter()
+    report = wvi.screen(compiled, X)
+    t_screen = (time.perf_counter() - t0) / k
+    agree = np.array_equal(ref, report["feasible"][:k_pulp])
+    print("%-8s %7d %10d %12.0f %14.0f %8.0fx %10.3f %6s" % (
+        label, compiled.n_rows, k, 1.0 / t_pulp, 1.0 / t_screen, t_pulp / t_screen,
+        report["feasible"].mean(), agree))
+
+
+def main():
+    print("%-8s %7s %10s %12s %14s %9s %10s %6s" % ("size", "rows", "K", "PuLP cand/s", "screen cand/s",
+                                                  "gain", "feasible", "agree"))
+    run("3x3", wm.default_parameters(), 2000000, 2000)
+    run("10x10", wm.synthetic_parameters(10, 10), 200000, 200)
+    run("30x30", wm.synthetic_parameters(30, 30), 20000, 20)
+
+
+if __name__ == "__main__":
+    main()
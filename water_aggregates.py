@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Sharing of repeated linear aggregates through defining columns.
+
+The script rebuilds ``pl.lpSum([x[i, j] for i ... for j ...])`` for about
+a dozen conditions (3, 9, 10, 12, 16, 20, 27, 30, 34, ...) and the
+five-part cost expression twice, for the objective and for
+``Max_Budget``.  In matrix form every such row is dense, N x M terms
+each.  ``share_aggregates`` looks for coefficient patterns g that occur
+(up to a factor) in several rows, or in a row and the objective, and
+rewrites every row a that is mostly a multiple of g as
+
+    a . x = k g . x + (a - k g) . x = k z + (a - k g) . x
+
+with one auxiliary column z and one defining row ``g . x - z == 0``
+(family ``Aggregate_Definition``).  ``Treatment_Capacity`` becomes
+``total_flow <= Ct``, ``Use_of_Wastewater`` keeps only the greywater
+cells plus ``-Rmin * total_flow``, and the objective and ``Max_Budget``
+both read ``total_cost``.  A pattern is shared only when the terms saved
+in the matrix and the objective exceed the ``nnz(g) + 1`` terms of its
+defining row.
+
+The feasible set in x and the objective value are unchanged; the new
+columns come after the existing auxiliary columns.  Rows of ``KEEP`` are
+never rewritten: their x coefficients are 1 / D[j], updated in place by
+``water_highs.PersistentModel.scale_equity``.
+
+Example:
+    shared, report = share_aggregates(water_model.build_model())
+    print(report.format())
+    # or directly
+    compiled = water_model.build_model(aggregates=True)
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+import water_model as wm
+
+# Families whose coefficients are rescaled in place with D
+KEEP = ("Equitable_Distribution_Scarcity", "Equity_Distribution")
+
+# Relative tolerance for two coefficient ratios to be the same factor
+RTOL = 1e-9
+
+
+class AggregateReport:
+    """What ``share_aggregates`` changed.
+
+    ``shared`` lists ``(column name, pattern terms, rows rewritten,
+    objective rewritten)`` for every new column; ``nnz``/``terms`` are the
+    matrix nonzeros and matrix plus objective terms before and after.
+    """
+
+    def __init__(self, nnz, terms):
+        self.shared = []
+        self.nnz = (nnz, nnz)
+        self.terms = (terms, terms)
+
+    def format(self, limit=20):
+        lines = ["nonzeros %d -> %d, terms incl. objective %d -> %d" % (self.nnz + self.terms)]
+        for name, size, rows, objective in self.shared[:limit]:
+            lines.append("  %-20s %8d terms, %4d rows%s" % (name, size, rows, " + objective" if objective else ""))
+        if len(self.shared) > limit:
+            lines.append("  ... %d more" % (len(self.shared) - limit))
+        return "\n".join(lines)
+
+
+def _normalized(indices, data):
+    """Hashable key of a coefficient pattern up to a factor."""
+    return indices.tobytes() + np.round(data / data[0], 12).tobytes()
+
+
+def _factor(a, g):
+    """Return (k, matches): the most frequent ratio a / g and where it holds."""
+    ratio = a / g
+    keys, inverse, counts = np.unique(np.round(ratio, 12), return_inverse=True, return_counts=True)
+    best = int(np.argmax(counts))
+    k = float(ratio[inverse == best].mean())
+    if k == 0.0:
+        return 0.0, np.zeros(a.size, dtype=bool)
+    return k, np.isclose(ratio, k, rtol=RTOL, atol=0.0)
+
+
+def _candidates(A, c, rows, min_terms):
+    """Coefficient patterns repeated in ``rows`` of A or shared with the objective ``c``."""
+    rows = rows[np.diff(A.indptr)[rows] >= min_terms]
+    groups = {}
+    for r in rows:
+        lo, hi = A.indptr[r], A.indptr[r + 1]
+        idx, val = A.indices[lo:hi], A.data[lo:hi]
+        groups.setdefault(_normalized(idx, val), []).append((idx, val))
+    patterns = [members[0] for members in groups.values() if len(members) > 1]
+    nz = np.flatnonzero(c)
+    if nz.size >= min_terms:
+        patterns.append((nz, c[nz]))
+    # the largest patterns first: they save the most per rewritten row
+    return sorted(patterns, key=lambda p: -p[0].size)
+
+
+def _name(idx, val, compiled, used):
+    """Column name of the aggregate with pattern ``idx``/``val``."""
+    n, m = compiled.shape
+    c = compiled.c
+    cells = idx[idx < n * m]
+    name = "aggregate"
+    if cells.size == idx.size and np.all(val == val[0]):
+        if cells.size == n * m:
+            name = "total_flow"
+        elif np.all(cells % m == cells[0] % m) and cells.size == n:
+            name = "sector_flow_%d" % (cells[0] % m + 1)
+        elif np.all(cells // m == cells[0] // m) and cells.size == m:
+            name = "source_flow_%d" % (cells[0] // m + 1)
+    elif cells.size == idx.size == n * m and np.allclose(val / val[0], c[:n * m] / c[0], rtol=RTOL, atol=0.0):
+        name = "total_cost"
+    base, k = name, 1
+    while name in used:
+        k += 1
+        name = "%s_%d" % (base, k)
+    return name
+
+
+def share_aggregates(compiled, min_saving=1, min_terms=4, keep=KEEP):
+    """Return ``(shared, report)`` for ``compiled``.
+
+    ``shared`` is a CompiledModel with one more auxiliary column and one
+    ``Aggregate_Definition`` row per shared pattern (``compiled`` itself
+    when nothing is worth sharing).
+    Patterns of fewer than ``min_terms`` terms are not considered; one is
+    shared when it saves at least ``min_saving`` terms net.
+    """
+    if getattr(compiled, "width", None) is not None:
+        raise TypeError("share aggregates on the single-period model "
+                        "(water_multiperiod.build_multiperiod(..., aggregates=True))")
+    A = compiled.A.tocsr()
+    A.eliminate_zeros()
+    c = np.asarray(compiled.c, dtype=float).copy()
+    n_rows, n_cols0 = A.shape
+    report = AggregateReport(A.nnz, A.nnz + np.count_nonzero(c))
+    locked = np.zeros(n_rows, dtype=bool)
+    for fam in compiled.families:
+        if fam.name in keep:
+            locked[fam.rows] = True
+    free = np.flatnonzero(~locked)
+
+    patterns = _candidates(A, c, free, min_terms)
+    if not patterns:
+        return compiled, report
+    # overlap[r, p]: nonzeros of row r on the cells of pattern p
+    sizes = np.array([idx.size for idx, _ in patterns])
+    P = sp.csr_matrix((np.ones(sizes.sum()), (np.repeat(np.arange(len(patterns)), sizes),
+                                              np.concatenate([idx for idx, _ in patterns]))),
+                      shape=(len(patterns), n_cols0))
+    support = A.copy()
+    support.data[:] = 1.0
+    overlap = (support @ P.T).tocsc()
+
+    claimed = locked.copy()
+    row_nnz = np.diff(A.indptr)
+    pos = np.full(n_cols0, -1)
+    drop = np.zeros(A.nnz, dtype=bool)
+    definitions = []
+    rewrites = []
+    names = list(compiled.aux_names)
+    objective_shared = False
+    for p, (idx, g) in enumerate(patterns):
+        lo, hi = overlap.indptr[p], overlap.indptr[p + 1]
+        rows, count = overlap.indices[lo:hi], overlap.data[lo:hi]
+        # rows mostly on the pattern, and covering at least half of it
+        near = rows[(count * 2 >= idx.size) & (count * 2 >= row_nnz[rows]) & ~claimed[rows]]
+        pos[idx] = np.arange(idx.size)
+        plan = []
+        saving = -(idx.size + 1)
+        for r in near:
+            entries = np.arange(A.indptr[r], A.indptr[r + 1])
+            at = pos[A.indices[entries]]
+            on = at >= 0
+            a = np.zeros(idx.size)
+            a[at[on]] = A.data[entries[on]]
+            k, hit = _factor(a, g)
+            # only rows that are mostly a multiple of g
+            if hit.sum() > 1 and 2 * hit.sum() >= idx.size:
+                plan.append((r, k, a - k * g, hit, entries[on]))
+                saving += int(hit.sum()) - 1
+        pos[idx] = -1
+        # the objective is rewritten only by a pattern proportional to all of it
+        k_obj, hit_obj = _factor(c[idx], g)
+        use_obj = (not objective_shared and hit_obj.sum() > 1 and hit_obj.all()
+                   and np.count_nonzero(c) == idx.size)
+        if use_obj:
+            saving += int(hit_obj.sum()) - 1
+        if saving < min_saving:
+            continue
+
+        z = n_cols0 + len(definitions)
+        name = _name(idx, g, compiled, names)
+        names.append(name)
+        report.shared.append((name, idx.size, len(plan), bool(use_obj)))
+        for r, k, resid, hit, entries in plan:
+            claimed[r] = True
+            resid[hit] = 0.0
+            drop[entries] = True
+            rewrites.append((r, len(definitions), k, resid))
+        if use_obj:
+            objective_shared = True
+            resid = c[idx] - k_obj * g
+            resid[hit_obj] = 0.0
+            c[idx] = resid
+            c = np.append(c, np.zeros(z + 1 - c.size))
+            c[z] = k_obj
+        definitions.append((idx, g, z))
+
+    if not definitions:
+        return compiled, report
+
+    # drop the rewritten rows' entries on their pattern, add back the residuals and k z
+    n_cols = n_cols0 + len(definitions)
+    coo = A.tocoo()
+    rows, cols, vals = [coo.row[~drop]], [coo.col[~drop]], [coo.data[~drop]]
+    for r, d, k, resid in rewrites:
+        idx, _, z = definitions[d]
+        nz = np.flatnonzero(resid)
+        rows.append(np.full(nz.size + 1, r))
+        cols.append(np.append(idx[nz], z))
+        vals.append(np.append(resid[nz], k))
+    A = sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                      shape=(n_rows, n_cols))
+    c = np.append(c, np.zeros(n_cols - c.size))
+
+    # defining rows g . x - z == 0, appended after the existing families
+    d_rows = np.concatenate([np.full(idx.size + 1, k) for k, (idx, _, _) in enumerate(definitions)])
+    d_cols = np.concatenate([np.append(idx, z) for idx, _, z in definitions])
+    d_vals = np.concatenate([np.append(g, -1.0) for _, g, _ in definitions])
+    D = sp.csr_matrix((d_vals, (d_rows, d_cols)), shape=(len(definitions), n_cols))
+    A = sp.vstack([A, D], format="csr")
+    new_names = names[len(compiled.aux_names):]
+    families = list(compiled.families) + [
+        wm.RowFamily("Aggregate_Definition", 0, n_rows, n_rows + len(definitions),
+                     names=["Aggregate_%s" % name for name in new_names])]
+    extra = n_cols - n_cols0
+    shared = wm.CompiledModel(compiled.shape, A,
+                              np.concatenate([compiled.sense, np.full(len(definitions), wm.EQ, dtype=np.int8)]),
+                              np.concatenate([compiled.rhs, np.zeros(len(definitions))]), c,
+                              np.concatenate([compiled.lb, np.full(extra, -np.inf)]),
+                              np.concatenate([compiled.ub, np.full(extra, np.inf)]), families, compiled.params, names)
+    report.nnz = (report.nnz[0], shared.nnz)
+    report.terms = (report.terms[0], shared.nnz + np.count_nonzero(c))
+    return shared, report
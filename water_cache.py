@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed on-disk cache of solved Water_Management models.
+
+A solution is filed under ``model_key(compiled)``, a hash of what the
+solver actually sees: the shape, the constraint matrix (canonical CSR),
+the row senses and right-hand sides, the costs and the column bounds.
+Two parameter sets that compile to the same model share one entry, no
+matter how they were built or in which process.
+
+Every entry is one ``.npy`` file in the cache directory holding
+
+    [status code, objective, N, M, n_cols, n_rows, values..., duals...]
+
+and is opened memory-mapped, so a hit returns views into the page cache
+without reading or unpickling anything.  The directory is bounded by
+``max_bytes``; the least recently used entries are deleted first.
+Entries are written to a temporary file and renamed into place, so
+several processes (e.g. ``water_sweep`` workers) can share a directory.
+
+Example:
+    cache = SolutionCache("~/.cache/water")
+    result = cache.solve(water_model.build_model(params), backend="highs")
+"""
+
+import collections
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import water_model as wm
+
+# Entry header: status code, objective, N, M, n_cols, n_rows
+_HEADER = 6
+_STATUSES = ("Optimal", "Infeasible", "Unbounded", "Not Solved", "Undefined")
+
+
+def model_key(compiled):
+    """Return the hex digest identifying the numerical content of ``compiled``."""
+    A = compiled.A.tocsr()
+    if not A.has_canonical_format:
+        A = A.copy()
+        A.sum_duplicates()
+    h = hashlib.blake2b(digest_size=20)
+    h.update(np.asarray(compiled.shape + A.shape, dtype=np.int64).tobytes())
+    for arr, dtype in ((A.indptr, np.int64), (A.indices, np.int64), (A.data, np.float64),
+                       (compiled.sense, np.int8), (compiled.rhs, np.float64), (compiled.c, np.float64),
+                       (compiled.lb, np.float64), (compiled.ub, np.float64)):
+        h.update(np.ascontiguousarray(arr, dtype=dtype))
+    return h.hexdigest()
+
+
+class SolutionCache:
+    """LRU cache of solutions in the directory ``path``.
+
+    ``max_bytes`` bounds the total size of the entry files.  ``hits`` and
+    ``misses`` count lookups since the cache was opened.
+    """
+
+    def __init__(self, path, max_bytes=256 * 2 ** 20):
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        # key -> (size in bytes, memory map or None until first use), least recent first
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        found = []
+        for name in os.listdir(self.path):
+            if name.endswith(".npy"):
+                st = os.stat(os.path.join(self.path, name))
+                found.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = (size, None)
+            self._bytes += size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries or os.path.exists(self._file(key))
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".npy")
+
+    def get(self, key, compiled=None):
+        """Return the cached result for ``key``, or None.
+
+        With the model ``compiled`` the result has the keys of
+        ``water_model.solve``, ``x`` shaped by ``compiled.x_matrix``;
+        without it, ``activity`` is missing and ``x`` is the first N x M
+        columns.  ``values`` and ``duals`` are read-only views of the
+        entry file.  An entry another process wrote after this cache was
+        opened is found on disk.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            try:
+                size = os.path.getsize(self._file(key))
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            entry = self._entries[key] = (size, None)
+            self._bytes += size
+        size, data = entry
+        if data is None:
+            try:
+                data = np.load(self._file(key), mmap_mode="r")
+            except (FileNotFoundError, ValueError):
+                # evicted by another process, or a torn entry
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries[key] = (size, data)
+        self._entries.move_to_end(key)
+        self.hits += 1
+        n, m, n_cols = int(data[2]), int(data[3]), int(data[4])
+        values = data[_HEADER:_HEADER + n_cols]
+        result = {"status": _STATUSES[int(data[0])], "objective": float(data[1]), "values": values,
+                  "duals": data[_HEADER + n_cols:]}
+        if compiled is None:
+            result["x"] = values[:n * m].reshape(n, m)
+        else:
+            result["x"] = compiled.x_matrix(values)
+            result["activity"] = compiled.A @ values
+        return result
+
+    def put(self, key, compiled, result):
+        """Store ``result`` (a ``water_model.solve`` dict) under ``key``."""
+        n, m = compiled.shape
+        header = [_STATUSES.index(result["status"]) if result["status"] in _STATUSES else len(_STATUSES) - 1,
+                  result["objective"], n, m, compiled.n_cols, compiled.n_rows]
+        duals = result.get("duals")
+        if duals is None:
+            duals = np.full(compiled.n_rows, np.nan)
+        data = np.concatenate([np.asarray(header, dtype=float), np.asarray(result["values"], dtype=float),
+                               np.asarray(duals, dtype=float)])
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp, self._file(key))
+        if key in self._entries:
+            self._bytes -= self._entries[key][0]
+        size = os.path.getsize(self._file(key))
+        self._entries[key] = (size, None)
+        self._entries.move_to_end(key)
+        self._bytes += size
+        self._evict()
+
+    def _drop(self, key):
+        size, _ = self._entries.pop(key)
+        self._bytes -= size
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+
+    def close(self):
+        """Record the recency order in the file times and release the memory maps."""
+        start = time.time() - len(self._entries)
+        for k, key in enumerate(self._entries):
+            try:
+                os.utime(self._file(key), (start + k, start + k))
+            except FileNotFoundError:
+                pass
+            self._entries[key] = (self._entries[key][0], None)
+
+    def clear(self):
+        """Delete every entry."""
+        for key in list(self._entries):
+            self._drop(key)
+
+    def solve(self, compiled, msg=False, backend="highs"):
+        """Return the cached solution of ``compiled``, solving and storing it on a miss.
+
+        Any backend's optimum is reused for the same model: when the
+        optimum is not unique, a hit may return a different optimal vertex
+        than ``backend`` would.
+        """
+        key = model_key(compiled)
+        result = self.get(key, compiled)
+        if result is None:
+            result = wm.solve(compiled, msg=msg, backend=backend)
+            self.put(key, compiled, result)
+        return result
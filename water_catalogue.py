@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Declarative registry of the 50 conditions and lazy constraint generation.
+
+CODE-JCR-WATER-V7-B-25.py defines parameters for 50 conditions but adds
+about half of them to the model.  ``CONDITIONS`` describes every one:
+
+- ``kind="bound"``: condition 0, x >= 0, a column bound;
+- ``kind="model"``: the 25 conditions the script builds, compiled by
+  ``water_model.build_model`` under their family name;
+- ``kind="row"``: the conditions the script leaves out, each a weighted
+  sum of x compared with a right-hand side,
+
+      sum w[i, j] x[i, j]  (sense)  rhs            per="total"
+      sum_i w[i, j] x[i, j]  (sense)  rhs[j]       per="sector", one row per j
+
+  where ``share`` turns the right-hand side into a proportion of the
+  flow being summed (sum (w - share) x  (sense)  0), as the script does
+  for Rmin and Lmin;
+- ``kind="route"``: conditions 45 and 49, fixed costs of opening a
+  source-to-sector route (``F``/``F_max``, ``Minfij``/``Minf_min``), which
+  need binary variables and are handled by ``water_investment``.
+
+The script gives no formula for the conditions it leaves out; the
+formulations here follow their names and units and are documented per
+entry.  Several mix annual and daily units with the script's data:
+the rows of ``INCONSISTENT`` cannot hold together with the script's
+conditions for its parameters (each one alone makes the model
+infeasible), so the default catalogue leaves them out; pass
+``conditions=LINEAR`` to include them.
+
+``lazy_solve`` starts from a small core of conditions, solves, checks
+every other row of the catalogue against the solution with one sparse
+product, adds only the violated rows to the HiGHS instance and re-solves
+from the previous basis, until no row is violated.
+
+Example:
+    full = build_catalogue()
+    result = lazy_solve()
+    print(format_lazy(result))
+"""
+
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+import water_highs as whs
+import water_model as wm
+
+
+class Condition:
+    """One numbered condition of the script; see the module docstring for ``kind``."""
+
+    def __init__(self, number, name, kind, text, weight=None, share=None, sense=None, rhs=None, per="total"):
+        self.number = number
+        self.name = name
+        self.kind = kind
+        self.text = text
+        self.weight = weight
+        self.share = share
+        self.sense = sense
+        self.rhs = rhs
+        self.per = per
+
+    def __repr__(self):
+        return "Condition(%d, %r, %s)" % (self.number, self.name, self.kind)
+
+    def add_rows(self, rb, p):
+        """Append this condition's rows to the ``water_model._RowBuilder`` ``rb``."""
+        n, m = len(p["A"]), len(p["D"])
+        w = _value(self.weight, p, (n, m))
+        rhs = _value(self.rhs, p, (m,) if self.per == "sector" else ()) if self.rhs is not None else 0.0
+        if self.per == "total":
+            coef = w - _value(self.share, p, ()) if self.share is not None else w
+            rb.add_dense(self.name, self.number, coef, self.sense, rhs)
+        else:
+            coef = w - _value(self.share, p, (m,))[None, :] if self.share is not None else w
+            coef = np.broadcast_to(coef, (n, m)).ravel()
+            cell = np.flatnonzero(coef)
+            rb.add(self.name, self.number, cell % m, cell, coef[cell], m, self.sense, rhs,
+                   labels=np.arange(1, m + 1))
+
+
+def _value(spec, p, shape):
+    """A parameter name, a function of the parameters or a constant, broadcast to ``shape``."""
+    if callable(spec):
+        value = spec(p)
+    elif isinstance(spec, str):
+        value = p[spec]
+    else:
+        value = spec
+    return np.broadcast_to(np.asarray(value, dtype=float), shape)
+
+
+def _sectors(key):
+    def mask(p):
+        n, m = len(p["A"]), len(p["D"])
+        w = np.zeros((n, m))
+        w[:, np.asarray(p[key], dtype=np.int64) - 1] = 1.0
+        return w
+    return mask
+
+
+def _sources(key):
+    def mask(p):
+        n, m = len(p["A"]), len(p["D"])
+        w = np.zeros((n, m))
+        w[np.asarray(p[key], dtype=np.int64) - 1, :] = 1.0
+        return w
+    return mask
+
+
+def _ones(p):
+    return np.ones((len(p["A"]), len(p["D"])))
+
+
+LE, EQ, GE = wm.LE, wm.EQ, wm.GE
+
+CONDITIONS = (
+    Condition(0, "Non_Negativity", "bound", "x[i, j] >= 0"),
+    Condition(1, "Water_Availability_Source", "model", "sum_j x[i, j] <= A[i]"),
+    Condition(2, "Sector_Demand", "model", "sum_i x[i, j] >= D[j]"),
+    Condition(3, "Treatment_Capacity", "model", "sum x <= Ct"),
+    Condition(4, "Water_Quality_Cost", "model", "sum Qij x <= Q_max"),
+    Condition(5, "Max_Budget", "model", "Total_Cost <= B"),
+    Condition(6, "Environmental_Sustainability", "model", "sum CEij x <= Emax"),
+    Condition(7, "Equity_Distribution", "model", "equal service ratios of consecutive sectors"),
+    Condition(8, "Energy_Efficiency", "model", "sum ENij x <= ENlim"),
+    Condition(9, "Use_of_Wastewater", "model", "greywater >= Rmin * sum x"),
+    Condition(10, "Infrastructure_Capacity", "model", "sum Tr x <= Cinfra * sum x"),
+    Condition(11, "Limit_Drinking_Water", "model", "potable water <= Pmax"),
+    Condition(12, "Use_of_Rainwater", "model", "rainwater >= Lmin * sum x"),
+    Condition(13, "Max_Daily_Consumption_Sector", "model", "sum_i x[i, j] <= Dijmax[j]"),
+    Condition(14, "Cleaning_Proportion", "row", "cleaning sectors <= Imax * sum x",
+              weight=_sectors("cleaning_sectors"), share="Imax", sense=LE),
+    Condition(15, "Protection_Aquifers", "model", "sum Aij x <= Amax"),
+    Condition(16, "Maintaining_Water_Quality", "model", "sum Qij x >= Qmin * sum x"),
+    Condition(17, "Storage_Capacity", "model", "sum Sij x <= Smax"),
+    Condition(18, "Delivery_Time_Limit", "model", "sum tij x <= Treq"),
+    Condition(19, "Irrigation_Proportion", "row", "irrigation sectors >= I_min * sum x",
+              weight=_sectors("irrigation_sectors"), share="I_min", sense=GE),
+    Condition(20, "Resilience_Droughts", "model", "sum x >= R_drought"),
+    Condition(21, "Energy_Cost_Optimization", "model", "sum C_Eij x <= E_cost_max"),
+    Condition(22, "CO2_Emissions", "row", "sum C_CO2ij x <= CO2_max",
+              weight="C_CO2ij", sense=LE, rhs="CO2_max"),
+    Condition(23, "Surface_Water_Limit", "row", "sum S_ij x <= S_max",
+              weight="S_ij", sense=LE, rhs="S_max"),
+    # concentrations (mg/L, pH, ratios) bound the flow-weighted average
+    Condition(24, "Wastewater_Contamination", "row", "sum W_ij x <= W_max * sum x",
+              weight="W_ij", share="W_max", sense=LE),
+    Condition(25, "Water_Reuse", "row", "sum R_ij x >= R_min * sum x",
+              weight="R_ij", share="R_min", sense=GE),
+    Condition(26, "Compliance_Local_Regulations", "model", "x[i, j] <= L_norm"),
+    Condition(27, "Water_Balance", "model", "sum x >= B_hidro"),
+    Condition(28, "Equitable_Distribution_Scarcity", "model", "equal service ratios of all sector pairs"),
+    Condition(29, "Maintenance_Strategic_Reserves", "model", "strategic sectors <= R_strategic"),
+    Condition(30, "Minimize_Leak_Losses", "model", "sum L x <= L_max * sum x"),
+    Condition(31, "Greywater_Limit", "row", "greywater <= G_max * sum x",
+              weight=_sources("greywater_sources"), share="G_max", sense=LE),
+    Condition(32, "Per_Capita_Consumption", "row", "sum_i x[i, j] <= C_max * P[j]",
+              weight=_ones, sense=LE, rhs=lambda p: p["C_max"] * np.asarray(p["P"]), per="sector"),
+    Condition(33, "Water_Saving_Technologies", "row", "sum T_save x >= T_min",
+              weight="T_save", sense=GE, rhs="T_min"),
+    Condition(34, "Aquatic_Ecosystem_Protection", "model", "sum x <= E_safe"),
+    Condition(35, "Continuous_Improvement", "row", "sum M_improve x >= M_min",
+              weight="M_improve", sense=GE, rhs="M_min"),
+    Condition(36, "Sediment_Control", "row", "sum SED x <= SED_max * sum x",
+              weight="SED", share="SED_max", sense=LE),
+    Condition(37, "Stormwater_Management", "row", "stormwater <= P_min (management capacity)",
+              weight=_sources("stormwater_sources"), sense=LE, rhs="P_min"),
+    Condition(38, "Salinity_Limit", "row", "sum SAL x <= SAL_max * sum x",
+              weight="SAL", share="SAL_max", sense=LE),
+    Condition(39, "Nitrate_Limit", "row", "sum NO3 x <= NO3_max * sum x",
+              weight="NO3", share="NO3_max", sense=LE),
+    Condition(40, "Universal_Water_Access", "row", "sum_i x[i, j] >= U_min[j]",
+              weight=_ones, sense=GE, rhs="U_min", per="sector"),
+    Condition(41, "Natural_Source_Extraction", "row", "sum_i N[i, j] x[i, j] <= N_max[j]",
+              weight="N", sense=LE, rhs="N_max", per="sector"),
+    Condition(42, "Wastewater_Treatment", "row", "sum_i T_resid[i, j] x[i, j] >= S_min[j]",
+              weight="T_resid", sense=GE, rhs="S_min", per="sector"),
+    Condition(43, "International_Standards", "row", "sum_i I[i, j] x[i, j] <= I_std[j]",
+              weight="I", sense=LE, rhs="I_std", per="sector"),
+    Condition(44, "Micropollutant_Limit", "row", "sum_i M[i, j] x[i, j] <= M_max[j] * sum_i x[i, j]",
+              weight="M", share="M_max", sense=LE, per="sector"),
+    Condition(45, "Financial_Resources", "route", "sum F[i, j] open[i, j] <= F_max"),
+    Condition(46, "Infiltration_Prevention", "row", "sum INF x <= INF_max * sum x",
+              weight="INF", share="INF_max", sense=LE),
+    Condition(47, "pH_Control", "row", "sum pH x <= pH_max * sum x",
+              weight="pH_Control", share="pH_max", sense=LE),
+    Condition(48, "Quality_Monitoring", "row", "sum Q_mon x >= Q_mon_min * sum x",
+              weight="Q_mon", share="Q_mon_min", sense=GE),
+    Condition(49, "Infrastructure_Maintenance", "route", "sum Minfij open[i, j] >= Minf_min"),
+    Condition(50, "Education_Awareness", "row", "sum Eij x >= Emin",
+              weight="Eij", sense=GE, rhs="Emin"),
+)
+
+# Every condition number; the linear ones (kind "model" or "row")
+ALL = tuple(c.number for c in CONDITIONS)
+LINEAR = tuple(c.number for c in CONDITIONS if c.kind in ("model", "row"))
+
+# Rows that cannot hold together with the script's conditions for its data:
+# 14 and 19 fix sector shares that the equal service ratios of 7 and 28 rule
+# out; 33, 35, 40, 41 and 42 are annual hm3 or m3 targets that the daily
+# per-cell cap L_norm of condition 26 cannot reach
+INCONSISTENT = (14, 19, 33, 35, 40, 41, 42)
+
+# Conditions of the default catalogue and of the default lazy core
+DEFAULT = tuple(k for k in LINEAR if k not in INCONSISTENT)
+CORE = (1, 2)
+
+
+def condition(number):
+    """Return the ``Condition`` with ``number``."""
+    return CONDITIONS[number]
+
+
+def build_catalogue(params=None, conditions=DEFAULT, equity="pairwise"):
+    """Compile the linear ``conditions`` (numbers) into one model.
+
+    The script's conditions come first, in the script's order (see
+    ``water_model.build_model``), followed by the other conditions in
+    number order.  Bound and route conditions are skipped.
+    """
+    p = wm.default_parameters() if params is None else params
+    wanted = set(conditions)
+    exclude = tuple(c.name for c in CONDITIONS if c.kind == "model" and c.number not in wanted)
+    with wm._phase("build") as info:
+        base = wm._build_model(p, exclude, equity)
+        rb = wm._RowBuilder(base.n_cols)
+        for c in CONDITIONS:
+            if c.kind == "row" and c.number in wanted:
+                c.add_rows(rb, p)
+        A2, sense2, rhs2, fams2 = rb.finish()
+        offset = base.n_rows
+        families = list(base.families) + [
+            wm.RowFamily(f.name, f.condition, f.start + offset, f.stop + offset, f.labels, f.names) for f in fams2]
+        model = wm.CompiledModel(base.shape, sp.vstack([base.A, A2], format="csr"),
+                                 np.concatenate([base.sense, sense2]), np.concatenate([base.rhs, rhs2]),
+                                 base.c, base.lb, base.ub, families, p, base.aux_names)
+        info["rows"], info["terms"] = model.n_rows, model.nnz
+    return model
+
+
+def _submodel(full, rows):
+    """The rows ``rows`` of ``full`` as a model HiGHS can load (no families)."""
+    return wm.CompiledModel(full.shape, full.A[rows], full.sense[rows], full.rhs[rows], full.c, full.lb,
+                            full.ub, [], full.params, full.aux_names)
+
+
+def lazy_solve(params=None, conditions=DEFAULT, core=CORE, equity="pairwise", tol=1e-7, max_rounds=100,
+               full=None):
+    """Solve the catalogue of ``conditions`` by generating violated rows on demand.
+
+    ``core`` lists the condition numbers whose rows are loaded from the
+    start.  Each round adds every row violated by more than
+    ``tol * max(1, |rhs|)``.  Returns the ``water_model.solve`` dict for
+    the full catalogue (activity and duals of every row, zero duals for
+    rows never added) plus ``rounds`` (rows added per round), ``active``
+    (row numbers loaded), ``rows_full``, ``iterations``, ``violated``
+    (rows still violated) and ``wall``.  When ``max_rounds`` stops the
+    loop with rows still violated, the status is "Not Solved" and the
+    solution, objective and duals are those of the last relaxation (its
+    objective is a lower bound).  ``full`` may pass a catalogue already
+    built.
+    """
+    start = time.perf_counter()
+    if full is None:
+        full = build_catalogue(params, conditions, equity)
+    core = set(core)
+    active = np.zeros(full.n_rows, dtype=bool)
+    for fam in full.families:
+        if fam.condition in core:
+            active[fam.rows] = True
+    scale = np.maximum(1.0, np.abs(full.rhs))
+    h = whs.make_highs(_submodel(full, np.flatnonzero(active)))
+    order = np.flatnonzero(active)
+    inf = whs._import_highspy().kHighsInf
+    rounds = []
+    iterations = 0
+    while True:
+        violated = np.zeros(0, dtype=np.int64)
+        status = whs.run(h)
+        iterations += h.getInfo().simplex_iteration_count
+        if status != "Optimal":
+            break
+        values = np.asarray(h.getSolution().col_value)
+        slack = wm.row_slack(full, full.A @ values)
+        violated = np.flatnonzero(~active & (slack < -tol * scale))
+        if not violated.size or len(rounds) >= max_rounds:
+            break
+        sub = full.A[violated]
+        lower, upper = whs.row_bounds(full.sense[violated], full.rhs[violated], inf)
+        h.addRows(violated.size, lower, upper, sub.nnz, sub.indptr[:-1].astype(np.int32),
+                  sub.indices.astype(np.int32), sub.data.astype(float))
+        active[violated] = True
+        order = np.concatenate([order, violated])
+        rounds.append(int(violated.size))
+
+    values = np.full(full.n_cols, np.nan)
+    duals = np.full(full.n_rows, np.nan)
+    objective = np.nan
+    if status == "Optimal":
+        sol = h.getSolution()
+        values = np.asarray(sol.col_value)
+        duals = np.zeros(full.n_rows)
+        duals[order] = np.asarray(sol.row_dual)
+        objective = h.getInfo().objective_function_value
+        if violated.size:
+            status = "Not Solved"
+    return {"status": status, "violated": int(violated.size), "objective": objective, "values": values, "duals": duals,
+            "x": full.x_matrix(values), "activity": full.A @ values, "rounds": rounds,
+            "active": np.flatnonzero(active), "rows_full": full.n_rows, "iterations": iterations,
+            "wall": time.perf_counter() - start, "model": full}
+
+
+def format_lazy(result):
+    """Summarize a ``lazy_solve`` result: rows per round and the conditions that needed rows."""
+    full = result["model"]
+    lines = ["Status: %s, Total_Cost = %.6f" % (result["status"], result["objective"]),
+             "rows loaded %d of %d (%.1f%%), %d rounds adding %s, %d simplex iterations, %.1f ms" % (
+                 len(result["active"]), result["rows_full"], 100.0 * len(result["active"]) / result["rows_full"],
+                 len(result["rounds"]), result["rounds"], result["iterations"], result["wall"] * 1e3)]
+    active = np.zeros(full.n_rows, dtype=bool)
+    active[result["active"]] = True
+    for fam in full.families:
+        used = int(active[fam.rows].sum())
+        if used:
+            lines.append("  %2d %-35s %6d / %d rows" % (fam.condition, fam.name, used, len(fam)))
+    return "\n".join(lines)
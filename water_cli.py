@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Command-line entry point for the Water_Management model.
+
+CODE-JCR-WATER-V7-B-25.py builds and solves its model while it is being
+imported, from 50 blocks of module globals, some of which are silently
+redefined (``D`` three times, ``Qij``, ``Eij`` and ``M`` twice; the last
+definition wins).  This entry point loads a parameter set from a JSON or
+TOML file instead and imports PuLP or the solver only when a solve is
+requested:
+
+    python water_cli.py defaults > base.json        # the script's data
+    python water_cli.py validate config.toml        # shapes, finiteness, indices
+    python water_cli.py solve config.toml --backend highs --set "A[2]=2e6"
+    python water_cli.py solve config.json --output result.json --timing
+
+A configuration holds a ``[parameters]`` table (or top-level keys) with
+any subset of the parameters of ``water_model.default_parameters()``; the
+others keep the script's values.  An optional ``[model]`` table sets
+``equity``, ``backend`` and ``exclude`` (family names); they are checked
+when the file is loaded, so ``validate`` rejects bad ones too.  A
+parameter given twice in a JSON file is an error rather than a silent
+overwrite (TOML rejects duplicates by itself).  ``--timing`` prints the
+time of each step since the entry point started to stderr.
+"""
+
+import time
+
+_START = time.perf_counter()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import sys  # noqa: E402
+
+import numpy as np  # noqa: E402
+
+import water_model as wm  # noqa: E402
+
+BACKENDS = ("cbc", "highs", "linprog")
+
+
+def _unique_keys(pairs):
+    """JSON object hook that rejects repeated keys."""
+    obj = {}
+    for key, value in pairs:
+        if key in obj:
+            raise ValueError("parameter %r is defined more than once" % key)
+        obj[key] = value
+    return obj
+
+
+def load_config(path):
+    """Return ``(parameters, options)`` from a JSON or TOML file.
+
+    ``parameters`` is a complete parameter set (the file's values over
+    ``default_parameters()``) and ``options`` the ``model`` table.
+    """
+    if str(path).endswith(".toml"):
+        import tomllib
+
+        with open(path, "rb") as f:
+            try:
+                config = tomllib.load(f)
+            except tomllib.TOMLDecodeError as exc:
+                raise ValueError("%s: %s" % (path, exc)) from None
+    else:
+        with open(path) as f:
+            config = json.load(f, object_pairs_hook=_unique_keys)
+    options = _check_options(path, config.get("model", {}))
+    given = config.get("parameters", {k: v for k, v in config.items() if k != "model"})
+    params = wm.default_parameters()
+    for key, value in given.items():
+        if key not in params:
+            raise KeyError("unknown parameter %r" % key)
+        try:
+            if key in wm.INDEX_PARAMETERS:
+                params[key] = [int(k) for k in value]
+            elif isinstance(value, (list, tuple)):
+                params[key] = np.asarray(value, dtype=float)
+            else:
+                params[key] = float(value)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("%s: parameter %r: %s" % (path, key, exc)) from None
+    return params, options
+
+
+def _check_options(path, model):
+    """Return the ``model`` table as a dict; raises ValueError for an unknown key or value."""
+    if not isinstance(model, dict):
+        raise ValueError("%s: model must be a table" % path)
+    options = dict(model)
+    unknown = sorted(set(options) - {"equity", "backend", "exclude"})
+    if unknown:
+        raise ValueError("%s: unknown model options %s" % (path, ", ".join(unknown)))
+    for key, allowed in (("equity", wm.EQUITY_FORMULATIONS), ("backend", BACKENDS)):
+        if key in options and options[key] not in allowed:
+            raise ValueError("%s: model %s %r, expected one of %s" % (path, key, options[key], ", ".join(allowed)))
+    exclude = options.get("exclude", [])
+    if isinstance(exclude, str) or not isinstance(exclude, (list, tuple)):
+        raise ValueError("%s: model exclude must be a list of condition family names" % path)
+    if exclude:
+        built = wm.build_model(equity=options.get("equity", "pairwise"))
+        families = {fam.name for fam in built.families}
+        unknown = sorted(str(name) for name in exclude if name not in families)
+        if unknown:
+            raise ValueError("%s: model exclude names unknown families %s" % (path, ", ".join(unknown)))
+    return options
+
+
+def _parse_set(items):
+    """``KEY=VALUE`` strings -> overrides dict, VALUE parsed as JSON."""
+    overrides = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError("--set expects KEY=VALUE, got %r" % item)
+        overrides[key.strip()] = json.loads(value)
+    return overrides
+
+
+def _jsonable(params):
+    return {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in params.items()}
+
+
+class _Clock:
+    """Step timer for --timing, relative to the start of this module."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.last = _START
+        if enabled:
+            self.lap("import")
+
+    def lap(self, step):
+        now = time.perf_counter()
+        if self.enabled:
+            sys.stderr.write("%-10s %9.2f ms  (%.2f ms since start)\n" % (
+                step, (now - self.last) * 1e3, (now - _START) * 1e3))
+        self.last = now
+
+
+def _print_result(compiled, result):
+    # the script's output
+    print("Status:", result["status"])
+    if result["status"] == "Optimal":
+        for name, value in zip(compiled.col_names(), result["values"]):
+            print(name, "=", value)
+        print("Total Cost of Water Supply = ", result["objective"])
+    else:
+        print("No optimal solution found.")
+
+
+def _write_result(path, compiled, result):
+    if str(path).endswith((".parquet", ".arrow", ".feather")):
+        import water_export
+
+        with water_export.ResultWriter(path, compiled) as writer:
+            writer.write(0, result)
+        return
+    objective = result["objective"]
+    with open(path, "w") as f:
+        json.dump({"status": result["status"],
+                   "objective": None if np.isnan(objective) else float(objective),
+                   "x": np.where(np.isnan(result["x"]), None, result["x"]).tolist(),
+                   "col_names": compiled.col_names(), "values": result["values"].tolist(),
+                   "row_names": compiled.row_names(), "activity": result["activity"].tolist(),
+                   "duals": result["duals"].tolist()}, f, indent=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="water_cli", description="Water_Management model")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("defaults", help="print the script's parameter set as JSON")
+    for name in ("validate", "solve"):
+        p = sub.add_parser(name)
+        p.add_argument("config", nargs="?", help="JSON or TOML parameter file (default: the script's data)")
+        p.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                       help="override a parameter or one entry, e.g. Ct=5e5 or 'A[2]=2e6'")
+        p.add_argument("--timing", action="store_true", help="print step times to stderr")
+    solve = sub.choices["solve"]
+    solve.add_argument("--backend", choices=BACKENDS)
+    solve.add_argument("--equity", choices=wm.EQUITY_FORMULATIONS)
+    solve.add_argument("--output", help="write the result to a .json, .parquet or .arrow file")
+    args = parser.parse_args(argv)
+
+    if args.command == "defaults":
+        json.dump(_jsonable(wm.default_parameters()), sys.stdout, indent=1)
+        sys.stdout.write("\n")
+        return 0
+
+    clock = _Clock(args.timing)
+    try:
+        if args.config:
+            params, options = load_config(args.config)
+        else:
+            params, options = wm.default_parameters(), {}
+        params = wm.apply_overrides(params, _parse_set(args.set))
+    except (OSError, ValueError, KeyError, IndexError, TypeError) as exc:
+        sys.stderr.write("error: %s\n" % (exc.args[0] if isinstance(exc, KeyError) else exc))
+        return 2
+    clock.lap("load")
+    problems = wm.check_parameters(params)
+    clock.lap("validate")
+    if problems:
+        for problem in problems:
+            sys.stderr.write("invalid: %s\n" % problem)
+        return 1
+    if args.command == "validate":
+        print("ok: %d sources x %d sectors" % (len(params["A"]), len(params["D"])))
+        return 0
+
+    equity = args.equity or options.get("equity", "pairwise")
+    backend = args.backend or options.get("backend", "cbc")
+    compiled = wm.build_model(params, exclude=tuple(options.get("exclude", ())), equity=equity)
+    clock.lap("build")
+    # PuLP or highspy is imported here, on the first solve
+    result = wm.solve(compiled, backend=backend)
+    clock.lap("solve")
+    if args.output:
+        _write_result(args.output, compiled, result)
+    else:
+        _print_result(compiled, result)
+    clock.lap("output")
+    return 0 if result["status"] == "Optimal" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar export of solved scenarios to Parquet or Arrow IPC files.
+
+The script prints every variable and the objective; for large sweeps
+parsing that text is slower than solving.  ``ResultWriter`` streams
+results into a file instead, one row per scenario:
+
+    scenario   int64
+    status     dictionary<string>
+    objective  float64
+    overrides  string (JSON of the scenario's parameter overrides)
+    values     fixed_size_list<float64>[n_cols]   column values, x[i, j] first
+    activity   fixed_size_list<float64>[n_rows]   A @ values
+    duals      fixed_size_list<float64>[n_rows]
+
+Column and constraint names are stored once, in the schema metadata
+(``col_names`` / ``row_names``, JSON lists), not per row.  Results are
+buffered in preallocated arrays of ``chunk_size`` scenarios and written
+as one record batch (Parquet row group) when the buffer is full, so
+memory stays bounded by ``chunk_size`` however long the sweep is.
+
+Requires ``pyarrow`` (pip install pyarrow).
+
+Example:
+    with ResultWriter("sweep.parquet", water_model.build_model()) as writer:
+        water_sweep.sweep(scenarios, writer=writer)
+    table = pyarrow.parquet.read_table("sweep.parquet")
+"""
+
+import json
+
+import numpy as np
+
+# Dictionary of the status column: every PuLP status string
+STATUSES = ("Optimal", "Infeasible", "Unbounded", "Not Solved", "Undefined")
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ImportError("result export needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+class ResultWriter:
+    """Streaming writer of solve results for models shaped like ``compiled``.
+
+    ``path`` ending in ``.arrow`` or ``.feather`` writes an Arrow IPC file,
+    anything else Parquet (``compression`` applies to Parquet only).
+    ``duals`` and ``activity`` may be switched off to save space.
+    """
+
+    def __init__(self, path, compiled, chunk_size=1024, activity=True, duals=True, compression="zstd"):
+        pa = _import_pyarrow()
+        self._pa = pa
+        self.path = path
+        self.chunk_size = chunk_size
+        self.n_cols = compiled.n_cols
+        self.n_rows = compiled.n_rows
+        self.written = 0
+        fields = [pa.field("scenario", pa.int64()), pa.field("status", pa.dictionary(pa.int8(), pa.string())),
+                  pa.field("objective", pa.float64()), pa.field("overrides", pa.string()),
+                  pa.field("values", pa.list_(pa.float64(), self.n_cols))]
+        self._vectors = {"values": np.empty((chunk_size, self.n_cols))}
+        for name, wanted in (("activity", activity), ("duals", duals)):
+            if wanted:
+                fields.append(pa.field(name, pa.list_(pa.float64(), self.n_rows)))
+                self._vectors[name] = np.empty((chunk_size, self.n_rows))
+        metadata = {"shape": json.dumps(list(compiled.shape)), "col_names": json.dumps(compiled.col_names()),
+                    "row_names": json.dumps(compiled.row_names())}
+        self.schema = pa.schema(fields, metadata=metadata)
+
+        self._scenario = np.empty(chunk_size, dtype=np.int64)
+        self._objective = np.empty(chunk_size)
+        self._status = np.empty(chunk_size, dtype=np.int8)
+        self._overrides = []
+        self._fill = 0
+        if str(path).endswith((".arrow", ".feather")):
+            self._sink = pa.OSFile(str(path), "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        else:
+            self._sink = None
+            self._writer = pa.parquet.ParquetWriter(str(path), self.schema, compression=compression)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, scenario, result, overrides=None):
+        """Buffer one result (a ``water_model.solve`` dict) of scenario number ``scenario``."""
+        k = self._fill
+        self._scenario[k] = scenario
+        self._objective[k] = result["objective"]
+        status = result["status"]
+        self._status[k] = STATUSES.index(status) if status in STATUSES else len(STATUSES) - 1
+        self._overrides.append(json.dumps(overrides or {}, default=_json_value, sort_keys=True))
+        for name, buffer in self._vectors.items():
+            value = result.get(name)
+            buffer[k] = np.nan if value is None else value
+        self._fill += 1
+        if self._fill == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered results as one record batch."""
+        k = self._fill
+        if k == 0:
+            return
+        pa = self._pa
+        status = pa.DictionaryArray.from_arrays(pa.array(self._status[:k]), pa.array(STATUSES, pa.string()))
+        arrays = [pa.array(self._scenario[:k]), status,
+                  pa.array(self._objective[:k]), pa.array(self._overrides, pa.string())]
+        for name, buffer in self._vectors.items():
+            width = buffer.shape[1]
+            arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(buffer[:k].ravel()), width))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        self._writer.write_batch(batch)
+        self.written += k
+        self._fill = 0
+        self._overrides = []
+
+    def close(self):
+        """Flush and close the file."""
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        self._writer = None
+
+
+def _json_value(value):
+    """JSON encoding of NumPy overrides."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("cannot encode %r" % type(value))
+
+
+def read_results(path, columns=None):
+    """Read a file written by ``ResultWriter`` back into NumPy columns.
+
+    Vector columns come back as 2-D arrays (scenarios x width); the names
+    stored in the schema metadata are returned under ``"col_names"`` and
+    ``"row_names"``.
+    """
+    pa = _import_pyarrow()
+    if str(path).endswith((".arrow", ".feather")):
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+    else:
+        table = pa.parquet.read_table(str(path), columns=columns)
+    if columns is not None:
+        table = table.select(columns)
+    out = {}
+    for name in table.column_names:
+        column = table.column(name).combine_chunks()
+        if pa.types.is_fixed_size_list(column.type):
+            out[name] = column.flatten().to_numpy().reshape(len(column), column.type.list_size)
+        elif pa.types.is_dictionary(column.type) or pa.types.is_string(column.type):
+            out[name] = column.to_pylist()
+        else:
+            out[name] = column.to_numpy()
+    meta = table.schema.metadata or {}
+    for key in (b"col_names", b"row_names"):
+        if key in meta:
+            out[key.decode()] = json.loads(meta[key])
+    return out
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+HiGHS glue for the compiled Water_Management model.
+
+``PersistentModel`` keeps one HiGHS instance loaded with the compiled
+constraint matrix.  Right-hand sides, constraint coefficients and objective
+coefficients are changed in place by constraint name, and every ``solve``
+restarts the dual simplex from the basis of the previous solve instead of
+rebuilding the ``pl.LpProblem`` and starting CBC from scratch.
+
+Requires ``highspy`` (pip install highspy).
+
+Example:
+    pm = PersistentModel(water_model.build_model())
+    pm.solve()
+    pm.set_rhs("Treatment_Capacity", 500000)
+    pm.set_parameter("E_safe", 300000)
+    result = pm.solve()
+"""
+
+import copy
+
+import numpy as np
+
+import water_model as wm
+
+# HiGHS model status -> PuLP status string, as printed by the script
+_STATUS = {
+    "kOptimal": "Optimal",
+    "kInfeasible": "Infeasible",
+    "kUnboundedOrInfeasible": "Infeasible",
+    "kUnbounded": "Unbounded",
+    "kNotset": "Not Solved",
+    "kModelEmpty": "Optimal",
+}
+
+
+# Row families whose x[i, j] coefficients are 1 / D[j]
+_EQUITY_FAMILIES = ("Equitable_Distribution_Scarcity", "Equity_Distribution")
+
+
+def _import_highspy():
+    try:
+        import highspy
+    except ImportError:
+        raise ImportError("the HiGHS backend needs highspy (pip install highspy)") from None
+    return highspy
+
+
+def row_bounds(sense, rhs, inf=np.inf):
+    """Return (lower, upper) row bounds for rows ``sense`` / ``rhs``."""
+    lower = np.where(sense == wm.LE, -inf, rhs)
+    upper = np.where(sense == wm.GE, inf, rhs)
+    return lower, upper
+
+
+def make_lp(compiled):
+    """Return ``compiled`` as a ``highspy.HighsLp`` (row-wise matrix)."""
+    highspy = _import_highspy()
+    inf = highspy.kHighsInf
+
+    A = compiled.A.tocsr()
+    lp = highspy.HighsLp()
+    lp.num_col_ = compiled.n_cols
+    lp.num_row_ = compiled.n_rows
+    lp.col_cost_ = np.asarray(compiled.c, dtype=float)
+    lp.col_lower_ = np.asarray(compiled.lb, dtype=float)
+    lp.col_upper_ = np.where(np.isinf(compiled.ub), inf, compiled.ub)
+    lower, upper = row_bounds(compiled.sense, compiled.rhs, inf)
+    lp.row_lower_ = lower
+    lp.row_upper_ = upper
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+    lp.a_matrix_.num_col_ = compiled.n_cols
+    lp.a_matrix_.num_row_ = compiled.n_rows
+    lp.a_matrix_.start_ = A.indptr.astype(np.int32)
+    lp.a_matrix_.index_ = A.indices.astype(np.int32)
+    lp.a_matrix_.value_ = A.data.astype(float)
+    return lp
+
+
+def make_highs(compiled):
+    """Return a silent ``highspy.Highs`` instance holding ``compiled``."""
+    h = _import_highspy().Highs()
+    h.setOptionValue("output_flag", False)
+    h.passModel(make_lp(compiled))
+    return h
+
+
+def run(h):
+    """Run ``h`` and return its PuLP status string.
+
+    A hot start can end without a verdict (HiGHS status Unknown) on badly
+    scaled rows; the solve is then retried from scratch.
+    """
+    h.run()
+    if h.getModelStatus().name not in ("kOptimal", "kInfeasible", "kUnbounded"):
+        h.clearSolver()
+        h.run()
+    return status_of(h)
+
+
+def status_of(h):
+    """Return the PuLP status string for the last run of ``h``."""
+    return _STATUS.get(h.getModelStatus().name, "Undefined")
+
+
+class PersistentModel:
+    """Long-lived Water_Management model solved with warm-started HiGHS.
+
+    The instance owns a private copy of ``compiled``; its ``rhs``, ``A``
+    and ``c`` are kept in step with every in-place change so row names and
+    reports stay valid.
+    """
+
+    def __init__(self, compiled):
+        # a shallow copy keeps the class (e.g. MultiPeriodModel) and its extra attributes
+        self.compiled = copy.copy(compiled)
+        cm = self.compiled
+        cm.A = compiled.A.tocsr(copy=True)
+        cm.sense, cm.rhs, cm.c = compiled.sense.copy(), compiled.rhs.copy(), compiled.c.copy()
+        cm.lb, cm.ub = compiled.lb.copy(), compiled.ub.copy()
+        cm.params = dict(compiled.params)
+        self.highs = make_highs(self.compiled)
+        self._inf = _import_highspy().kHighsInf
+        self.iterations = 0
+
+    def _rows(self, name):
+        """Row numbers of a constraint name or of a whole family name."""
+        try:
+            return np.arange(self.compiled.family(name).start, self.compiled.family(name).stop)
+        except KeyError:
+            return np.array([self.compiled.row_index(name)])
+
+    def _push_bounds(self, rows):
+        cm = self.compiled
+        lower, upper = row_bounds(cm.sense[rows], cm.rhs[rows], self._inf)
+        self.highs.changeRowsBounds(len(rows), rows.astype(np.int32), lower, upper)
+
+    def set_rhs(self, name, value):
+        """Set the right-hand side of a constraint, or of every row of a family.
+
+        ``value`` may be an array with one entry per row of the family,
+        e.g. ``set_rhs("Sector_Demand", [4000, 3000, 9000])``.
+        """
+        rows = self._rows(name)
+        self.compiled.rhs[rows] = value
+        self._push_bounds(rows)
+
+    def set_rhs_row(self, row, value):
+        """Set the right-hand side of row number ``row``, or of an array of row numbers."""
+        rows = np.atleast_1d(np.asarray(row, dtype=np.int64))
+        self.compiled.rhs[rows] = value
+        self._push_bounds(rows)
+
+    def set_coefficient(self, name, i, j, value):
+        """Set the coefficient of x[i, j] (1-based) in constraint ``name``."""
+        row = self.compiled.row_index(name)
+        col = (i - 1) * self.compiled.shape[1] + (j - 1)
+        self.compiled.A[row, col] = value
+        self.highs.changeCoeff(int(row), int(col), float(value))
+
+    def set_objective(self, i, j, value):
+        """Set the Total_Cost coefficient of x[i, j] (1-based)."""
+        col = (i - 1) * self.compiled.shape[1] + (j - 1)
+        self.compiled.c[col] = value
+        self.highs.changeColCost(int(col), float(value))
+
+    def set_parameter(self, name, value):
+        """Change a model parameter that can be updated without a rebuild.
+
+        Covers ``water_model.RHS_PARAMETERS`` and the sector demands ``D``,
+        which also rescale the equity rows of conditions 7 and 28.
+        """
+        cm = self.compiled
+        if name == "D":
+            D = np.asarray(value, dtype=float)
+            cm.params["D"] = D
+            self.set_rhs("Sector_Demand", D)
+            self.scale_equity(D)
+        elif name in wm.RHS_PARAMETERS:
+            cm.params[name] = value
+            self.set_rhs(wm.RHS_PARAMETERS[name], value)
+        else:
+            raise ValueError("%r is not a right-hand-side parameter; rebuild the model instead" % name)
+
+    def has_equity(self):
+        """Whether the model has equity rows weighted by 1 / D."""
+        return any(fam.name in _EQUITY_FAMILIES for fam in self.compiled.families)
+
+    def scale_equity(self, D):
+        """Set the 1 / D[j] coefficients of the equity rows (conditions 7 and 28) for demands ``D``.
+
+        Few coefficients are changed one by one; when there are more than
+        rows in the model (pairwise equity on many sectors) the matrix is
+        reloaded and the previous basis restored, which is much faster.
+        """
+        cm = self.compiled
+        n, m = cm.shape
+        # multi-period models repeat the N * M cells and auxiliary columns every period
+        width = getattr(cm, "width", cm.n_cols)
+        changes = []
+        for fam in cm.families:
+            if fam.name not in _EQUITY_FAMILIES:
+                continue
+            lo, hi = cm.A.indptr[fam.start], cm.A.indptr[fam.stop]
+            rows = np.repeat(np.arange(fam.start, fam.stop), np.diff(cm.A.indptr[fam.start:fam.stop + 1]))
+            cols = cm.A.indices[lo:hi]
+            # only the x[i, j] entries carry 1 / D[j]; auxiliary columns keep +-1
+            cell = (cols % width) < n * m
+            data = cm.A.data[lo:hi]
+            data[cell] = np.sign(data[cell]) / D[(cols[cell] % width) % m]
+            changes.append((rows[cell], cols[cell], data[cell]))
+        if sum(r.size for r, _, _ in changes) > cm.n_rows:
+            basis = self.highs.getBasis()
+            self.highs.passModel(make_lp(cm))
+            self.highs.setBasis(basis)
+            return
+        for rows, cols, vals in changes:
+            for r, k, v in zip(rows.tolist(), cols.tolist(), vals.tolist()):
+                self.highs.changeCoeff(r, k, v)
+
+    def solve(self):
+        """Re-solve from the previous basis; returns the same dict as ``water_model.solve``."""
+        h = self.highs
+        status = run(h)
+        info = h.getInfo()
+        self.iterations = info.simplex_iteration_count
+        values = np.full(self.compiled.n_cols, np.nan)
+        duals = np.full(self.compiled.n_rows, np.nan)
+        objective = np.nan
+        if status == "Optimal":
+            sol = h.getSolution()
+            values = np.asarray(sol.col_value)
+            duals = np.asarray(sol.row_dual)
+            objective = info.objective_function_value
+        return {"status": status, "objective": objective, "values": values, "duals": duals,
+                "x": self.compiled.x_matrix(values), "activity": self.compiled.A @ values}
+
+
+def solve_highs(compiled):
+    """Solve ``compiled`` once with in-process HiGHS (no files, no subprocess)."""
+    with wm._phase("load", compiled.n_rows, compiled.nnz):
+        h = make_highs(compiled)
+    with wm._phase("solve", compiled.n_rows, compiled.nnz):
+        status = run(h)
+    with wm._phase("extract", compiled.n_rows):
+        values = np.full(compiled.n_cols, np.nan)
+        duals = np.full(compiled.n_rows, np.nan)
+        objective = np.nan
+        if status == "Optimal":
+            sol = h.getSolution()
+            values = np.asarray(sol.col_value)
+            duals = np.asarray(sol.row_dual)
+            objective = h.getInfo().objective_function_value
+    return {"status": status, "objective": objective, "values": values, "duals": duals}
+
+
+def solve_linprog(compiled):
+    """Solve ``compiled`` once with ``scipy.optimize.linprog`` (HiGHS)."""
+    from scipy.optimize import linprog
+
+    A = compiled.A.tocsr()
+    le = compiled.sense == wm.LE
+    ge = compiled.sense == wm.GE
+    eq = compiled.sense == wm.EQ
+    ineq = le | ge
+    # >= rows enter A_ub negated
+    flip = np.where(ge, -1.0, 1.0)
+    A_ub = A[ineq].multiply(flip[ineq][:, None]).tocsr()
+    b_ub = (compiled.rhs * flip)[ineq]
+    kwargs = {"A_ub": A_ub, "b_ub": b_ub}
+    if eq.any():
+        kwargs.update(A_eq=A[eq], b_eq=compiled.rhs[eq])
+    ub = np.where(np.isinf(compiled.ub), None, compiled.ub)
+    res = linprog(compiled.c, bounds=list(zip(compiled.lb, ub)), method="highs", **kwargs)
+
+    status = {0: "Optimal", 2: "Infeasible", 3: "Unbounded"}.get(res.status, "Not Solved")
+    values = np.full(compiled.n_cols, np.nan)
+    duals = np.full(compiled.n_rows, np.nan)
+    objective = np.nan
+    if status == "Optimal":
+        values = np.asarray(res.x)
+        objective = res.fun
+        # marginals are per unit of b_ub, i.e. of the negated rhs for >= rows
+        duals[ineq] = res.ineqlin.marginals * flip[ineq]
+        if eq.any():
+            duals[eq] = res.eqlin.marginals
+    return {"status": status, "objective": objective, "values": values, "duals": duals}
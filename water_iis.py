@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Irreducible infeasible subset (IIS) finder for the compiled model.
+
+When the Water_Management model is infeasible, ``find_iis`` names a
+minimal set of constraints that cannot hold together, e.g.
+``Maintenance_Strategic_Reserves`` and ``Sector_Demand_3`` when
+R_strategic is below the demand of the last sector.  Every other
+constraint can be removed and the conflict remains; removing any one of
+the named constraints resolves it.  Column bounds (x >= 0) are kept
+throughout and are not reported.
+
+The search is a deletion filter over groups of rows: a whole group is
+relaxed (its row bounds opened) and the model re-solved; if it stays
+infeasible the group is dropped at once, otherwise the group is split in
+halves.  All re-solves run on one HiGHS instance with a zero objective,
+so each one starts from the previous basis.
+
+Requires ``highspy`` (pip install highspy).
+"""
+
+import numpy as np
+
+import water_highs as whs
+
+
+def find_iis(compiled, rows=None, batched=True):
+    """Return an IIS of ``compiled`` as a dict.
+
+    ``rows`` restricts the candidate constraints (row numbers); the others
+    are relaxed from the start.  ``batched=False`` runs the classic
+    deletion filter, one row per re-solve.  The result holds ``"rows"``
+    (row numbers), ``"names"`` (constraint names) and ``"solves"`` (number
+    of re-solves); both lists are empty when the model is feasible.
+    """
+    highspy = whs._import_highspy()
+    inf = highspy.kHighsInf
+    h = whs.make_highs(compiled)
+    # feasibility only: a zero objective lets every re-solve stop at the first feasible point
+    h.changeColsCost(compiled.n_cols, np.arange(compiled.n_cols, dtype=np.int32), np.zeros(compiled.n_cols))
+    lower, upper = whs.row_bounds(compiled.sense, compiled.rhs, inf)
+    solves = [0]
+
+    def relax(group):
+        k = len(group)
+        h.changeRowsBounds(k, np.asarray(group, dtype=np.int32), np.full(k, -inf), np.full(k, inf))
+
+    def restore(group):
+        group = np.asarray(group, dtype=np.int32)
+        h.changeRowsBounds(len(group), group, lower[group], upper[group])
+
+    def infeasible():
+        solves[0] += 1
+        return whs.run(h) == "Infeasible"
+
+    all_rows = np.arange(compiled.n_rows)
+    candidates = all_rows if rows is None else np.asarray(rows, dtype=np.int64)
+    others = np.setdiff1d(all_rows, candidates)
+    if others.size:
+        relax(others)
+    if not infeasible():
+        return {"rows": [], "names": [], "solves": solves[0]}
+
+    # Deletion filter over groups; the stack holds groups still to test
+    iis = []
+    candidates = [int(r) for r in candidates]
+    stack = [candidates] if batched else [[r] for r in reversed(candidates)]
+    while stack:
+        group = stack.pop()
+        relax(group)
+        if infeasible():
+            # the conflict survives without the whole group
+            continue
+        restore(group)
+        if len(group) == 1:
+            iis.append(group[0])
+        else:
+            half = len(group) // 2
+            # test the second half first so the first half is popped next
+            stack.append(group[half:])
+            stack.append(group[:half])
+
+    iis.sort()
+    names = compiled.row_names()
+    return {"rows": iis, "names": [names[r] for r in iis], "solves": solves[0]}
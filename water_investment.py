@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Infrastructure investment mode: which source-to-sector routes to open.
+
+Conditions 45 (``F``, ``F_max``) and 49 (``Minfij``, ``Minf_min``) of the
+script are fixed costs of enabling and maintaining a route, which the LP
+cannot express.  ``build_investment`` adds one binary column
+open[i, j] per route after the columns of ``water_model.build_model`` and
+
+- ``Route_Open``: x[i, j] <= U[i, j] open[i, j], with U the tightest cap
+  the script gives a single route, min(L_norm, A[i], Dijmax[j]);
+- ``Financial_Resources`` (condition 45): sum F open <= F_max;
+- ``Infrastructure_Maintenance`` (condition 49): sum Minfij open >= Minf_min;
+
+and charges every open route ``fixed_scale * F[i, j] + Minfij[i, j]``.
+``F`` is annual while Total_Cost is a daily cost, hence the default
+``fixed_scale`` of 1 / 365.
+
+``solve_investment`` first solves the LP relaxation, which gives the
+lower bound, and seeds the branch-and-bound with the routes that solution
+uses (the LP re-solved with exactly those routes open, when feasible).
+The MIP then runs on HiGHS (default) or CBC with ``threads``, a
+``time_limit`` in seconds and a relative ``gap`` target.  With HiGHS,
+``progress`` is called with a dict (``time``, ``nodes``, ``objective``
+of the incumbent, ``bound``, ``gap``, ``event``) for every improving
+solution and every ``interval`` seconds in between; CBC runs its
+parallel tree search in a subprocess and reports through its own log
+(``msg=True``).
+
+Example:
+    model = build_investment()
+    result = solve_investment(model, time_limit=60, gap=1e-3, progress=print)
+    print(result["status"], result["objective"], result["gap"])
+    print(result["open"])
+"""
+
+import copy
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+import water_highs as whs
+import water_model as wm
+
+# HiGHS reports a solution it could not prove optimal under these statuses
+_LIMITS = ("kTimeLimit", "kSolutionLimit", "kIterationLimit", "kInterrupt", "kObjectiveTarget",
+           "kObjectiveBound")
+
+
+class InvestmentModel(wm.CompiledModel):
+    """Compiled model with one binary route column per cell.
+
+    ``integer`` marks the binary columns, ``open_cols`` is the index of
+    open[i, j] in row-major cell order, ``fixed`` the N x M fixed cost per
+    open route and ``capacity`` the N x M cap U of ``Route_Open``.
+    """
+
+    def __init__(self, base, A, sense, rhs, c, lb, ub, families, aux_names, fixed, capacity):
+        wm.CompiledModel.__init__(self, base.shape, A, sense, rhs, c, lb, ub, families, base.params, aux_names)
+        n, m = base.shape
+        # ``aux_names`` are the base model's; the route columns form the block ``open``
+        self.open_cols = np.arange(base.n_cols, base.n_cols + n * m)
+        self.integer = np.zeros(self.n_cols, dtype=bool)
+        self.integer[self.open_cols] = True
+        self.fixed = fixed
+        self.capacity = capacity
+
+    @property
+    def blocks(self):
+        return wm.CompiledModel.blocks.fget(self) + [wm.VariableBlock("open", int(self.open_cols[0]), self.shape)]
+
+    def open_matrix(self, values):
+        """Return the N x M route decisions of a column vector, rounded to 0/1."""
+        return np.round(np.asarray(values)[self.open_cols]).reshape(self.shape).astype(bool)
+
+
+def build_investment(params=None, exclude=(), equity="pairwise", fixed_scale=1.0 / 365.0):
+    """Compile the investment model of ``params`` (see the module docstring)."""
+    p = wm.default_parameters() if params is None else params
+    with wm._phase("build") as info:
+        base = wm._build_model(p, exclude, equity)
+        n, m = base.shape
+        ncell = n * m
+        cell = np.arange(ncell)
+        y = base.n_cols + cell
+        capacity = np.minimum(np.minimum(float(p["L_norm"]), np.asarray(p["A"], dtype=float)[:, None]),
+                              np.asarray(p["Dijmax"], dtype=float)[None, :])
+        fixed = fixed_scale * np.asarray(p["F"], dtype=float) + np.asarray(p["Minfij"], dtype=float)
+
+        rb = wm._RowBuilder(base.n_cols + ncell)
+        rb.add("Route_Open", 0, np.concatenate([cell, cell]), np.concatenate([cell, y]),
+               np.concatenate([np.ones(ncell), -capacity.ravel()]), ncell, wm.LE, 0.0,
+               names=["Route_Open_%d_%d" % (k // m + 1, k % m + 1) for k in cell])
+        rb.add("Financial_Resources", 45, np.zeros(ncell), y, np.ravel(p["F"]), 1, wm.LE, p["F_max"])
+        rb.add("Infrastructure_Maintenance", 49, np.zeros(ncell), y, np.ravel(p["Minfij"]), 1, wm.GE,
+               p["Minf_min"])
+        A2, sense2, rhs2, fams2 = rb.finish()
+
+        offset = base.n_rows
+        A = sp.vstack([sp.hstack([base.A, sp.csr_matrix((base.n_rows, ncell))]), A2], format="csr")
+        families = list(base.families) + [
+            wm.RowFamily(f.name, f.condition, f.start + offset, f.stop + offset, f.labels, f.names) for f in fams2]
+        model = InvestmentModel(base, A, np.concatenate([base.sense, sense2]), np.concatenate([base.rhs, rhs2]),
+                                np.concatenate([base.c, fixed.ravel()]),
+                                np.concatenate([base.lb, np.zeros(ncell)]),
+                                np.concatenate([base.ub, np.ones(ncell)]), families, base.aux_names, fixed, capacity)
+        info["rows"], info["terms"] = model.n_rows, model.nnz
+    return model
+
+
+def relax(model):
+    """Solve the LP relaxation of ``model``; returns a ``water_model.solve``-style dict."""
+    return whs.solve_highs(model)
+
+
+def seed(model, relaxation, tol=1e-9):
+    """Return the column values of a feasible start built from the LP ``relaxation``, or None.
+
+    The routes carrying flow in the relaxation are opened, all others
+    closed, and the LP is re-solved with these route decisions fixed.
+    """
+    if relaxation["status"] != "Optimal":
+        return None
+    opened = relaxation["values"][model.open_cols] > tol
+    fixed = copy.copy(model)
+    fixed.lb = model.lb.copy()
+    fixed.ub = model.ub.copy()
+    fixed.lb[model.open_cols] = fixed.ub[model.open_cols] = opened.astype(float)
+    result = whs.solve_highs(fixed)
+    return result["values"] if result["status"] == "Optimal" else None
+
+
+def solve_investment(model, backend="highs", time_limit=None, gap=1e-4, threads=None, use_seed=True,
+                     progress=None, interval=1.0, msg=False):
+    """Solve the investment MIP.
+
+    Returns a dict with ``status`` ("Optimal" when the ``gap`` target was
+    met, "Feasible" when a limit stopped the search with a solution, else
+    the PuLP status), ``objective``, ``bound`` (best lower bound),
+    ``gap``, ``nodes``, column ``values``, the allocation ``x``, the N x M
+    boolean ``open``, ``relaxation`` (LP bound), ``seed_objective`` (cost
+    of the start, NaN without one), ``threads`` (the thread count the
+    solver was given; 0 lets HiGHS choose) and ``wall`` (seconds, LP
+    included).
+
+    No backend gives both a parallel tree search and ``progress``.
+    HiGHS calls ``progress``, but explores the branch-and-bound tree
+    serially and uses ``threads`` only for parts of the work around it.  CBC searches the tree with ``threads``,
+    but runs in a subprocess and only reports through its log.
+    """
+    start = time.perf_counter()
+    relaxation = relax(model)
+    start_values = seed(model, relaxation) if use_seed else None
+    if backend == "highs":
+        result = _solve_highs(model, start_values, time_limit, gap, threads, progress, interval, msg)
+    elif backend == "cbc":
+        result = _solve_cbc(model, start_values, time_limit, gap, threads, msg)
+    else:
+        raise ValueError("unknown backend %r" % backend)
+    values = result["values"]
+    result.update(relaxation=relaxation["objective"],
+                  seed_objective=float(model.c @ start_values) if start_values is not None else np.nan,
+                  x=model.x_matrix(values), activity=model.A @ values,
+                  open=model.open_matrix(values) if np.isfinite(values).all() else None,
+                  wall=time.perf_counter() - start)
+    return result
+
+
+def _solve_highs(model, start_values, time_limit, gap, threads, progress, interval, msg):
+    highspy = whs._import_highspy()
+    h = highspy.Highs()
+    h.setOptionValue("output_flag", bool(msg))
+    if threads:
+        # the relaxation and seed solves have already started HiGHS's global
+        # scheduler with the default thread count, which would refuse this one
+        highspy.Highs.resetGlobalScheduler(True)
+        h.setOptionValue("threads", int(threads))
+    if time_limit is not None:
+        h.setOptionValue("time_limit", float(time_limit))
+    h.setOptionValue("mip_rel_gap", float(gap))
+    lp = whs.make_lp(model)
+    lp.integrality_ = [highspy.HighsVarType.kInteger if k else highspy.HighsVarType.kContinuous
+                       for k in model.integer]
+    h.passModel(lp)
+    if start_values is not None:
+        sol = highspy.HighsSolution()
+        sol.col_value = list(start_values)
+        sol.value_valid = True
+        h.setSolution(sol)
+
+    if progress is not None:
+        kinds = highspy.cb.HighsCallbackType
+
+        last = [-np.inf]
+
+        def callback(kind, message, out, data_in, user_data):
+            improving = kind == kinds.kCallbackMipImprovingSolution
+            # the interrupt check runs many times per second; report it every ``interval``
+            if not improving and out.running_time - last[0] < interval:
+                return
+            last[0] = out.running_time
+            progress({"time": out.running_time, "nodes": int(out.mip_node_count),
+                      "objective": out.mip_primal_bound, "bound": out.mip_dual_bound, "gap": out.mip_gap,
+                      "event": "solution" if improving else "status"})
+
+        h.setCallback(callback, None)
+        h.startCallback(kinds.kCallbackMipImprovingSolution)
+        h.startCallback(kinds.kCallbackMipInterrupt)
+
+    with wm._phase("solve", model.n_rows, model.nnz):
+        h.run()
+    name = h.getModelStatus().name
+    info = h.getInfo()
+    if name == "kNotset" and info.primal_solution_status == 0:
+        raise RuntimeError("HiGHS did not start the MIP solve (threads=%r); rerun with msg=True for its log" % threads)
+    values = np.full(model.n_cols, np.nan)
+    objective = np.nan
+    has_solution = info.primal_solution_status == 2
+    if has_solution:
+        values = np.asarray(h.getSolution().col_value)
+        objective = info.objective_function_value
+    if name == "kOptimal":
+        status = "Optimal"
+    elif name in _LIMITS and has_solution:
+        status = "Feasible"
+    else:
+        status = whs._STATUS.get(name, "Not Solved")
+    return {"status": status, "objective": objective, "bound": info.mip_dual_bound, "gap": info.mip_gap,
+            "nodes": int(info.mip_node_count), "values": values, "duals": np.full(model.n_rows, np.nan),
+            "threads": int(h.getOptionValue("threads")[1])}
+
+
+def _solve_cbc(model, start_values, time_limit, gap, threads, msg):
+    import pulp as pl
+
+    problem, cols = wm.to_pulp(model)
+    for k in np.flatnonzero(model.integer):
+        cols[k].cat = pl.LpInteger
+    if start_values is not None:
+        for var, value in zip(cols, start_values):
+            var.setInitialValue(float(value))
+    solver = pl.PULP_CBC_CMD(msg=msg, timeLimit=time_limit, gapRel=gap, threads=threads,
+                             warmStart=start_values is not None)
+    with wm._phase("cbc", model.n_rows, model.nnz):
+        problem.solve(solver)
+    values = np.full(model.n_cols, np.nan)
+    objective = np.nan
+    status = pl.LpStatus[problem.status]
+    if problem.sol_status in (pl.LpSolutionOptimal, pl.LpSolutionIntegerFeasible):
+        values = np.array([v.varValue for v in cols], dtype=float)
+        objective = pl.value(problem.objective)
+        status = "Optimal" if problem.sol_status == pl.LpSolutionOptimal else "Feasible"
+    # CBC's bound and node count stay in its log
+    return {"status": status, "objective": objective, "bound": np.nan, "gap": np.nan, "nodes": -1,
+            "values": values, "duals": np.full(model.n_rows, np.nan), "threads": int(threads or 1)}
+
+
+def format_investment(model, result):
+    """Summarize a ``solve_investment`` result: costs, bound, gap and the open routes."""
+    lines = ["Status: %s, Total_Cost = %.6f (LP bound %.6f, best bound %.6f, gap %.2e, %d nodes, %.2f s)" % (
+        result["status"], result["objective"], result["relaxation"], result["bound"], result["gap"],
+        result["nodes"], result["wall"])]
+    if result["open"] is not None:
+        n, m = model.shape
+        opened = np.argwhere(result["open"])
+        lines.append("%d of %d routes open, fixed cost %.6f" % (
+            len(opened), n * m, float((model.fixed * result["open"]).sum())))
+        for i, j in opened[:50]:
+            lines.append("  open x_%d_%d = %.6g (cap %.6g)" % (i + 1, j + 1, result["x"][i, j],
+                                                               model.capacity[i, j]))
+        if len(opened) > 50:
+            lines.append("  ... %d more" % (len(opened) - 50))
+    return "\n".join(lines)
@@ -0,0 +1,1016 @@
+# -*- coding: utf-8 -*-
+"""
+Array-backed builder for the Water_Management model.
+
+CODE-JCR-WATER-V7-B-25.py states the model for the fixed 3x3 grid
+(3 sources x 3 sectors) with one ``pl.lpSum`` comprehension per constraint.
+This module holds the same parameters as NumPy arrays of arbitrary shape
+(N sources x M sectors) and assembles the whole constraint matrix at once,
+one vectorized block per "Condition N" family, in the same row order as
+the script.  ``to_pulp`` turns the compiled matrix back into the
+``Water_Management`` PuLP problem, so the 3x3 case reproduces the script.
+
+Decision variable x[i, j] (1-based, as in the script) is column
+``(i - 1) * M + (j - 1)`` of the compiled matrix.  Columns are grouped in
+``VariableBlock`` ranges with bounds in NumPy arrays; no per-cell Python
+object or name exists until ``to_pulp`` or a report asks for one.
+"""
+
+import contextlib
+
+import numpy as np
+
+# Constraint senses, using PuLP's convention (LpConstraintLE/EQ/GE)
+LE = -1
+EQ = 0
+GE = 1
+
+# Active water_profile.Profiler, or None when not profiling
+_profiler = None
+
+
+def _phase(name, rows=None, terms=None):
+    """Profiling context of phase ``name`` (see water_profile)."""
+    if _profiler is None:
+        return contextlib.nullcontext({})
+    return _profiler.phase(name, rows, terms)
+
+
+# Parameters indexed by source i, by sector j and by cell (i, j).
+# Everything else in the parameter set is a scalar or an index list.
+SOURCE_PARAMETERS = ("Cij", "COij", "CEij", "CMij", "CENij", "A")
+SECTOR_PARAMETERS = ("D", "Dijmax", "P", "U_min", "N_max", "S_min", "I_std", "M_max")
+CELL_PARAMETERS = (
+    "Tij", "Qij", "ENij", "Tr", "Aij", "Sij", "tij", "C_Eij", "C_CO2ij", "S_ij",
+    "W_ij", "R_ij", "L", "T_save", "SED", "SAL", "NO3", "N", "T_resid", "I", "M",
+    "F", "INF", "pH_Control", "Q_mon", "Minfij", "Eij", "M_improve",
+)
+
+# Source/sector index lists (1-based, as in the script)
+INDEX_PARAMETERS = ("potable_sources", "stormwater_sources", "greywater_sources", "strategic_sectors",
+                    "irrigation_sectors", "cleaning_sectors")
+
+# Formulations of the equity conditions 7 and 28 (see build_model)
+EQUITY_FORMULATIONS = ("pairwise", "common", "minmax")
+
+# Parameters that only appear as the right-hand side of one row family.
+# Changing them needs no rebuild, only new row bounds.  (D is not one of
+# them: it also weights the equity rows of conditions 7 and 28.)
+RHS_PARAMETERS = {
+    "A": "Water_Availability_Source",
+    "Ct": "Treatment_Capacity",
+    "B": "Max_Budget",
+    "Amax": "Protection_Aquifers",
+    "R_drought": "Resilience_Droughts",
+    "R_strategic": "Maintenance_Strategic_Reserves",
+    "L_norm": "Compliance_Local_Regulations",
+    "B_hidro": "Water_Balance",
+    "E_safe": "Aquatic_Ecosystem_Protection",
+    "Emax": "Environmental_Sustainability",
+    "ENlim": "Energy_Efficiency",
+    "Pmax": "Limit_Drinking_Water",
+    "Dijmax": "Max_Daily_Consumption_Sector",
+    "Smax": "Storage_Capacity",
+    "Treq": "Delivery_Time_Limit",
+    "Q_max": "Water_Quality_Cost",
+    "E_cost_max": "Energy_Cost_Optimization",
+}
+
+
+def default_parameters():
+    """Return the parameter set of CODE-JCR-WATER-V7-B-25.py as NumPy arrays.
+
+    Tables that the script defines more than once (``D``, ``Qij``, ``Eij``
+    and ``M``) hold the last definition, which is the one in effect when
+    the script builds its constraints.  The first ``M``, the improvement
+    factors of condition 35, is kept as ``M_improve``.
+    """
+    return {
+        # 1. Costs associated with water, per source i
+        "Cij": np.array([0.03, 0.02, 0.015]),
+        "COij": np.array([0.03, 0.02, 0.01]),
+        "CEij": np.array([0.01, 0.008, 0.005]),
+        "CMij": np.array([0.02, 0.015, 0.01]),
+        "CENij": np.array([0.02, 0.015, 0.01]),
+        # 2. Water availability per source (A_i)
+        "A": np.array([5000000.0, 5000000.0, 5000000.0]),
+        # 3./7./28. Demand for each sector (D_j), last definition of the script
+        "D": np.array([4360.0, 3052.0, 8720.0]),
+        # Treatment capacity (C_t)
+        "Ct": 600000.0,
+        "Tij": np.array([[0.9, 0.85, 0.8],
+                         [0.7, 0.65, 0.6],
+                         [0.5, 0.45, 0.4]]),
+        # 4./16. Water quality index, last definition of the script
+        "Qij": np.array([[1.0, 0.9, 0.8],
+                         [0.6, 0.8, 0.7],
+                         [0.5, 0.7, 0.9]]),
+        "Q_max": 100000.0,
+        # 5. Maximum budget (B)
+        "B": 1000000.0,
+        # 6. Environmental sustainability (Emax)
+        "Emax": 1195000.0,
+        # 8. Energy limit for treatment (ENlim)
+        "ENlim": 200000.0,
+        "ENij": np.array([[0.3, 0.5, 0.4],
+                          [0.2, 0.6, 0.7],
+                          [0.4, 0.3, 0.5]]),
+        # 9. Minimum proportion of recycled water usage (Rmin)
+        "Rmin": 0.30,
+        # 10. Infrastructure transport capacity (Cinfra)
+        "Tr": np.array([[1.0, 1.1, 1.0],
+                        [1.3, 1.3, 1.2],
+                        [1.5, 1.4, 1.3]]),
+        "Cinfra": 800000.0,
+        # 11. Limitation on the use of drinking water
+        "Pmax": 4000000.0,
+        # 12. Minimum proportion of rainwater usage (Lmin)
+        "Lmin": 0.20,
+        # 13. Maximum daily consumption per sector (Dijmax)
+        "Dijmax": np.array([250000.0, 200000.0, 50000.0]),
+        # 14. Maximum proportion of water for cleaning activities
+        "Imax": 0.40,
+        # 15. Protection of aquifers
+        "Aij": np.array([[1.0, 1.3, 1.2],
+                         [0.2, 0.3, 0.2],
+                         [0.4, 0.5, 0.4]]),
+        "Amax": 2000000.0,
+        # 16. Minimum water quality index
+        "Qmin": 0.80,
+        # 17. Maximum permitted storage (Smax)
+        "Sij": np.array([[1.0, 0.9, 0.9],
+                         [0.6, 0.8, 0.7],
+                         [0.7, 0.9, 0.8]]),
+        "Smax": 60000.0,
+        # 18. Maximum water delivery time (Treq)
+        "Treq": 100000.0,
+        "tij": np.array([[2.0, 3.0, 2.0],
+                         [4.0, 5.0, 4.0],
+                         [5.0, 6.0, 5.0]]),
+        # 19. Minimum proportion of water for irrigation use
+        "I_min": 0.25,
+        # 20. Resilience to droughts
+        "R_drought": 0.20,
+        # 21. Energy cost optimization
+        "E_cost_max": 90000.0,
+        "C_Eij": np.array([[0.8, 0.6, 0.7],
+                           [0.5, 0.4, 0.6],
+                           [1.2, 1.0, 0.9]]),
+        # 22. CO2 emissions constraint (CO2max)
+        "CO2_max": 500000.0,
+        "C_CO2ij": np.array([[0.6, 0.4, 0.5],
+                             [0.3, 0.2, 0.3],
+                             [1.0, 0.8, 0.9]]),
+        # 23. Maximum proportion of surface water in total use
+        "S_max": 900000.0,
+        "S_ij": np.array([[1.2, 1.0, 1.1],
+                          [0.7, 0.6, 0.8],
+                          [0.9, 0.8, 0.9]]),
+        # 24. Maximum permitted limit of contamination in wastewater
+        "W_max": 500.0,
+        "W_ij": np.array([[10.0, 30.0, 50.0],
+                          [20.0, 40.0, 60.0],
+                          [200.0, 350.0, 500.0]]),
+        # 25. Minimum proportion of water that must be reused
+        "R_min": 0.30,
+        "R_ij": np.array([[0.05, 0.15, 0.25],
+                          [0.10, 0.35, 0.40],
+                          [0.50, 0.60, 0.80]]),
+        # 26. Consumption limit allowed according to local regulations
+        "L_norm": 10000.0,
+        # 27. Water balance in the system
+        "B_hidro": 1.0,
+        # 29. Minimum strategic reserves
+        "R_strategic": 100000.0,
+        # 30. Leakage loss limit (Lmax)
+        "L_max": 0.08,
+        "L": np.array([[0.05, 0.07, 0.06],
+                       [0.04, 0.06, 0.05],
+                       [0.03, 0.05, 0.04]]),
+        # 31. Maximum limit for the use of grey water
+        "G_max": 0.35,
+        # 32. Per capita consumption limit
+        "C_max": 3000.0,
+        "P": np.array([131000000.0, 25000000.0, 10000000.0]),
+        # 33. Minimum water savings through technologies
+        "T_min": 15000.0,
+        "T_save": np.array([[0.12, 0.15, 0.10],
+                            [0.14, 0.18, 0.11],
+                            [0.10, 0.13, 0.09]]),
+        # 34. Safe limit for the protection of aquatic ecosystems
+        "E_safe": 350000.0,
+        # 35. Minimum continuous improvement in water management
+        "M_min": 50000.0,
+        # improvement factors per cell, the script's first definition of M
+        "M_improve": np.array([[1.2, 1.5, 1.1],
+                               [1.3, 1.6, 1.2],
+                               [1.1, 1.4, 1.0]]),
+        # 36. Sediment control (SEDmax)
+        "SED_max": 50.0,
+        "SED": np.array([[35.0, 40.0, 30.0],
+                         [38.0, 45.0, 32.0],
+                         [28.0, 35.0, 25.0]]),
+        # 37. Minimum stormwater management capacity
+        "P_min": 100000.0,
+        # 38. Salinity limit
+        "SAL_max": 1.5,
+        "SAL": np.array([[0.8, 1.2, 1.0],
+                         [0.9, 1.3, 1.1],
+                         [0.7, 1.0, 0.9]]),
+        # 39. Maximum limit of nitrates
+        "NO3_max": 50.0,
+        "NO3": np.array([[30.0, 45.0, 40.0],
+                         [32.0, 48.0, 42.0],
+                         [28.0, 38.0, 35.0]]),
+        # 40. Universal water access (Umin)
+        "U_min": np.array([50000.0, 80000.0, 60000.0]),
+        # 41. Maximum extraction from natural sources
+        "N_max": np.array([120000.0, 250000.0, 180000.0]),
+        "N": np.array([[90000.0, 200000.0, 150000.0],
+                       [100000.0, 220000.0, 160000.0],
+                       [95000.0, 210000.0, 170000.0]]),
+        # 42. Wastewater treatment
+        "S_min": np.array([60000.0, 150000.0, 100000.0]),
+        "T_resid": np.array([[0.85, 0.75, 0.80],
+                             [0.88, 0.78, 0.82],
+                             [0.90, 0.80, 0.85]]),
+        # 43. Compliance with international standards
+        "I_std": np.array([100000.0, 250000.0, 180000.0]),
+        "I": np.array([[0.95, 0.90, 0.92],
+                       [0.96, 0.88, 0.91],
+                       [0.97, 0.89, 0.93]]),
+        # 44. Maximum allowed micropollutants, last definition of M
+        "M_max": np.array([5.0, 10.0, 8.0]),
+        "M": np.array([[3.5, 7.0, 6.5],
+                       [4.0, 8.5, 7.0],
+                       [3.8, 9.0, 7.5]]),
+        # 45. Efficient use of financial resources
+        "F": np.array([[150000.0, 250000.0, 200000.0],
+                       [100000.0, 180000.0, 150000.0],
+                       [80000.0, 120000.0, 100000.0]]),
+        "F_max": 1000000.0,
+        # 46. Prevention of infiltrations
+        "INF": np.array([[0.05, 0.08, 0.06],
+                         [0.07, 0.09, 0.05],
+                         [0.04, 0.06, 0.03]]),
+        "INF_max": 0.15,
+        # 47. pH Control
+        "pH_Control": np.array([[7.2, 7.5, 7.8],
+                                [7.1, 7.3, 7.6],
+                                [6.8, 7.0, 7.2]]),
+        "pH_max": 8.5,
+        # 48. Quality monitoring
+        "Q_mon_min": 0.75,
+        "Q_mon": np.array([[18.0, 20.0, 22.0],
+                           [16.0, 19.0, 21.0],
+                           [17.0, 20.0, 23.0]]),
+        # 49. Infrastructure maintenance
+        "Minfij": np.array([[50.0, 60.0, 55.0],
+                            [65.0, 70.0, 60.0],
+                            [55.0, 50.0, 45.0]]),
+        "Minf_min": 200.0,
+        # 50. Education and awareness, last definition of Eij
+        "Emin": 20000.0,
+        "Eij": np.array([[5000.0, 7000.0, 6500.0],
+                         [6000.0, 7200.0, 6800.0],
+                         [5500.0, 7100.0, 6700.0]]),
+        # Source 1 is potable water (condition 11), source 2 rainwater/stormwater
+        # (conditions 12 and 37) and source 3 recycled/grey water (conditions 9 and 31)
+        "potable_sources": [1],
+        "stormwater_sources": [2],
+        "greywater_sources": [3],
+        # Condition 29 sums x[i, j] over i with the loop variable j left over
+        # from the sector loops, i.e. it applies to the last sector only
+        "strategic_sectors": [3],
+        # Sectors: 1 human consumption, 2 irrigation (condition 19), 3 cleaning (condition 14)
+        "irrigation_sectors": [2],
+        "cleaning_sectors": [3],
+    }
+
+
+def synthetic_parameters(n_sources, n_sectors, seed=0, noise=0.05):
+    """Return an N x M parameter set obtained by tiling the 3x3 case.
+
+    Source i takes the coefficients of source ``i % 3`` of the script and
+    sector j those of sector ``j % 3``, each perturbed by up to ``noise``
+    (relative).  Availabilities and per-sector quantities are divided among
+    the copies so the system-wide totals, and hence the scalar caps, keep
+    the magnitudes of the original instance.
+    """
+    rng = np.random.default_rng(seed)
+    base = default_parameters()
+    src = np.arange(n_sources) % 3
+    sec = np.arange(n_sectors) % 3
+
+    def jitter(shape):
+        return 1.0 + noise * rng.uniform(-1.0, 1.0, size=shape)
+
+    params = {}
+    for key, value in base.items():
+        if key in SOURCE_PARAMETERS:
+            params[key] = value[src] * jitter(n_sources)
+        elif key in SECTOR_PARAMETERS:
+            params[key] = value[sec] * jitter(n_sectors)
+        elif key in CELL_PARAMETERS:
+            params[key] = value[np.ix_(src, sec)] * jitter((n_sources, n_sectors))
+        elif key not in INDEX_PARAMETERS:
+            params[key] = value
+
+    # Split extensive quantities among the copies of each source/sector
+    params["A"] *= 3.0 / n_sources
+    for key in ("D", "Dijmax", "P", "U_min", "N_max", "S_min", "I_std"):
+        params[key] *= 3.0 / n_sectors
+
+    params["potable_sources"] = [i + 1 for i in range(n_sources) if i % 3 == 0]
+    params["stormwater_sources"] = [i + 1 for i in range(n_sources) if i % 3 == 1]
+    params["greywater_sources"] = [i + 1 for i in range(n_sources) if i % 3 == 2]
+    params["strategic_sectors"] = [n_sectors]
+    params["irrigation_sectors"] = [j + 1 for j in range(n_sectors) if j % 3 == 1]
+    params["cleaning_sectors"] = [j + 1 for j in range(n_sectors) if j % 3 == 2]
+    return params
+
+
+def check_parameters(params, keys=None):
+    """Return the problems of a parameter set as a list of messages (empty if valid).
+
+    Checks that every parameter of ``default_parameters()`` is present,
+    that per-source, per-sector and per-cell tables have the N / M / N x M
+    shape given by ``A`` and ``D``, that all values are finite numbers,
+    that the demands ``D`` are positive (the equity rows divide by them)
+    and that the index lists name existing sources and sectors.  Builds
+    nothing, so it runs in milliseconds.  ``keys`` limits the checks to
+    these parameters, e.g. the ones an override changed in a valid set.
+    """
+    problems = []
+    if keys is None:
+        missing = sorted(set(default_parameters()) - set(params))
+        if missing:
+            problems.append("missing parameters: %s" % ", ".join(missing))
+    if "A" not in params or "D" not in params:
+        return problems
+    n = np.size(params["A"])
+    m = np.size(params["D"])
+    for key in params if keys is None else keys:
+        value = params[key]
+        if key in INDEX_PARAMETERS:
+            count = m if key.endswith("_sectors") else n
+            try:
+                index = np.asarray(value, dtype=float).ravel()
+            except (TypeError, ValueError):
+                problems.append("%s: not a list of indices" % key)
+                continue
+            bad = index[(index != np.round(index)) | (index < 1) | (index > count)]
+            if bad.size:
+                problems.append("%s: %s outside 1..%d" % (key, bad.tolist(), count))
+            continue
+        try:
+            arr = np.asarray(value, dtype=float)
+        except (TypeError, ValueError):
+            problems.append("%s: not numeric" % key)
+            continue
+        shape = (n,) if key in SOURCE_PARAMETERS else (m,) if key in SECTOR_PARAMETERS else \
+            (n, m) if key in CELL_PARAMETERS else ()
+        if arr.shape != shape:
+            problems.append("%s: shape %s, expected %s" % (key, arr.shape, shape))
+        elif not np.isfinite(arr).all():
+            problems.append("%s: not finite" % key)
+    if not problems and (keys is None or "D" in keys) and (np.asarray(params["D"], dtype=float) <= 0).any():
+        problems.append("D: demands must be positive")
+    return problems
+
+
+class RowFamily:
+    """Contiguous block of rows produced by one "Condition N" of the script.
+
+    Row names are generated on demand: a single-row family is named after
+    the family itself, otherwise each row appends its 1-based ``labels``
+    (e.g. ``Sector_Demand_2`` or ``Compliance_Local_Regulations_1_3``).
+    ``names`` overrides the generated names when the script uses
+    hand-written ones.
+    """
+
+    def __init__(self, name, condition, start, stop, labels=None, names=None):
+        self.name = name
+        self.condition = condition
+        self.start = start
+        self.stop = stop
+        self.labels = labels
+        self.names = names
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __repr__(self):
+        return "RowFamily(%r, condition=%d, rows=%d:%d)" % (self.name, self.condition, self.start, self.stop)
+
+    @property
+    def rows(self):
+        return slice(self.start, self.stop)
+
+    def row_name(self, offset):
+        if self.names is not None:
+            return self.names[offset]
+        if self.labels is None:
+            return self.name
+        return self.name + "_" + "_".join(str(int(k)) for k in np.atleast_1d(self.labels[offset]))
+
+    def row_names(self):
+        return [self.row_name(k) for k in range(len(self))]
+
+
+class VariableBlock:
+    """Contiguous block of columns holding one indexed variable.
+
+    The columns ``start .. stop - 1`` hold the variable over ``shape`` in
+    row-major order (``x`` is N x M, an auxiliary variable has shape ()),
+    so rows reference a block through ``columns`` and values and bounds
+    are slices of the model's arrays (``view``).  Column names are
+    generated on demand, as PuLP names the entries of
+    ``LpVariable.dicts``: ``x_(1,_2)`` with 1-based indices, the index
+    ``suffix`` appended (e.g. the day of a multi-period block) and
+    ``order`` permuting the indices in the name.
+    """
+
+    def __init__(self, name, start, shape=(), suffix=(), order=None):
+        self.name = name
+        self.start = start
+        self.shape = tuple(shape)
+        self.suffix = tuple(suffix)
+        self.order = order
+        self.stop = start + int(np.prod(self.shape, dtype=np.int64))
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __repr__(self):
+        return "VariableBlock(%r, shape=%s, cols=%d:%d)" % (self.name, self.shape, self.start, self.stop)
+
+    @property
+    def cols(self):
+        return slice(self.start, self.stop)
+
+    def columns(self, *index):
+        """Column numbers of the 0-based ``index`` arrays (every column when called without)."""
+        if not index:
+            return np.arange(self.start, self.stop)
+        return self.start + np.ravel_multi_index(index, self.shape)
+
+    def view(self, vector):
+        """The block's entries of a column vector (values, ``lb``, ``ub``, ``c``) with the block's shape."""
+        return np.asarray(vector)[self.cols].reshape(self.shape)
+
+    def col_name(self, offset):
+        index = [k + 1 for k in np.unravel_index(offset, self.shape)] if self.shape else []
+        if self.order is not None:
+            index = [index[k] for k in self.order]
+        index += list(self.suffix)
+        if not index:
+            return self.name
+        if not self.shape:
+            return "%s_%s" % (self.name, "_".join(str(k) for k in index))
+        return "%s_(%s)" % (self.name, ",_".join(str(k) for k in index))
+
+    def col_names(self):
+        return [self.col_name(k) for k in range(len(self))]
+
+
+class CompiledModel:
+    """Water_Management model in matrix form.
+
+    Rows read ``A @ x  (sense)  rhs`` with ``sense`` one of LE, EQ, GE;
+    ``c`` holds the objective (Total_Cost) coefficients and ``lb``/``ub``
+    the column bounds.  ``families`` lists the row blocks in script order
+    and ``blocks`` the column blocks (``VariableBlock``): the N x M cells
+    ``x``, then one block per auxiliary variable named by ``aux_names``.
+    """
+
+    def __init__(self, shape, A, sense, rhs, c, lb, ub, families, params, aux_names=()):
+        self.shape = shape
+        self.A = A
+        self.sense = sense
+        self.rhs = rhs
+        self.c = c
+        self.lb = lb
+        self.ub = ub
+        self.families = families
+        self.params = params
+        self.aux_names = list(aux_names)
+        # (blocks, their start columns), built by col_name on first use
+        self._block_index = None
+
+    def __repr__(self):
+        return "CompiledModel(%dx%d, rows=%d, cols=%d, nnz=%d)" % (
+            self.shape[0], self.shape[1], self.n_rows, self.n_cols, self.nnz)
+
+    @property
+    def n_rows(self):
+        return self.A.shape[0]
+
+    @property
+    def n_cols(self):
+        return self.A.shape[1]
+
+    @property
+    def nnz(self):
+        return self.A.nnz
+
+    def family(self, name):
+        """Return the RowFamily called ``name``."""
+        for fam in self.families:
+            if fam.name == name:
+                return fam
+        raise KeyError(name)
+
+    def row_names(self):
+        names = []
+        for fam in self.families:
+            names.extend(fam.row_names())
+        return names
+
+    def row_index(self, name):
+        """Return the row number of the constraint called ``name``."""
+        for fam in self.families:
+            if name == fam.name and len(fam) == 1:
+                return fam.start
+            if fam.names is not None:
+                if name in fam.names:
+                    return fam.start + fam.names.index(name)
+            elif fam.labels is not None and name.startswith(fam.name + "_"):
+                try:
+                    key = [int(k) for k in name[len(fam.name) + 1:].split("_")]
+                except ValueError:
+                    continue
+                hits = np.flatnonzero((fam.labels.reshape(len(fam), -1) == key).all(axis=1))
+                if hits.size:
+                    return fam.start + int(hits[0])
+        raise KeyError(name)
+
+    @property
+    def blocks(self):
+        n, m = self.shape
+        return [VariableBlock("x", 0, (n, m))] + [VariableBlock(name, n * m + k)
+                                                   for k, name in enumerate(self.aux_names)]
+
+    def block(self, name):
+        """Return the VariableBlock called ``name``.
+
+        Raises ValueError when several blocks share the name, e.g. the
+        daily ``x`` blocks of a multi-period model; pick those from
+        ``blocks`` by their ``suffix``.
+        """
+        found = [blk for blk in self.blocks if blk.name == name]
+        if not found:
+            raise KeyError(name)
+        if len(found) > 1:
+            raise ValueError("%d blocks are called %r; select one from blocks by its suffix" % (len(found), name))
+        return found[0]
+
+    def col_name(self, col):
+        """Name of column ``col``, generated from its block."""
+        if self._block_index is None:
+            blocks = self.blocks
+            self._block_index = (blocks, np.array([blk.start for blk in blocks]))
+        blocks, starts = self._block_index
+        k = int(np.searchsorted(starts, col, side="right")) - 1
+        return blocks[k].col_name(col - blocks[k].start)
+
+    def col_names(self):
+        names = []
+        for blk in self.blocks:
+            names.extend(blk.col_names())
+        return names
+
+    def x_matrix(self, values):
+        """Reshape a column vector into the N x M allocation x[i, j]."""
+        return np.asarray(values, dtype=float)[:self.shape[0] * self.shape[1]].reshape(self.shape)
+
+
+class _RowBuilder:
+    """Collects COO triplets for consecutive row families."""
+
+    def __init__(self, n_cols):
+        self.n_cols = n_cols
+        self.n_rows = 0
+        self.aux_names = []
+        self.rows = []
+        self.cols = []
+        self.vals = []
+        self.sense = []
+        self.rhs = []
+        self.families = []
+
+    def add(self, name, condition, rows, cols, vals, n_rows, sense, rhs, labels=None, names=None):
+        # rows are local to the family, 0 .. n_rows - 1
+        self.rows.append(np.asarray(rows, dtype=np.int64) + self.n_rows)
+        self.cols.append(np.asarray(cols, dtype=np.int64))
+        self.vals.append(np.asarray(vals, dtype=float))
+        self.sense.append(np.broadcast_to(np.asarray(sense, dtype=np.int8), (n_rows,)))
+        self.rhs.append(np.broadcast_to(np.asarray(rhs, dtype=float), (n_rows,)))
+        self.families.append(RowFamily(name, condition, self.n_rows, self.n_rows + n_rows, labels, names))
+        self.n_rows += n_rows
+        if _profiler is not None:
+            _profiler.family(name, condition, n_rows, self.vals[-1].size)
+
+    def add_column(self, name):
+        """Append an auxiliary column after the x[i, j] cells; returns its index."""
+        self.aux_names.append(name)
+        return self.n_cols + len(self.aux_names) - 1
+
+    def add_dense(self, name, condition, coef, sense, rhs):
+        """One row with a coefficient on every cell (``coef`` is N x M)."""
+        coef = np.ravel(coef)
+        cols = np.flatnonzero(coef)
+        self.add(name, condition, np.zeros(cols.size), cols, coef[cols], 1, sense, rhs)
+
+    def finish(self):
+        if self.rows:
+            rows = np.concatenate(self.rows)
+            cols = np.concatenate(self.cols)
+            vals = np.concatenate(self.vals)
+            sense = np.concatenate(self.sense)
+            rhs = np.concatenate(self.rhs)
+        else:
+            rows = cols = np.zeros(0, dtype=np.int64)
+            vals = rhs = np.zeros(0)
+            sense = np.zeros(0, dtype=np.int8)
+        # scipy is imported here so that loading and checking parameters stays fast
+        import scipy.sparse as sp
+
+        A = sp.csr_matrix((vals, (rows, cols)), shape=(self.n_rows, self.n_cols + len(self.aux_names)))
+        if _profiler is not None:
+            _profiler.family("assemble", 0, self.n_rows, A.nnz)
+        return A, sense, rhs, self.families
+
+
+def _source_mask(n, sources):
+    mask = np.zeros(n, dtype=bool)
+    mask[np.asarray(sources, dtype=np.int64) - 1] = True
+    return mask
+
+
+def build_model(params=None, exclude=(), equity="pairwise", aggregates=False):
+    """Compile the Water_Management model for an N x M parameter set.
+
+    ``params`` defaults to ``default_parameters()``; its shape is taken from
+    ``A`` (sources) and ``D`` (sectors).  Families listed in ``exclude`` (by
+    name, e.g. ``"Equitable_Distribution_Scarcity"``) are left out.
+
+    ``equity`` selects the formulation of conditions 7 and 28, which
+    together force every sector to the same service ratio
+    sum_i x[i, j] / D[j]:
+
+    - ``"pairwise"``: the script's rows, one per ordered sector pair plus
+      the chain of condition 7, O(M^2) rows;
+    - ``"common"``: one auxiliary common ratio r and the M rows
+      sum_i x[i, j] / D[j] == r;
+    - ``"minmax"``: bounding variables lo <= sum_i x[i, j] / D[j] <= hi and
+      hi - lo <= 0, 2M + 1 rows.
+
+    All three have the same feasible set in x.
+
+    ``aggregates=True`` replaces coefficient patterns repeated across rows
+    and the objective (total flow, total cost) by defining auxiliary
+    columns, see ``water_aggregates``.
+    """
+    with _phase("build") as info:
+        compiled = _build_model(params, exclude, equity)
+        if aggregates:
+            import water_aggregates
+
+            compiled, _ = water_aggregates.share_aggregates(compiled)
+        info["rows"], info["terms"] = compiled.n_rows, compiled.nnz
+    return compiled
+
+
+def _build_model(params, exclude, equity):
+    if equity not in EQUITY_FORMULATIONS:
+        raise ValueError("equity must be one of %s, not %r" % (", ".join(EQUITY_FORMULATIONS), equity))
+    p = default_parameters() if params is None else params
+    n = len(p["A"])
+    m = len(p["D"])
+    ncell = n * m
+    x = VariableBlock("x", 0, (n, m))
+    cell = x.columns()
+    src_of = cell // m   # source of each column
+    sec_of = cell % m    # sector of each column
+    ones = np.ones((n, m))
+    D = np.asarray(p["D"], dtype=float)
+
+    rb = _RowBuilder(ncell)
+
+    def wanted(name):
+        return name not in exclude
+
+    # Objective function: total cost of water supply, per source i
+    cost = np.asarray(p["Cij"]) + p["COij"] + p["CEij"] + p["CMij"] + p["CENij"]
+    c = np.repeat(cost, m)
+
+    # Condition 1: Water availability from each source (Ai)
+    if wanted("Water_Availability_Source"):
+        rb.add("Water_Availability_Source", 1, src_of, cell, np.ones(ncell), n, LE, p["A"],
+               labels=np.arange(1, n + 1))
+
+    # Condition 2: Demand from each sector (Dj)
+    if wanted("Sector_Demand"):
+        rb.add("Sector_Demand", 2, sec_of, cell, np.ones(ncell), m, GE, D,
+               labels=np.arange(1, m + 1))
+
+    # Condition 3: Treatment capacity (Ct)
+    if wanted("Treatment_Capacity"):
+        rb.add_dense("Treatment_Capacity", 3, ones, LE, p["Ct"])
+
+    # Condition 5: Maximum allowed cost (B)
+    if wanted("Max_Budget"):
+        rb.add_dense("Max_Budget", 5, c, LE, p["B"])
+
+    # Condition 15: Protection of aquifers
+    if wanted("Protection_Aquifers"):
+        rb.add_dense("Protection_Aquifers", 15, p["Aij"], LE, p["Amax"])
+
+    # Condition 10: Infrastructure capacity, sum Tr*x <= Cinfra * sum x
+    if wanted("Infrastructure_Capacity"):
+        rb.add_dense("Infrastructure_Capacity", 10, np.asarray(p["Tr"]) - p["Cinfra"], LE, 0.0)
+
+    # Condition 20: Resilience to droughts
+    if wanted("Resilience_Droughts"):
+        rb.add_dense("Resilience_Droughts", 20, ones, GE, p["R_drought"])
+
+    # Condition 29: Maintenance of strategic reserves
+    if wanted("Maintenance_Strategic_Reserves"):
+        rb.add_dense("Maintenance_Strategic_Reserves", 29,
+                     ones * _source_mask(m, p["strategic_sectors"])[None, :], LE, p["R_strategic"])
+
+    # Condition 26: Compliance with local regulations, one row per cell
+    if wanted("Compliance_Local_Regulations"):
+        rb.add("Compliance_Local_Regulations", 26, cell, cell, np.ones(ncell), ncell, LE, p["L_norm"],
+               labels=np.column_stack([src_of + 1, sec_of + 1]))
+
+    # Condition 27: Water balance in the system
+    if wanted("Water_Balance"):
+        rb.add_dense("Water_Balance", 27, ones, GE, p["B_hidro"])
+
+    # Condition 28: Equitable distribution in times of scarcity, every ordered
+    # pair j != k: sum_i x[i, j] / D[j] >= sum_i x[i, k] / D[k]
+    if wanted("Equitable_Distribution_Scarcity") and equity == "common":
+        # one common service ratio r: sum_i x[i, j] / D[j] - r == 0
+        r = rb.add_column("equity_ratio")
+        rows = np.concatenate([sec_of, np.arange(m)])
+        cols = np.concatenate([cell, np.full(m, r)])
+        vals = np.concatenate([1.0 / D[sec_of], -np.ones(m)])
+        rb.add("Equitable_Distribution_Scarcity", 28, rows, cols, vals, m, EQ, 0.0,
+               labels=np.arange(1, m + 1))
+    elif wanted("Equitable_Distribution_Scarcity") and equity == "minmax":
+        # lo <= sum_i x[i, j] / D[j] <= hi for every j, and hi - lo <= 0
+        hi = rb.add_column("equity_max")
+        lo = rb.add_column("equity_min")
+        sector = np.arange(m)
+        rows = np.concatenate([sec_of, sector, m + sec_of, m + sector, [2 * m, 2 * m]])
+        cols = np.concatenate([cell, np.full(m, hi), cell, np.full(m, lo), [hi, lo]])
+        vals = np.concatenate([1.0 / D[sec_of], -np.ones(m), 1.0 / D[sec_of], -np.ones(m), [1.0, -1.0]])
+        names = ["Equitable_Distribution_Scarcity_max_%d" % j for j in range(1, m + 1)] + \
+            ["Equitable_Distribution_Scarcity_min_%d" % j for j in range(1, m + 1)] + \
+            ["Equitable_Distribution_Scarcity_spread"]
+        sense = np.concatenate([np.full(m, LE), np.full(m, GE), [LE]])
+        rb.add("Equitable_Distribution_Scarcity", 28, rows, cols, vals, 2 * m + 1, sense, 0.0, names=names)
+    elif wanted("Equitable_Distribution_Scarcity"):
+        jj, kk = np.nonzero(~np.eye(m, dtype=bool))
+        npair = jj.size
+        pair = np.arange(npair)
+        src = np.arange(n)
+        rows = np.concatenate([np.repeat(pair, n), np.repeat(pair, n)])
+        cols = np.concatenate([(src[None, :] * m + jj[:, None]).ravel(),
+                               (src[None, :] * m + kk[:, None]).ravel()])
+        vals = np.concatenate([np.repeat(1.0 / D[jj], n), np.repeat(-1.0 / D[kk], n)])
+        rb.add("Equitable_Distribution_Scarcity", 28, rows, cols, vals, npair, GE, 0.0,
+               labels=np.column_stack([jj + 1, kk + 1]))
+
+    # Condition 30: Minimizing losses due to leaks
+    if wanted("Minimize_Leak_Losses"):
+        rb.add_dense("Minimize_Leak_Losses", 30, np.asarray(p["L"]) - p["L_max"], LE, 0.0)
+
+    # Condition 34: Protection of aquatic ecosystems
+    if wanted("Aquatic_Ecosystem_Protection"):
+        rb.add_dense("Aquatic_Ecosystem_Protection", 34, ones, LE, p["E_safe"])
+
+    # Condition 6: Environmental sustainability (Emax)
+    if wanted("Environmental_Sustainability"):
+        rb.add_dense("Environmental_Sustainability", 6, np.asarray(p["CEij"])[:, None] * ones, LE, p["Emax"])
+
+    # Condition 7: Equity in distribution, chained through consecutive sectors
+    # (implied by the common-ratio and min/max forms of condition 28)
+    if wanted("Equity_Distribution") and m > 1 and equity == "pairwise":
+        pair = np.arange(m - 1)
+        src = np.arange(n)
+        rows = np.concatenate([np.repeat(pair, n), np.repeat(pair, n)])
+        cols = np.concatenate([(src[None, :] * m + pair[:, None]).ravel(),
+                               (src[None, :] * m + pair[:, None] + 1).ravel()])
+        vals = np.concatenate([np.repeat(1.0 / D[:-1], n), np.repeat(-1.0 / D[1:], n)])
+        names = None
+        if m == 3:
+            names = ["Equity_Distribution_Human_Irrigation", "Equity_Distribution_Irrigation_Cleaning"]
+        rb.add("Equity_Distribution", 7, rows, cols, vals, m - 1, EQ, 0.0,
+               labels=np.column_stack([pair + 1, pair + 2]), names=names)
+
+    # Condition 8: Energy efficiency
+    if wanted("Energy_Efficiency"):
+        rb.add_dense("Energy_Efficiency", 8, p["ENij"], LE, p["ENlim"])
+
+    # Condition 9: Use of wastewater, sum_j x[3, j] >= Rmin * sum x
+    if wanted("Use_of_Wastewater"):
+        grey = _source_mask(n, p["greywater_sources"])[:, None] * ones
+        rb.add_dense("Use_of_Wastewater", 9, grey - p["Rmin"], GE, 0.0)
+
+    # Condition 11: Limitation on the use of drinking water
+    if wanted("Limit_Drinking_Water"):
+        rb.add_dense("Limit_Drinking_Water", 11,
+                     _source_mask(n, p["potable_sources"])[:, None] * ones, LE, p["Pmax"])
+
+    # Condition 12: Use of rainwater, sum_j x[2, j] >= Lmin * sum x
+    if wanted("Use_of_Rainwater"):
+        rain = _source_mask(n, p["stormwater_sources"])[:, None] * ones
+        rb.add_dense("Use_of_Rainwater", 12, rain - p["Lmin"], GE, 0.0)
+
+    # Condition 13: Maximum daily consumption by sector (Dijmax)
+    if wanted("Max_Daily_Consumption_Sector"):
+        rb.add("Max_Daily_Consumption_Sector", 13, sec_of, cell, np.ones(ncell), m, LE, p["Dijmax"],
+               labels=np.arange(1, m + 1))
+
+    # Condition 17: Storage capacity
+    if wanted("Storage_Capacity"):
+        rb.add_dense("Storage_Capacity", 17, p["Sij"], LE, p["Smax"])
+
+    # Condition 18: Delivery time
+    if wanted("Delivery_Time_Limit"):
+        rb.add_dense("Delivery_Time_Limit", 18, p["tij"], LE, p["Treq"])
+
+    # Condition 16: Maintaining water quality, sum Qij*x >= Qmin * sum x
+    if wanted("Maintaining_Water_Quality"):
+        rb.add_dense("Maintaining_Water_Quality", 16, np.asarray(p["Qij"]) - p["Qmin"], GE, 0.0)
+
+    # Condition 4: Water quality cost
+    if wanted("Water_Quality_Cost"):
+        rb.add_dense("Water_Quality_Cost", 4, p["Qij"], LE, p["Q_max"])
+
+    # Condition 21: Energy cost optimization
+    if wanted("Energy_Cost_Optimization"):
+        rb.add_dense("Energy_Cost_Optimization", 21, p["C_Eij"], LE, p["E_cost_max"])
+
+    A, sense, rhs, families = rb.finish()
+    naux = len(rb.aux_names)
+    c = np.concatenate([c, np.zeros(naux)])
+    lb = np.zeros(ncell + naux)
+    ub = np.full(ncell + naux, np.inf)
+    return CompiledModel((n, m), A, sense, rhs, c, lb, ub, families, p, rb.aux_names)
+
+
+def to_pulp(compiled):
+    """Return the compiled model as a PuLP ``Water_Management`` problem.
+
+    Variables and constraints carry the names used by
+    CODE-JCR-WATER-V7-B-25.py.  Returns ``(model, cols)`` where ``cols``
+    lists the ``LpVariable`` of every matrix column in order.
+    """
+    with _phase("to_pulp", compiled.n_rows, compiled.nnz):
+        return _to_pulp(compiled)
+
+
+def _to_pulp(compiled):
+    import pulp as pl
+
+    cols = [pl.LpVariable(name, lowBound=None if np.isinf(lo) else float(lo),
+                          upBound=None if np.isinf(hi) else float(hi))
+            for name, lo, hi in zip(compiled.col_names(), compiled.lb, compiled.ub)]
+
+    model = pl.LpProblem("Water_Management", pl.LpMinimize)
+    model += pl.LpAffineExpression([(cols[k], float(v)) for k, v in enumerate(compiled.c) if v]), "Total_Cost"
+
+    A = compiled.A
+    indptr, indices, data = A.indptr, A.indices, A.data
+    for fam in compiled.families:
+        for r in range(fam.start, fam.stop):
+            lo, hi = indptr[r], indptr[r + 1]
+            expr = pl.LpAffineExpression([(cols[k], float(v)) for k, v in zip(indices[lo:hi], data[lo:hi])])
+            name = fam.row_name(r - fam.start)
+            model.addConstraint(pl.LpConstraint(expr, int(compiled.sense[r]), name, float(compiled.rhs[r])), name)
+        if _profiler is not None:
+            _profiler.family(fam.name, fam.condition, len(fam), int(indptr[fam.stop] - indptr[fam.start]))
+    return model, cols
+
+
+def apply_overrides(params, overrides):
+    """Return a copy of ``params`` with ``overrides`` applied.
+
+    Keys name a parameter (``"Ct"``, ``"D"``) to replace it whole, or a
+    single 1-based entry of a table (``"A[2]"``, ``"Tr[1,3]"``); an index
+    outside the table raises ValueError.
+    """
+    p = dict(params)
+    for key, value in overrides.items():
+        if key.endswith("]") and "[" in key:
+            name, index = key[:-1].split("[", 1)
+            if name not in p:
+                raise KeyError("unknown parameter %r" % name)
+            idx = tuple(int(k) - 1 for k in index.split(","))
+            table = np.array(p[name], dtype=float)
+            if len(idx) != table.ndim or not all(0 <= k < size for k, size in zip(idx, table.shape)):
+                raise ValueError("index of %r out of range for %s of shape %s" % (
+                    key, name, "x".join(str(size) for size in table.shape) or "()"))
+            table[idx] = value
+            p[name] = table
+        elif key not in p:
+            raise KeyError("unknown parameter %r" % key)
+        elif isinstance(p[key], np.ndarray):
+            p[key] = np.broadcast_to(np.asarray(value, dtype=float), p[key].shape).copy()
+        else:
+            p[key] = value
+    return p
+
+
+def solve(compiled, msg=False, backend="cbc", scaling=None):
+    """Solve the compiled model.
+
+    ``backend`` is ``"cbc"`` (PuLP's default CBC, through an MPS file and a
+    subprocess, as the script does), ``"highs"`` (in-process HiGHS through
+    highspy) or ``"linprog"`` (``scipy.optimize.linprog``, also HiGHS).
+    The in-process backends pass the compiled matrix directly, with no
+    file I/O.
+
+    Returns a dict with the PuLP ``status`` string, the ``objective`` value,
+    the column ``values``, the N x M allocation ``x``, the row ``activity``
+    (A @ values, in the order of ``compiled.row_names()``) and the row
+    ``duals`` (change of Total_Cost per unit increase of the right-hand
+    side); all NaN when there is no solution.
+
+    ``scaling`` (``"geometric"`` or ``"equilibrate"``) solves a row- and
+    column-scaled copy of the model (``water_scaling``) and returns the
+    result in the original units.
+    """
+    if scaling is not None:
+        import water_scaling
+
+        return water_scaling.solve(compiled, msg, backend, scaling)
+    if backend == "cbc":
+        result = _solve_cbc(compiled, msg)
+    elif backend in ("highs", "linprog"):
+        import water_highs
+
+        solver = water_highs.solve_highs if backend == "highs" else water_highs.solve_linprog
+        result = solver(compiled)
+    else:
+        raise ValueError("unknown backend %r" % backend)
+    result["x"] = compiled.x_matrix(result["values"])
+    result["activity"] = compiled.A @ result["values"]
+    return result
+
+
+def row_slack(compiled, activity):
+    """Return the slack of every row for the row ``activity``.
+
+    The slack is non-negative when the row is satisfied: ``rhs - activity``
+    for <= rows, ``activity - rhs`` for >= rows and ``-|activity - rhs|``
+    for equalities.
+    """
+    gap = compiled.rhs - activity
+    return np.where(compiled.sense == LE, gap, np.where(compiled.sense == GE, -gap, -np.abs(gap)))
+
+
+def constraint_report(compiled, result):
+    """Return ``(name, activity, sense, rhs, slack)`` for every constraint."""
+    activity = result["activity"]
+    slack = row_slack(compiled, activity)
+    symbol = {LE: "<=", EQ: "==", GE: ">="}
+    return [(name, activity[r], symbol[int(compiled.sense[r])], compiled.rhs[r], slack[r])
+            for r, name in enumerate(compiled.row_names())]
+
+
+def _solve_cbc(compiled, msg):
+    import pulp as pl
+
+    model, cols = to_pulp(compiled)
+    solver = pl.PULP_CBC_CMD(msg=msg)
+    if _profiler is None:
+        model.solve(solver)
+    else:
+        # split PuLP's solve into writing the MPS file, CBC and reading the solution
+        model.writeMPS = _profiled("write", model.writeMPS, compiled)
+        solver.readsol_MPS = _profiled("parse", solver.readsol_MPS, compiled)
+        with _phase("cbc", compiled.n_rows, compiled.nnz):
+            model.solve(solver)
+    with _phase("extract", compiled.n_rows):
+        status = pl.LpStatus[model.status]
+        values = np.full(compiled.n_cols, np.nan)
+        duals = np.full(compiled.n_rows, np.nan)
+        objective = np.nan
+        if status == "Optimal":
+            values = np.array([v.varValue for v in cols], dtype=float)
+            objective = pl.value(model.objective)
+            duals = np.array([model.constraints[name].pi for name in compiled.row_names()], dtype=float)
+    return {"status": status, "objective": objective, "values": values, "duals": duals}
+
+
+def _profiled(phase, fn, compiled):
+    """Wrap ``fn`` so each call is recorded as ``phase``."""
+    def wrapper(*args, **kwargs):
+        with _phase(phase, compiled.n_rows, compiled.nnz):
+            return fn(*args, **kwargs)
+    return wrapper
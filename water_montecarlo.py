@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo analysis of rainfall, demand and drought-reserve uncertainty.
+
+The script solves the model for one value of the rainwater availability
+``A[2]``, the sector demands ``D`` and the drought reserve ``R_drought``.
+``sample`` draws thousands of realizations of them at once and
+``monte_carlo`` solves them all on one compiled model per worker process:
+
+- the right-hand sides of every realization are assembled up front as a
+  K x rows matrix, and each solve only pushes the changed rows to a
+  warm-started ``water_highs.PersistentModel``;
+- the 1 / D[j] coefficients of the equity rows (conditions 7 and 28) are
+  updated in place, since D also weights them;
+- the slacks of all rows are compared for a whole batch at once to
+  find the binding inequality constraints.
+
+The result reports the feasibility rate, the Total_Cost distribution over
+the feasible realizations, how often each constraint binds and the
+throughput in scenarios per second per core.
+
+Requires ``highspy`` (pip install highspy).
+
+Example:
+    base = water_model.default_parameters()
+    result = monte_carlo(base, sample(base, 5000), processes=4)
+    print(format_result(result))
+"""
+
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import water_highs as whs
+import water_model as wm
+
+# Uncertain parameters and the row family each one is the right-hand side of
+UNCERTAIN = {
+    "A": "Water_Availability_Source",
+    "D": "Sector_Demand",
+    "R_drought": "Resilience_Droughts",
+}
+
+# Persistent model of the current worker process
+_pm = None
+
+
+def _lognormal(rng, mean, cv, size):
+    """Log-normal draws with the given mean and coefficient of variation."""
+    sigma2 = np.log1p(np.square(cv))
+    return np.asarray(mean, dtype=float) * np.exp(np.sqrt(sigma2) * rng.standard_normal(size) - sigma2 / 2.0)
+
+
+def sample(params, n_samples, seed=0, rain_cv=0.3, demand_cv=0.1, drought_cv=0.2):
+    """Draw ``n_samples`` realizations of the uncertain parameters.
+
+    Each is log-normal around the value in ``params`` with the given
+    coefficient of variation; only the stormwater sources (``A[2]`` in the
+    script) vary in ``A``.  Returns ``{"A": K x N, "D": K x M,
+    "R_drought": K}``.
+    """
+    rng = np.random.default_rng(seed)
+    A = np.tile(np.asarray(params["A"], dtype=float), (n_samples, 1))
+    rain = np.asarray(params["stormwater_sources"], dtype=np.int64) - 1
+    A[:, rain] = _lognormal(rng, A[0, rain], rain_cv, (n_samples, rain.size))
+    D = _lognormal(rng, params["D"], demand_cv, (n_samples, len(params["D"])))
+    R = _lognormal(rng, params["R_drought"], drought_cv, n_samples)
+    return {"A": A, "D": D, "R_drought": R}
+
+
+def rhs_matrix(compiled, samples):
+    """Return ``(rows, R)``: the row numbers the samples set and their K x len(rows) right-hand sides."""
+    rows = []
+    blocks = []
+    for name, values in samples.items():
+        fam = compiled.family(UNCERTAIN[name])
+        values = np.asarray(values, dtype=float)
+        rows.append(np.arange(fam.start, fam.stop))
+        blocks.append(values.reshape(values.shape[0], len(fam)))
+    return np.concatenate(rows), np.hstack(blocks)
+
+
+def _init_worker(compiled):
+    global _pm
+    _pm = whs.PersistentModel(compiled)
+
+
+def _solve_batch(item):
+    """Solve one batch; returns (start, status codes, objectives, binding counts)."""
+    start, rows, R, D = item
+    pm = _pm
+    cm = pm.compiled
+    k = R.shape[0]
+    feasible = np.zeros(k, dtype=bool)
+    objective = np.full(k, np.nan)
+    activity = np.zeros((k, cm.n_rows))
+    rhs = np.tile(cm.rhs, (k, 1))
+    rhs[:, rows] = R
+    equity = D is not None and pm.has_equity()
+    for s in range(k):
+        pm.set_rhs_row(rows, R[s])
+        if equity:
+            pm.scale_equity(D[s])
+        result = pm.solve()
+        if result["status"] == "Optimal":
+            feasible[s] = True
+            objective[s] = result["objective"]
+            activity[s] = result["activity"]
+    # Binding inequalities of the whole batch at once; equalities always bind
+    gap = rhs - activity
+    slack = np.where(cm.sense == wm.LE, gap, -gap)
+    binding = (np.abs(slack) <= 1e-7 * (1.0 + np.abs(rhs))) & (cm.sense != wm.EQ) & feasible[:, None]
+    return start, feasible, objective, binding.sum(axis=0)
+
+
+def monte_carlo(params, samples, processes=None, batch_size=256, equity="pairwise"):
+    """Solve the model for every realization in ``samples``.
+
+    ``samples`` is the dict returned by ``sample`` (any subset of its keys).
+    The model is compiled once from ``params``; ``processes`` is the pool
+    size (default: all cores, ``1`` solves in the calling process) and
+    each worker solves ``batch_size`` realizations per task.
+
+    Returns a dict with ``"feasible"`` (bool, K), ``"objective"`` (K,
+    NaN where infeasible), ``"binding"`` (times each inequality row was binding),
+    ``"row_names"``, ``"wall"`` (seconds), ``"processes"`` and
+    ``"per_core"`` (scenarios per second per core).
+    """
+    compiled = wm.build_model(params, equity=equity)
+    rows, R = rhs_matrix(compiled, samples)
+    D = samples.get("D")
+    k = R.shape[0]
+    items = [(s, rows, R[s:s + batch_size], None if D is None else D[s:s + batch_size])
+             for s in range(0, k, batch_size)]
+
+    feasible = np.zeros(k, dtype=bool)
+    objective = np.full(k, np.nan)
+    binding = np.zeros(compiled.n_rows, dtype=np.int64)
+    t0 = time.perf_counter()
+    if processes == 1 or len(items) <= 1:
+        processes = 1
+        _init_worker(compiled)
+        results = map(_solve_batch, items)
+        pool = None
+    else:
+        processes = min(processes or os.cpu_count() or 1, len(items))
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(compiled,))
+        results = pool.imap_unordered(_solve_batch, items)
+    try:
+        for start, ok, obj, counts in results:
+            feasible[start:start + ok.size] = ok
+            objective[start:start + ok.size] = obj
+            binding += counts
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    wall = time.perf_counter() - t0
+    return {"feasible": feasible, "objective": objective, "binding": binding,
+            "row_names": compiled.row_names(), "wall": wall, "processes": processes,
+            "per_core": k / wall / processes}
+
+
+def format_result(result, top=5):
+    """Render a Monte Carlo result as text."""
+    k = result["feasible"].size
+    ok = result["feasible"].sum()
+    lines = ["%d realizations, feasible %d (%.1f%%), %.1f scenarios/s/core on %d core(s)" % (
+        k, ok, 100.0 * ok / k, result["per_core"], result["processes"])]
+    if ok:
+        obj = result["objective"][result["feasible"]]
+        q = np.percentile(obj, [5, 50, 95])
+        lines.append("Total_Cost: mean %.4f, std %.4f, p5 %.4f, p50 %.4f, p95 %.4f, max %.4f" % (
+            obj.mean(), obj.std(), q[0], q[1], q[2], obj.max()))
+        lines.append("Most often binding:")
+        binding = result["binding"]
+        for r in np.argsort(-binding, kind="stable")[:top]:
+            if binding[r] == 0:
+                break
+            lines.append("  %-45s %6.1f%%" % (result["row_names"][r], 100.0 * binding[r] / ok))
+    return "\n".join(lines)
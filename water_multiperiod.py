@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Time-indexed (multi-period) Water_Management model.
+
+The script's model is a single day.  Here x is indexed by (i, j, t) for
+t = 1..T and every source i gets a storage variable s[i, t] linking the
+days through a storage balance:
+
+    s[i, t] - s[i, t-1] + sum_j x[i, j, t] <= inflow[i, t]
+
+(with s[i, 0] the initial storage), which replaces the per-day
+availability rows of condition 1.  The remaining condition families are
+either enforced every day or aggregated into one row over the horizon.
+Most caps of the script are daily figures (Smax, CO2_max, E_cost_max,
+...); ``Pmax`` is per year, so condition 11 is aggregated by default,
+with its cap prorated to the horizon (T / 365 of the year).
+
+The matrix is assembled with sparse Kronecker products of the
+single-period blocks compiled by ``water_model.build_model``, so the
+365-day model builds in a fraction of a second.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+import water_model as wm
+
+# Families whose right-hand side is an annual figure in the script
+ANNUAL_FAMILIES = ("Limit_Drinking_Water",)
+
+# Days an annual figure covers
+DAYS_PER_YEAR = 365
+
+
+def seasonal_inflow(params, periods=365, amplitude=0.8, peak=180):
+    """Return a T x N daily inflow table.
+
+    Every source receives ``A[i]`` per day except the stormwater sources,
+    whose inflow follows a cosine season with relative ``amplitude``
+    around ``A[i]``, peaking on day ``peak``.
+    """
+    A = np.asarray(params["A"], dtype=float)
+    inflow = np.tile(A, (periods, 1))
+    t = np.arange(periods)
+    season = 1.0 + amplitude * np.cos(2.0 * np.pi * (t - peak) / periods)
+    rain = np.asarray(params["stormwater_sources"], dtype=np.int64) - 1
+    inflow[:, rain] = season[:, None] * A[rain][None, :]
+    return inflow
+
+
+class MultiPeriodModel(wm.CompiledModel):
+    """Compiled multi-period model.
+
+    Columns hold the single-period columns day by day, W = N * M cells
+    plus the auxiliary columns of the single-period model: x[i, j, t] is
+    column ``t * W + (i - 1) * M + (j - 1)`` for day t counted from 0.
+    The storage s[i, t] follows (``T * W + t * N + (i - 1)``).
+    """
+
+    def __init__(self, shape, periods, A, sense, rhs, c, lb, ub, families, params, aux_names=()):
+        wm.CompiledModel.__init__(self, shape, A, sense, rhs, c, lb, ub, families, params, aux_names)
+        self.periods = periods
+        self.width = shape[0] * shape[1] + len(self.aux_names)
+
+    def __repr__(self):
+        return "MultiPeriodModel(%dx%d, T=%d, rows=%d, cols=%d, nnz=%d)" % (
+            self.shape[0], self.shape[1], self.periods, self.n_rows, self.n_cols, self.nnz)
+
+    @property
+    def blocks(self):
+        n, m = self.shape
+        T, W = self.periods, self.width
+        blocks = []
+        for t in range(T):
+            blocks.append(wm.VariableBlock("x", t * W, (n, m), suffix=(t + 1,)))
+            blocks += [wm.VariableBlock(name, t * W + n * m + k, suffix=(t + 1,))
+                       for k, name in enumerate(self.aux_names)]
+        # s[i, t] is stored day by day, named s_(i,_t)
+        blocks.append(wm.VariableBlock("s", T * W, (T, n), order=(1, 0)))
+        return blocks
+
+    def x_matrix(self, values):
+        """Return the T x N x M allocation x[i, j, t] of a column vector."""
+        n, m = self.shape
+        days = np.asarray(values, dtype=float)[:self.periods * self.width].reshape(self.periods, self.width)
+        return days[:, :n * m].reshape(self.periods, n, m)
+
+    def storage(self, values):
+        """Return the T x N storage levels s[i, t] of a column vector."""
+        n, m = self.shape
+        return np.asarray(values, dtype=float)[self.periods * self.width:].reshape(self.periods, n)
+
+
+def _time_labels(fam, periods):
+    """Labels of a family repeated for every day, with the day appended."""
+    k = len(fam)
+    if fam.labels is None:
+        base = np.zeros((k, 0), dtype=np.int64)
+    else:
+        base = np.asarray(fam.labels).reshape(k, -1)
+    day = np.repeat(np.arange(1, periods + 1), k)[:, None]
+    return np.hstack([np.tile(base, (periods, 1)), day])
+
+
+def build_multiperiod(params=None, periods=365, inflow=None, storage_capacity=None,
+                      initial_storage=None, aggregation=None, exclude=(), equity="pairwise", aggregates=False):
+    """Compile the T-period model.
+
+    ``inflow`` is a T x N table (default ``seasonal_inflow``);
+    ``storage_capacity`` and ``initial_storage`` are per source (default
+    30 days of ``A`` and empty).  ``aggregation`` maps a family name to
+    ``"daily"`` (one row per day) or ``"annual"`` (one row summed over the
+    horizon); families not listed keep their native period, annual for
+    ``ANNUAL_FAMILIES`` and daily otherwise.  A daily cap enforced
+    over the horizon is multiplied by T; an annual cap enforced over the
+    horizon is prorated to T / ``DAYS_PER_YEAR`` of the year, and enforced
+    daily it is divided by ``DAYS_PER_YEAR``.  A 4-period rolling
+    horizon thus gets 4/365 of ``Pmax``, not the whole year's allowance.
+    ``exclude``, ``equity`` and ``aggregates`` are passed to
+    ``water_model.build_model``.
+    """
+    with wm._phase("build_multiperiod") as info:
+        model = _build_multiperiod(params, periods, inflow, storage_capacity, initial_storage, aggregation,
+                                   exclude, equity, aggregates)
+        info["rows"], info["terms"] = model.n_rows, model.nnz
+    return model
+
+
+def _build_multiperiod(params, periods, inflow, storage_capacity, initial_storage, aggregation, exclude, equity,
+                       aggregates):
+    p = wm.default_parameters() if params is None else params
+    aggregation = {} if aggregation is None else aggregation
+    T = periods
+    base = wm.build_model(p, exclude=tuple(exclude) + ("Water_Availability_Source",), equity=equity,
+                          aggregates=aggregates)
+    n, m = base.shape
+    w = base.n_cols
+    nx = w * T
+    ns = n * T
+    A1 = base.A.tocsr()
+
+    if inflow is None:
+        inflow = seasonal_inflow(p, T)
+    inflow = np.broadcast_to(np.asarray(inflow, dtype=float), (T, n))
+    if storage_capacity is None:
+        storage_capacity = 30.0 * np.asarray(p["A"], dtype=float)
+    if initial_storage is None:
+        initial_storage = np.zeros(n)
+    initial_storage = np.broadcast_to(np.asarray(initial_storage, dtype=float), (n,))
+
+    blocks = []
+    sense = []
+    rhs = []
+    families = []
+    n_rows = 0
+
+    # Condition 1 (multi-period): storage balance per source and day, row t * N + i
+    day = np.repeat(np.arange(T), n)
+    src = np.tile(np.arange(n), T)
+    r = np.arange(ns)
+    x_rows = np.repeat(r, m)
+    x_cols = (day[:, None] * w + src[:, None] * m + np.arange(m)[None, :]).ravel()
+    prev = r[day > 0]
+    rows = np.concatenate([x_rows, r, prev])
+    cols = np.concatenate([x_cols, nx + r, nx + prev - n])
+    vals = np.concatenate([np.ones(x_rows.size), np.ones(ns), -np.ones(prev.size)])
+    blocks.append(sp.csr_matrix((vals, (rows, cols)), shape=(ns, nx + ns)))
+    b = inflow.ravel().copy()
+    b[:n] += initial_storage
+    sense.append(np.full(ns, wm.LE, dtype=np.int8))
+    rhs.append(b)
+    families.append(wm.RowFamily("Storage_Balance", 1, 0, ns, labels=np.column_stack([src + 1, day + 1])))
+    n_rows = ns
+
+    for fam in base.families:
+        block = A1[fam.rows]
+        k = len(fam)
+        native = "annual" if fam.name in ANNUAL_FAMILIES else "daily"
+        mode = aggregation.get(fam.name, native)
+        fam_rhs = base.rhs[fam.rows]
+        if mode == "daily":
+            x_block = sp.kron(sp.identity(T, format="csr"), block, format="csr")
+            fam_rhs = np.tile(fam_rhs / DAYS_PER_YEAR if native == "annual" else fam_rhs, T)
+            labels = _time_labels(fam, T)
+            names = None
+            if fam.names is not None:
+                names = ["%s_%d" % (name, t) for t in range(1, T + 1) for name in fam.names]
+            k_out = k * T
+        elif mode == "annual":
+            x_block = sp.kron(np.ones((1, T)), block, format="csr")
+            fam_rhs = fam_rhs * T if native == "daily" else fam_rhs * (T / DAYS_PER_YEAR)
+            labels, names = fam.labels, fam.names
+            k_out = k
+        else:
+            raise ValueError("aggregation must be 'daily' or 'annual', not %r" % mode)
+        pad = sp.csr_matrix((k_out, ns))
+        blocks.append(sp.hstack([x_block, pad], format="csr"))
+        sense.append(np.tile(base.sense[fam.rows], k_out // k))
+        rhs.append(fam_rhs)
+        families.append(wm.RowFamily(fam.name, fam.condition, n_rows, n_rows + k_out, labels, names))
+        n_rows += k_out
+
+    A = sp.vstack(blocks, format="csr")
+    c = np.concatenate([np.tile(base.c, T), np.zeros(ns)])
+    lb = np.concatenate([np.tile(base.lb, T), np.zeros(ns)])
+    ub = np.concatenate([np.tile(base.ub, T), np.tile(np.asarray(storage_capacity, dtype=float), T)])
+    return MultiPeriodModel((n, m), T, A, np.concatenate(sense), np.concatenate(rhs), c, lb, ub, families, p,
+                            base.aux_names)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Epsilon-constraint Pareto frontiers of Total_Cost against CO2 and energy.
+
+The script minimizes cost only and uses the energy tables as hard caps:
+
+- ``"co2"``: sum C_CO2ij * x[i, j] (condition 22, defined in the script
+  but never added to the model), capped by ``CO2_max``;
+- ``"energy"``: sum ENij * x[i, j] (condition 8, ``Energy_Efficiency``),
+  capped by ``ENlim``;
+- ``"energy_cost"``: sum C_Eij * x[i, j] (condition 21,
+  ``Energy_Cost_Optimization``), capped by ``E_cost_max``.
+
+``frontier`` traces Total_Cost against one of them: it minimizes cost
+subject to ``objective <= epsilon`` for epsilon between the smallest
+achievable value and the value at the cost optimum.  The other caps stay
+as in the script.  Points are placed adaptively: a segment of the
+frontier is bisected while the cost at its midpoint is further than
+``tol`` from the straight line between its ends, so points gather where
+the frontier bends and straight stretches get none.
+
+Each refinement round solves its midpoints across a process pool; every
+worker holds one warm-started ``water_highs.PersistentModel`` and solves
+a contiguous, sorted run of epsilons, so each point starts from the basis
+of its neighbour.
+
+Requires ``highspy`` (pip install highspy).
+
+Example:
+    front = frontier(water_model.default_parameters(), "co2")
+    print(format_frontier(front))
+"""
+
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+import water_highs as whs
+import water_model as wm
+
+# Objective -> (coefficient table, cap parameter, condition, row family)
+OBJECTIVES = {
+    "co2": ("C_CO2ij", "CO2_max", 22, "CO2_Emissions"),
+    "energy": ("ENij", "ENlim", 8, "Energy_Efficiency"),
+    "energy_cost": ("C_Eij", "E_cost_max", 21, "Energy_Cost_Optimization"),
+}
+
+# Worker state: the persistent model, its epsilon row and objective coefficients
+_pm = None
+_row = None
+_coef = None
+
+
+def epsilon_model(compiled, objective):
+    """Return ``(model, row, coef)`` for the epsilon constraint on ``objective``.
+
+    ``row`` is the row number of ``objective <= epsilon`` in ``model``,
+    the existing cap row when ``compiled`` has one and otherwise a new
+    one-row family appended to a copy of ``compiled``; ``coef`` is the
+    objective as a column vector.
+    """
+    table, cap, condition, family = OBJECTIVES[objective]
+    p = compiled.params
+    coef = np.zeros(compiled.n_cols)
+    coef[:compiled.shape[0] * compiled.shape[1]] = np.ravel(p[table])
+    try:
+        return compiled, compiled.family(family).start, coef
+    except KeyError:
+        pass
+    row = compiled.n_rows
+    A = sp.vstack([compiled.A, sp.csr_matrix(coef)], format="csr")
+    families = list(compiled.families) + [wm.RowFamily(family, condition, row, row + 1)]
+    model = wm.CompiledModel(compiled.shape, A, np.append(compiled.sense, wm.LE),
+                             np.append(compiled.rhs, float(p[cap])), compiled.c.copy(), compiled.lb.copy(),
+                             compiled.ub.copy(), families, compiled.params, compiled.aux_names)
+    return model, row, coef
+
+
+def _init_worker(model, row, coef):
+    global _pm, _row, _coef
+    _pm = whs.PersistentModel(model)
+    _row = row
+    _coef = coef
+
+
+def _solve_points(epsilons):
+    """Minimize cost for each epsilon in order; returns (status, cost, objective value, values) lists."""
+    out = []
+    for eps in epsilons:
+        _pm.set_rhs_row(_row, eps)
+        result = _pm.solve()
+        out.append((result["status"], result["objective"], float(_coef @ result["values"]), result["values"]))
+    return out
+
+
+def _extreme(model, row, coef):
+    """Return the smallest achievable value of the objective ``coef`` and its solve status."""
+    h = whs.make_highs(model)
+    inf = whs._import_highspy().kHighsInf
+    h.changeColsCost(model.n_cols, np.arange(model.n_cols, dtype=np.int32), coef)
+    h.changeRowBounds(int(row), -inf, inf)
+    status = whs.run(h)
+    return h.getInfo().objective_function_value if status == "Optimal" else np.nan, status
+
+
+def frontier(params, objective="co2", tol=1e-3, max_points=64, processes=None, equity="pairwise"):
+    """Trace the Total_Cost vs. ``objective`` frontier.
+
+    ``tol`` is the largest allowed gap between the frontier and the
+    straight line through two neighbouring points, relative to the cost
+    range; refinement stops there or at ``max_points`` points.
+    ``processes`` is the pool size (default: all cores, ``1`` solves in
+    the calling process).
+
+    Returns a dict of columns sorted by epsilon: ``"epsilon"``,
+    ``"cost"``, ``objective`` (value reached), ``"x"`` (P x N x M) and
+    ``"status"``, plus ``"solves"`` and ``"wall"`` (seconds).  The first
+    point has the smallest achievable ``objective``, the last the cost
+    optimum.
+    """
+    t0 = time.perf_counter()
+    compiled = wm.build_model(params, equity=equity)
+    model, row, coef = epsilon_model(compiled, objective)
+    cap = model.rhs[row]
+    f_min, status = _extreme(model, row, coef)
+    columns = {"epsilon": [], "cost": [], objective: [], "x": [], "status": []}
+    if status != "Optimal":
+        front = {k: np.asarray(v) for k, v in columns.items()}
+        front.update(status=[status], solves=1, wall=time.perf_counter() - t0)
+        return front
+
+    if processes == 1:
+        pool = None
+        _init_worker(model, row, coef)
+    else:
+        processes = processes or os.cpu_count() or 1
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(model, row, coef))
+    points = {}
+
+    def solve_all(epsilons):
+        epsilons = sorted(epsilons)
+        if pool is None:
+            results = _solve_points(epsilons)
+        else:
+            chunks = [c.tolist() for c in np.array_split(epsilons, min(processes, len(epsilons)))]
+            results = [r for chunk in pool.map(_solve_points, chunks) for r in chunk]
+        for eps, result in zip(epsilons, results):
+            points[eps] = result
+
+    try:
+        # Ends: the cost optimum, then the cheapest point at the smallest objective
+        solve_all([cap])
+        f_max = min(cap, points[cap][2])
+        low = f_min + 1e-9 * (1.0 + abs(f_min))
+        if f_max <= low:
+            segments = []
+        else:
+            solve_all([low])
+            segments = [(low, cap)]
+        cost_range = abs(points[low][1] - points[cap][1]) if segments else 0.0
+        while segments and len(points) < max_points:
+            # the midpoint in epsilon, with the top end at the cost optimum's value
+            mids = [(lo + min(hi, f_max)) / 2.0 for lo, hi in segments]
+            mids = mids[:max_points - len(points)]
+            solve_all(mids)
+            refined = []
+            for (lo, hi), mid in zip(segments, mids):
+                a, b = points[lo], points[hi]
+                fa, fb = a[2], min(b[2], f_max)
+                line = a[1] + (b[1] - a[1]) * (mid - fa) / (fb - fa) if fb > fa else a[1]
+                if abs(line - points[mid][1]) > tol * max(cost_range, 1e-12):
+                    refined += [(lo, mid), (mid, hi)]
+            segments = refined
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    for eps in sorted(points):
+        status, cost, value, values = points[eps]
+        columns["epsilon"].append(eps)
+        columns["cost"].append(cost)
+        columns[objective].append(value)
+        columns["x"].append(model.x_matrix(values))
+        columns["status"].append(status)
+    front = {k: (v if k == "status" else np.asarray(v)) for k, v in columns.items()}
+    front.update(solves=len(points) + 1, wall=time.perf_counter() - t0)
+    return front
+
+
+def format_frontier(front):
+    """Render a frontier as text."""
+    objective = [k for k in front if k not in ("epsilon", "cost", "x", "status", "solves", "wall")][0]
+    lines = ["%d points, %d solves, %.3fs" % (len(front["cost"]), front["solves"], front["wall"]),
+             "%16s %16s  %s" % (objective, "Total_Cost", "status")]
+    for k in range(len(front["cost"])):
+        lines.append("%16.6g %16.6f  %s" % (front[objective][k], front["cost"][k], front["status"][k]))
+    return "\n".join(lines)
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Presolve for the compiled Water_Management model.
+
+Many rows of the script's model never bind or repeat another row with a
+different right-hand side: ``Treatment_Capacity`` (Ct) and
+``Aquatic_Ecosystem_Protection`` (E_safe) bound the same total flow,
+``Resilience_Droughts`` and ``Water_Balance`` too, and
+``Infrastructure_Capacity`` has only negative coefficients on
+non-negative flows.  ``presolve`` removes such rows before the solver
+sees them:
+
+- singleton rows become column bounds (the per-cell ``L_norm`` caps);
+- parallel rows (same coefficients up to a factor) keep only the
+  tightest bound on each side, and opposite bounds that meet are merged
+  into one equality;
+- rows that cannot bind given the column bounds are dropped;
+- column bounds are tightened from the row activity bounds.
+
+Columns are never removed, so a solution of the reduced model is a
+solution of the original one, column for column.
+
+Example:
+    reduced, report = presolve(water_model.build_model())
+    print(report.format())
+    result = water_model.solve(reduced, backend="highs")
+"""
+
+import copy
+
+import numpy as np
+import scipy.sparse as sp
+
+import water_model as wm
+
+# Absolute/relative feasibility tolerance
+TOL = 1e-9
+
+
+class PresolveReport:
+    """What ``presolve`` removed or changed.
+
+    ``removed`` lists ``(row name, reason)`` pairs, ``tightened`` the
+    number of column bounds that moved and ``kept`` the original row
+    numbers of the reduced model.  ``infeasible`` names a row that cannot
+    be satisfied, or is None.
+    """
+
+    def __init__(self, n_rows, n_nnz):
+        self.n_rows = n_rows
+        self.n_nnz = n_nnz
+        self.removed = []
+        self.tightened = 0
+        self.kept = None
+        self.infeasible = None
+        self.reduced_rows = n_rows
+        self.reduced_nnz = n_nnz
+
+    def counts(self):
+        """Return the number of removed rows per reason."""
+        counts = {}
+        for _, reason in self.removed:
+            key = reason.split(" ", 1)[0]
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def format(self, limit=50):
+        lines = ["rows %d -> %d, nonzeros %d -> %d, column bounds tightened: %d" % (
+            self.n_rows, self.reduced_rows, self.n_nnz, self.reduced_nnz, self.tightened)]
+        if self.infeasible is not None:
+            lines.append("infeasible: %s" % self.infeasible)
+        lines.append(", ".join("%s: %d" % item for item in sorted(self.counts().items())))
+        for name, reason in self.removed[:limit]:
+            lines.append("  %-45s %s" % (name, reason))
+        if len(self.removed) > limit:
+            lines.append("  ... %d more" % (len(self.removed) - limit))
+        return "\n".join(lines)
+
+
+def _activity_bounds(A, lb, ub):
+    """Return (min, max) activity of every row over the box [lb, ub]."""
+    pos = A.multiply(A > 0).tocsr()
+    neg = A.multiply(A < 0).tocsr()
+    lo = pos @ lb + neg @ ub
+    hi = pos @ ub + neg @ lb
+    return lo, hi
+
+
+def _parallel_groups(A):
+    """Return groups (arrays of row numbers) of rows that are multiples of each other.
+
+    Returns ``(groups, scale)`` where row r equals ``scale[r]`` times a
+    normalized row whose first stored coefficient is 1.
+    """
+    nnz = np.diff(A.indptr)
+    scale = np.ones(A.shape[0])
+    has = nnz > 0
+    scale[has] = A.data[A.indptr[:-1][has]]
+    norm = sp.diags(1.0 / scale) @ A
+    rng = np.random.default_rng(0)
+    h1 = norm @ rng.uniform(1.0, 2.0, A.shape[1])
+    h2 = norm @ rng.uniform(1.0, 2.0, A.shape[1])
+    key = np.column_stack([nnz, np.round(h1, 9), np.round(h2, 9)])
+    _, inverse, counts = np.unique(key, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    groups = []
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    for g in np.flatnonzero((counts > 1) & (np.bincount(inverse, weights=has, minlength=counts.size) > 0)):
+        rows = order[bounds[g]:bounds[g + 1]]
+        # confirm the candidates exactly against the first row of the group
+        first = norm.getrow(rows[0])
+        same = [rows[0]]
+        for r in rows[1:]:
+            other = norm.getrow(r)
+            if np.array_equal(first.indices, other.indices) and \
+                    np.allclose(first.data, other.data, rtol=1e-9, atol=0.0):
+                same.append(r)
+        if len(same) > 1:
+            groups.append(np.array(same))
+    return groups, scale
+
+
+def presolve(compiled, max_passes=10):
+    """Return ``(reduced, report)`` for ``compiled``.
+
+    ``reduced`` is a copy of ``compiled`` (of the same class, e.g. a
+    ``MultiPeriodModel``) with the same columns, a subset of the rows
+    (possibly with an equality sense where two opposite rows met) and
+    tightened column bounds.
+    """
+    A = compiled.A.tocsr()
+    A.eliminate_zeros()
+    names = compiled.row_names()
+    n_rows = A.shape[0]
+    report = PresolveReport(n_rows, A.nnz)
+
+    # Range form lo <= A x <= hi
+    sense = compiled.sense
+    lo = np.where(sense == wm.LE, -np.inf, compiled.rhs).astype(float)
+    hi = np.where(sense == wm.GE, np.inf, compiled.rhs).astype(float)
+    lb = compiled.lb.astype(float).copy()
+    ub = compiled.ub.astype(float).copy()
+    keep = np.ones(n_rows, dtype=bool)
+    nnz = np.diff(A.indptr)
+
+    # Empty rows
+    for r in np.flatnonzero(nnz == 0):
+        if lo[r] > TOL or hi[r] < -TOL:
+            report.infeasible = names[r]
+        keep[r] = False
+        report.removed.append((names[r], "empty"))
+
+    # Parallel rows: keep the tightest bound on each side of every group
+    groups, scale = _parallel_groups(A)
+    for rows in groups:
+        s = scale[rows]
+        # bounds on the normalized row
+        nlo = np.where(s > 0, lo[rows] / s, hi[rows] / s)
+        nhi = np.where(s > 0, hi[rows] / s, lo[rows] / s)
+        best_hi = nhi.min()
+        best_lo = nlo.max()
+        r_hi = rows[np.argmin(nhi)] if np.isfinite(best_hi) else None
+        r_lo = rows[np.argmax(nlo)] if np.isfinite(best_lo) else None
+        if r_hi is not None and r_lo is not None:
+            if best_lo > best_hi + TOL * (1.0 + abs(best_hi)):
+                report.infeasible = names[r_lo]
+            elif abs(best_hi - best_lo) <= TOL * (1.0 + abs(best_hi)):
+                # opposite bounds meet: one equality row
+                lo[r_hi] = hi[r_hi] = best_hi * scale[r_hi]
+                for r in rows:
+                    if r != r_hi:
+                        keep[r] = False
+                        report.removed.append((names[r], "merged into %s" % names[r_hi]))
+                continue
+        for k, r in enumerate(rows):
+            if r != r_hi and r != r_lo:
+                keep[r] = False
+                report.removed.append((names[r], "dominated by %s" % names[r_hi if np.isfinite(nhi[k]) else r_lo]))
+        # each representative keeps only the side it is tightest on
+        if r_hi is not None and r_hi != r_lo:
+            if scale[r_hi] > 0:
+                lo[r_hi] = -np.inf
+            else:
+                hi[r_hi] = np.inf
+        if r_lo is not None and r_lo != r_hi:
+            if scale[r_lo] > 0:
+                hi[r_lo] = np.inf
+            else:
+                lo[r_lo] = -np.inf
+
+    for _ in range(max_passes):
+        changed = False
+        rows_idx = np.flatnonzero(keep)
+
+        # Singleton rows become column bounds
+        single = rows_idx[nnz[rows_idx] == 1]
+        if single.size:
+            pos = A.indptr[single]
+            col = A.indices[pos]
+            a = A.data[pos]
+            new_lb = np.where(a > 0, lo[single] / a, hi[single] / a)
+            new_ub = np.where(a > 0, hi[single] / a, lo[single] / a)
+            np.maximum.at(lb, col, new_lb)
+            np.minimum.at(ub, col, new_ub)
+            keep[single] = False
+            report.removed.extend((names[r], "singleton") for r in single)
+            changed = True
+
+        sub = A[keep]
+        rows_idx = np.flatnonzero(keep)
+        amin, amax = _activity_bounds(sub, lb, ub)
+        slo, shi = lo[rows_idx], hi[rows_idx]
+
+        bad = (amin > shi + TOL * (1.0 + np.abs(shi))) | (amax < slo - TOL * (1.0 + np.abs(slo)))
+        if bad.any():
+            report.infeasible = names[rows_idx[np.flatnonzero(bad)[0]]]
+            break
+
+        # Rows that cannot bind on either side
+        redundant = (amax <= shi) & (amin >= slo)
+        if redundant.any():
+            for r in rows_idx[redundant]:
+                keep[r] = False
+                report.removed.append((names[r], "redundant"))
+            changed = True
+
+        # Column bounds implied by the row activity bounds
+        live = ~redundant
+        sub = sub[live]
+        amin, amax, slo, shi = amin[live], amax[live], slo[live], shi[live]
+        coo = sub.tocoo()
+        r, k, a = coo.row, coo.col, coo.data
+        cand_ub = np.full(ub.shape, np.inf)
+        cand_lb = np.full(lb.shape, -np.inf)
+        with np.errstate(invalid="ignore"):
+            # upper side: a_k x_k <= hi - (min activity of the other terms)
+            ok = np.isfinite(shi[r]) & np.isfinite(amin[r])
+            rest = amin[r] - np.where(a > 0, a * lb[k], a * ub[k])
+            bound = (shi[r] - rest) / a
+            sel = ok & (a > 0) & np.isfinite(bound)
+            np.minimum.at(cand_ub, k[sel], bound[sel])
+            sel = ok & (a < 0) & np.isfinite(bound)
+            np.maximum.at(cand_lb, k[sel], bound[sel])
+            # lower side: a_k x_k >= lo - (max activity of the other terms)
+            ok = np.isfinite(slo[r]) & np.isfinite(amax[r])
+            rest = amax[r] - np.where(a > 0, a * ub[k], a * lb[k])
+            bound = (slo[r] - rest) / a
+            sel = ok & (a > 0) & np.isfinite(bound)
+            np.maximum.at(cand_lb, k[sel], bound[sel])
+            sel = ok & (a < 0) & np.isfinite(bound)
+            np.minimum.at(cand_ub, k[sel], bound[sel])
+        up = cand_ub < ub - 1e-7 * (1.0 + np.abs(np.where(np.isinf(ub), 0.0, ub)))
+        down = cand_lb > lb + 1e-7 * (1.0 + np.abs(np.where(np.isinf(lb), 0.0, lb)))
+        if up.any() or down.any():
+            ub[up] = cand_ub[up]
+            lb[down] = cand_lb[down]
+            report.tightened += int(up.sum() + down.sum())
+            changed = True
+        if (lb > ub + TOL * (1.0 + np.abs(lb))).any():
+            report.infeasible = compiled.col_names()[int(np.flatnonzero(lb > ub)[0])]
+            break
+        if not changed:
+            break
+
+    kept = np.flatnonzero(keep)
+    # Back to single-sided rows; a row with two finite, different sides
+    # cannot occur since every original row is single-sided or an equality
+    new_sense = np.where(np.isinf(lo[kept]), wm.LE, np.where(np.isinf(hi[kept]), wm.GE, wm.EQ)).astype(np.int8)
+    new_rhs = np.where(new_sense == wm.LE, hi[kept], lo[kept])
+
+    families = []
+    position = np.cumsum(keep) - 1
+    for fam in compiled.families:
+        inside = np.flatnonzero(keep[fam.start:fam.stop])
+        if inside.size == 0:
+            continue
+        start = int(position[fam.start + inside[0]])
+        labels = None if fam.labels is None else np.asarray(fam.labels)[inside]
+        fam_names = None if fam.names is None else [fam.names[k] for k in inside]
+        families.append(wm.RowFamily(fam.name, fam.condition, start, start + inside.size, labels, fam_names))
+
+    # a copy keeps the class of ``compiled`` and its column layout (blocks, x_matrix)
+    reduced = copy.copy(compiled)
+    reduced.A = A[kept]
+    reduced.sense = new_sense
+    reduced.rhs = new_rhs
+    reduced.c = compiled.c.copy()
+    reduced.lb = lb
+    reduced.ub = ub
+    reduced.families = families
+    report.kept = kept
+    report.reduced_rows = reduced.n_rows
+    report.reduced_nnz = reduced.nnz
+    return reduced, report
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Phase and constraint-family instrumentation for build, solve and parse.
+
+Inside ``with profile() as prof:`` the functions of ``water_model`` and
+``water_highs`` record, for every phase they run through, the wall time,
+the peak traced memory above the phase's starting point and the number
+of rows and expression terms:
+
+- ``build``: ``water_model.build_model``, with one record per
+  "Condition N" family (the vectorized block) and ``assemble`` for the
+  CSR matrix;
+- ``build_multiperiod``: the rest of
+  ``water_multiperiod.build_multiperiod`` around its single-period build;
+- ``to_pulp``: building the ``pl.LpAffineExpression`` objects, one record
+  per family;
+- ``write`` (MPS file), ``cbc`` (the CBC subprocess) and ``parse``
+  (reading the solution file) for ``backend="cbc"``; ``load``, ``solve``
+  and ``extract`` for the in-process HiGHS backend;
+- ``scale``: computing the factors of ``water_scaling.scale``.
+
+Every record is a dict ``{"phase", "family", "condition", "wall",
+"peak", "rows", "terms"}`` (``family`` None for a whole phase, whose
+``wall`` excludes the phases nested in it, e.g. ``write`` in ``cbc``)
+and is passed to ``hook`` as soon as it is complete, e.g. to feed a
+metrics system in production.  Memory is measured with ``tracemalloc``, which
+sees NumPy and Python allocations but not those inside CBC or HiGHS, and
+slows allocation-heavy phases down; ``memory=False`` switches it off.
+Outside ``profile()`` the instrumentation costs one ``None`` check per
+family.
+
+Example:
+    with profile() as prof:
+        water_model.solve(water_model.build_model())
+    print(prof.format())
+"""
+
+import contextlib
+import time
+import tracemalloc
+
+import water_model as wm
+
+
+class Profiler:
+    """Collects timing records; see the module docstring for their fields."""
+
+    def __init__(self, hook=None, memory=True):
+        self.hook = hook
+        self.memory = memory
+        self.records = []
+        self._open = []
+        self._mark = None
+
+    def _peak(self):
+        """Fold the traced peak since the last reset into every open phase and return it."""
+        if not self.memory:
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        for entry in self._open:
+            entry["peak_abs"] = max(entry["peak_abs"], peak)
+        tracemalloc.reset_peak()
+        return peak
+
+    def _emit(self, record):
+        self.records.append(record)
+        if self.hook is not None:
+            self.hook(record)
+
+    @contextlib.contextmanager
+    def phase(self, name, rows=None, terms=None):
+        """Time the body as phase ``name``; ``rows``/``terms`` may also be set on the yielded dict."""
+        self._peak()
+        base = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        entry = {"phase": name, "rows": rows, "terms": terms, "peak_abs": base, "nested": 0.0}
+        self._open.append(entry)
+        start = time.perf_counter()
+        self._mark = (start, base)
+        try:
+            yield entry
+        finally:
+            wall = time.perf_counter() - start
+            self._peak()
+            self._open.pop()
+            if self._open:
+                self._open[-1]["nested"] += wall
+            self._emit({"phase": name, "family": None, "condition": None, "wall": wall - entry["nested"],
+                        "peak": entry["peak_abs"] - base if self.memory else None,
+                        "rows": entry["rows"], "terms": entry["terms"]})
+            self._mark = (time.perf_counter(), tracemalloc.get_traced_memory()[0] if self.memory else 0)
+
+    def family(self, name, condition, rows, terms):
+        """Record the work since the previous mark as family ``name`` of the innermost phase."""
+        now = time.perf_counter()
+        start, base = self._mark
+        peak = self._peak()
+        self._emit({"phase": self._open[-1]["phase"] if self._open else None, "family": name,
+                    "condition": condition, "wall": now - start,
+                    "peak": max(peak - base, 0) if self.memory else None, "rows": rows, "terms": terms})
+        self._mark = (time.perf_counter(), tracemalloc.get_traced_memory()[0] if self.memory else 0)
+
+    def phases(self):
+        """Return the whole-phase records, ``{phase: record}`` (the last run of each)."""
+        return {r["phase"]: r for r in self.records if r["family"] is None}
+
+    def families(self, phase="build"):
+        """Return the family records of ``phase``, slowest first."""
+        return sorted((r for r in self.records if r["family"] is not None and r["phase"] == phase),
+                      key=lambda r: -r["wall"])
+
+    def format(self, top=10):
+        """Render the phase totals and the slowest families of each phase."""
+
+        def cell(value, fmt):
+            return "-" if value is None else fmt % value
+
+        lines = ["%-12s %-45s %10s %10s %8s %10s" % ("phase", "family", "wall ms", "peak KB", "rows", "terms")]
+        for r in self.records:
+            if r["family"] is None:
+                lines.append("%-12s %-45s %10.3f %10s %8s %10s" % (
+                    r["phase"], "", r["wall"] * 1e3, cell(r["peak"] and r["peak"] / 1024.0, "%.1f"),
+                    cell(r["rows"], "%d"), cell(r["terms"], "%d")))
+        for phase in ("build", "to_pulp"):
+            fams = self.families(phase)
+            if fams:
+                lines.append("")
+                for r in fams[:top]:
+                    lines.append("%-12s %-45s %10.3f %10s %8d %10d" % (
+                        phase, "%s (%d)" % (r["family"], r["condition"]), r["wall"] * 1e3,
+                        cell(r["peak"] and r["peak"] / 1024.0, "%.1f"), r["rows"], r["terms"]))
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profile(hook=None, memory=True):
+    """Install a ``Profiler`` for the duration of the ``with`` block and yield it."""
+    prof = Profiler(hook, memory)
+    started = False
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started = True
+    previous = wm._profiler
+    wm._profiler = prof
+    try:
+        yield prof
+    finally:
+        wm._profiler = previous
+        if started:
+            tracemalloc.stop()
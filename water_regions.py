@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Regional decomposition: Dantzig-Wolfe column generation across processes.
+
+When sources and sectors are split per municipality, water only flows
+within a region and every condition is regional except four global caps,
+the linking rows ``LINKING``:
+
+    Max_Budget (B), Energy_Efficiency (ENlim),
+    Aquatic_Ecosystem_Protection (E_safe), Energy_Cost_Optimization (E_cost_max).
+
+``build_regional`` compiles every region without these rows (its
+subproblem X_r) and keeps their coefficients per region, L_r, with the
+global right-hand sides b (by default the sum of the regional values).
+``decompose`` then solves
+
+    minimize   sum_r c_r x_r
+    subject to sum_r L_r x_r <= b,   x_r in X_r
+
+by Dantzig-Wolfe decomposition.  The master LP chooses a convex
+combination of the proposals x_rk of every region; its duals pi on the
+linking rows price the subproblems
+
+    z_r(pi) = min (c_r - pi L_r) x_r,   x_r in X_r,
+
+which the worker processes solve in parallel, each keeping its regions'
+HiGHS models warm between iterations.  A proposal whose reduced cost
+z_r(pi) - mu_r is negative becomes a new master column.  Every iteration
+gives a primal bound (the master objective, once its penalized slacks on
+the linking rows are zero) and a dual bound (the Lagrangian
+pi . b + sum_r z_r(pi)); the loop stops when their relative gap is
+below ``tol``.
+
+Requires ``highspy`` (pip install highspy).
+
+Example:
+    model = build_regional(regional_parameters(16, 30, 30), share=0.8)
+    result = decompose(model, processes=4, progress=print)
+    print(format_iterations(result))
+    reference = solve_monolithic(model)
+"""
+
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+import water_highs as whs
+import water_model as wm
+
+# Global rows coupling the regions, and the parameter holding each cap
+LINKING = ("Max_Budget", "Energy_Efficiency", "Aquatic_Ecosystem_Protection", "Energy_Cost_Optimization")
+LINKING_PARAMETERS = ("B", "ENlim", "E_safe", "E_cost_max")
+
+# Cost per unit of violation of a linking row in the master (phase one); it
+# starts low so the first duals stay close to the regions' costs, and grows
+# by PENALTY_GROWTH while the master still needs the slack, up to MAX_PENALTY
+PENALTY = 10.0
+PENALTY_GROWTH = 100.0
+MAX_PENALTY = 1e10
+
+
+def regional_parameters(n_regions, n_sources, n_sectors, seed=0):
+    """Return ``n_regions`` synthetic parameter sets (see ``water_model.synthetic_parameters``)."""
+    return [wm.synthetic_parameters(n_sources, n_sectors, seed=seed + r) for r in range(n_regions)]
+
+
+class RegionalModel:
+    """Regional subproblems and linking rows.
+
+    ``regions`` are the compiled models without the linking rows, ``L``
+    the 4 x n_cols CSR linking coefficients of every region, and
+    ``sense``/``rhs`` the global linking rows.
+    """
+
+    def __init__(self, regions, L, sense, rhs):
+        self.regions = regions
+        self.L = L
+        self.sense = sense
+        self.rhs = rhs
+        self.offsets = np.concatenate([[0], np.cumsum([r.n_cols for r in regions])])
+
+    def __repr__(self):
+        return "RegionalModel(%d regions, cols=%d, rows=%d)" % (
+            len(self.regions), self.offsets[-1], sum(r.n_rows for r in self.regions) + len(self.rhs))
+
+    def monolithic(self):
+        """The block-diagonal model with the linking rows appended, as one ``CompiledModel``.
+
+        Row families are named ``"<family>_r<region>"`` (1-based); columns
+        follow the regions in order, so ``split`` recovers each region's
+        values.  ``shape`` is (1, number of columns).
+        """
+        A = sp.vstack([sp.block_diag([r.A for r in self.regions], format="csr"), sp.hstack(self.L)], format="csr")
+        families = []
+        start = 0
+        for k, region in enumerate(self.regions):
+            for fam in region.families:
+                families.append(wm.RowFamily("%s_r%d" % (fam.name, k + 1), fam.condition, start + fam.start,
+                                             start + fam.stop, fam.labels, fam.names and [
+                                                 "%s_r%d" % (name, k + 1) for name in fam.names]))
+            start += region.n_rows
+        for k, name in enumerate(LINKING):
+            families.append(wm.RowFamily(name, 0, start + k, start + k + 1))
+
+        def cat(attr):
+            return np.concatenate([getattr(r, attr) for r in self.regions])
+
+        return wm.CompiledModel((1, int(self.offsets[-1])), A, np.concatenate([cat("sense"), self.sense]),
+                                np.concatenate([cat("rhs"), self.rhs]), cat("c"), cat("lb"), cat("ub"), families,
+                                None)
+
+    def split(self, values):
+        """Per-region column values of a vector over all columns."""
+        return [values[lo:hi] for lo, hi in zip(self.offsets[:-1], self.offsets[1:])]
+
+
+def build_regional(regions, linking=None, share=1.0, equity="pairwise"):
+    """Compile the regional model of a list of parameter sets.
+
+    The global cap of each linking row is ``linking[param]`` when given,
+    else ``share`` times the sum of the regional values of ``B``,
+    ``ENlim``, ``E_safe`` and ``E_cost_max``.
+    """
+    with wm._phase("build") as info:
+        compiled, blocks = [], []
+        for p in regions:
+            full = wm._build_model(p, (), equity)
+            rows = np.array([full.family(name).start for name in LINKING])
+            keep = np.setdiff1d(np.arange(full.n_rows), rows)
+            blocks.append(full.A[rows])
+            families = [f for f in full.families if f.name not in LINKING]
+            # renumber the remaining families over the kept rows
+            new, start = [], 0
+            for f in families:
+                new.append(wm.RowFamily(f.name, f.condition, start, start + len(f), f.labels, f.names))
+                start += len(f)
+            compiled.append(wm.CompiledModel(full.shape, full.A[keep], full.sense[keep], full.rhs[keep], full.c,
+                                             full.lb, full.ub, new, p, full.aux_names))
+        linking = linking or {}
+        rhs = np.array([linking.get(key, share * sum(float(p[key]) for p in regions))
+                        for key in LINKING_PARAMETERS])
+        model = RegionalModel(compiled, blocks, np.full(len(LINKING), wm.LE, dtype=np.int8), rhs)
+        info["rows"] = sum(r.n_rows for r in compiled) + len(LINKING)
+        info["terms"] = sum(r.nnz for r in compiled) + sum(b.nnz for b in blocks)
+    return model
+
+
+def solve_monolithic(model):
+    """Solve the block-diagonal model in one HiGHS call; adds ``regions`` (per-region values) and ``wall``."""
+    start = time.perf_counter()
+    result = whs.solve_highs(model.monolithic())
+    result["regions"] = model.split(result["values"])
+    result["wall"] = time.perf_counter() - start
+    return result
+
+
+class _Pricer:
+    """Warm-started HiGHS models of some regions; prices them for linking duals."""
+
+    def __init__(self, regions, L):
+        self.regions = regions
+        self.L = L
+        self.highs = {}
+
+    def price(self, k, pi):
+        """Return (k, status, c . x, L x, x) for region ``k`` at duals ``pi``."""
+        region = self.regions[k]
+        h = self.highs.get(k)
+        if h is None:
+            h = self.highs[k] = whs.make_highs(region)
+        cost = region.c - self.L[k].T @ pi
+        h.changeColsCost(region.n_cols, np.arange(region.n_cols, dtype=np.int32), cost)
+        status = whs.run(h)
+        if status != "Optimal":
+            return k, status, np.nan, None, None
+        x = np.asarray(h.getSolution().col_value)
+        return k, status, float(region.c @ x), self.L[k] @ x, x
+
+
+def _serve(conn, regions, L):
+    pricer = _Pricer(regions, L)
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        ks, pi = task
+        conn.send([pricer.price(k, pi) for k in ks])
+
+
+class _Workers:
+    """Worker processes, each owning the regions ``k`` with ``k % processes == w``."""
+
+    def __init__(self, model, processes):
+        self.model = model
+        self.processes = processes
+        self.owned = [list(range(w, len(model.regions), processes)) for w in range(processes)]
+        self.conns = []
+        self.procs = []
+        if processes == 1:
+            self.local = _Pricer(model.regions, model.L)
+            return
+        for w in range(processes):
+            parent, child = multiprocessing.Pipe()
+            regions = {k: model.regions[k] for k in self.owned[w]}
+            L = {k: model.L[k] for k in self.owned[w]}
+            proc = multiprocessing.Process(target=_serve, args=(child, regions, L), daemon=True)
+            proc.start()
+            self.conns.append(parent)
+            self.procs.append(proc)
+
+    def price(self, pi):
+        if self.processes == 1:
+            return [self.local.price(k, pi) for k in range(len(self.model.regions))]
+        for conn, ks in zip(self.conns, self.owned):
+            conn.send((ks, pi))
+        results = []
+        for conn in self.conns:
+            results.extend(conn.recv())
+        return results
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(None)
+        for proc in self.procs:
+            proc.join()
+
+
+def decompose(model, processes=None, tol=1e-6, max_iterations=200, progress=None):
+    """Solve ``model`` by Dantzig-Wolfe decomposition.
+
+    ``processes`` worker processes price the regions (default: all cores,
+    at most one per region; ``1`` prices in the calling process).
+    ``progress`` is called with every iteration record: ``iteration``,
+    ``primal`` (master objective, NaN while a linking row is violated by
+    more than ``tol * max(1, |rhs|)`` of that row), ``dual`` (Lagrangian bound), ``gap`` (relative),
+    ``columns`` (added this iteration) and ``time`` (seconds so far).
+
+    Returns a dict with ``status``, ``objective``, ``values`` (over all
+    columns, in the order of ``model.monolithic()``), ``regions``
+    (per-region values), ``x`` (per-region N x M allocations),
+    ``duals`` (of the linking rows), ``iterations`` (the records),
+    ``processes`` and ``wall``.  The status is "Not Solved" when the
+    combined proposals still violate a linking row.
+
+    Whether this beats ``solve_monolithic`` in wall time depends on the
+    cores available: on a single core ``benchmarks/bench_regions.py``
+    measured it 1.4 to 1.9 times slower, and no multi-core run has been
+    measured yet.  Run that benchmark on the target host before choosing
+    it for speed.
+    """
+    start = time.perf_counter()
+    highspy = whs._import_highspy()
+    inf = highspy.kHighsInf
+    R = len(model.regions)
+    nlink = len(model.rhs)
+    processes = 1 if processes == 1 else min(processes or os.cpu_count() or 1, R)
+
+    # master rows: the linking rows, then one convexity row per region
+    master = highspy.Highs()
+    master.setOptionValue("output_flag", False)
+    lower, upper = whs.row_bounds(model.sense, model.rhs, inf)
+    master.addRows(nlink, lower, upper, 0, np.zeros(nlink, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                   np.zeros(0))
+    master.addRows(R, np.ones(R), np.ones(R), 0, np.zeros(R, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                   np.zeros(0))
+    # penalized slack on every linking row keeps the master feasible until the proposals satisfy it
+    sign = np.where(model.sense == wm.LE, -1.0, 1.0)
+    penalty = PENALTY
+    master.addCols(nlink, np.full(nlink, penalty), np.zeros(nlink), np.full(nlink, inf), nlink,
+                   np.arange(nlink, dtype=np.int32), np.arange(nlink, dtype=np.int32), sign)
+
+    # a linking row is satisfied when its slack is within tol of its own right-hand side
+    row_tol = tol * np.maximum(1.0, np.abs(model.rhs))
+    columns = []   # (region, x) of every master column after the slacks
+    iterations = []
+    workers = _Workers(model, processes)
+    pi = np.zeros(nlink)
+    mu = np.full(R, np.inf)
+    status = "Not Solved"
+    primal = np.inf
+    try:
+        for it in range(max_iterations):
+            proposals = workers.price(pi)
+            if any(p[1] != "Optimal" for p in proposals):
+                status = next(p[1] for p in proposals if p[1] != "Optimal")
+                break
+            dual = float(pi @ model.rhs)
+            added = 0
+            for k, _, cost, link, x in sorted(proposals, key=lambda p: p[0]):
+                reduced = cost - pi @ link
+                dual += reduced
+                if reduced - mu[k] < -tol * max(1.0, abs(reduced)):
+                    master.addCol(cost, 0.0, inf, nlink + 1, np.append(np.arange(nlink), nlink + k).astype(np.int32),
+                                  np.append(link, 1.0))
+                    columns.append((k, x))
+                    added += 1
+            whs.run(master)
+            sol = master.getSolution()
+            duals = np.asarray(sol.row_dual)
+            pi, mu = duals[:nlink], duals[nlink:]
+            slack = np.asarray(sol.col_value)[:nlink]
+            objective = master.getInfo().objective_function_value
+            primal = objective if (slack <= row_tol).all() else np.nan
+            gap = (primal - dual) / max(1.0, abs(primal)) if np.isfinite(primal) else np.inf
+            record = {"iteration": it, "primal": float(primal), "dual": float(dual), "gap": float(gap),
+                      "columns": added, "time": time.perf_counter() - start}
+            iterations.append(record)
+            if progress is not None:
+                progress(record)
+            if not added and not np.isfinite(primal) and penalty < MAX_PENALTY:
+                penalty *= PENALTY_GROWTH
+                master.changeColsCost(nlink, np.arange(nlink, dtype=np.int32), np.full(nlink, penalty))
+                whs.run(master)
+                duals = np.asarray(master.getSolution().row_dual)
+                pi, mu = duals[:nlink], duals[nlink:]
+                continue
+            if gap <= tol or not added:
+                status = "Optimal" if np.isfinite(primal) else "Infeasible"
+                break
+    finally:
+        workers.close()
+
+    values = [np.zeros(r.n_cols) for r in model.regions]
+    objective = np.nan
+    if status == "Optimal":
+        weights = np.asarray(master.getSolution().col_value)[nlink:]
+        for (k, x), w in zip(columns, weights):
+            if w > 0:
+                values[k] += w * x
+        objective = float(sum(r.c @ v for r, v in zip(model.regions, values)))
+        activity = sum(L @ v for L, v in zip(model.L, values))
+        if (sign * (activity - model.rhs) < -row_tol).any():
+            # the combined proposals still violate a linking row
+            status = "Not Solved"
+            objective = np.nan
+    return {"status": status, "objective": objective, "values": np.concatenate(values), "regions": values,
+            "x": [r.x_matrix(v) for r, v in zip(model.regions, values)], "duals": pi,
+            "iterations": iterations, "processes": processes, "wall": time.perf_counter() - start}
+
+
+def format_iterations(result):
+    """Render the per-iteration bounds of a ``decompose`` result."""
+    lines = ["%5s %16s %16s %10s %8s %9s" % ("iter", "primal", "dual", "gap", "columns", "time s")]
+    for rec in result["iterations"]:
+        lines.append("%5d %16.6f %16.6f %10.2e %8d %9.3f" % (
+            rec["iteration"], rec["primal"], rec["dual"], rec["gap"], rec["columns"], rec["time"]))
+    lines.append("Status: %s, Total_Cost = %.6f, %d processes, %.3f s" % (
+        result["status"], result["objective"], result["processes"], result["wall"]))
+    return "\n".join(lines)
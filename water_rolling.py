@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling-horizon re-optimization driven by a stream of readings.
+
+``RollingHorizon`` keeps one warm-started HiGHS model of the next T
+periods (``water_multiperiod``: x[i, j, t] plus per-source storage).  Each
+reading is one JSON object per line, with any of
+
+    {"time": "06:15", "A": [...], "D": [...], "storage": [...], "A[2]": 2e6}
+
+- ``A``: availability (inflow) per source, N values for every period of
+  the horizon or a T x N forecast;
+- ``D``: sector demands, M values for the whole horizon;
+- ``storage``: measured storage per source at the start of the period;
+- ``"A[2]"``-style keys change one entry (1-based, as in
+  ``water_model.apply_overrides``).
+
+Only the right-hand sides that actually changed are pushed to HiGHS
+(the storage balance rows of ``A``/``storage``, the demand rows of ``D``,
+and the 1 / D coefficients of the equity rows), the model is re-solved
+from the previous basis and the allocation of the first period is
+published as one JSON line.  The horizon then rolls by one period: the
+inflow forecast shifts and, unless the next reading measures it, the
+storage at the start of the next period is the one the solution
+predicts.
+
+The latency from receiving a reading to publishing its allocation is
+recorded per step, split into update (parsing included), solve and
+publish (extracting and writing the allocation); ``latency_summary()``
+gives mean, median, 95th percentile and maximum of each.
+
+Readings come from a file, a pipe (``-`` for stdin) or a socket
+(``tcp:HOST:PORT`` or ``unix:PATH``), e.g.
+
+    python water_rolling.py readings.jsonl --periods 4 > allocations.jsonl
+    sensor_feed | python water_rolling.py - --periods 96
+
+Requires ``highspy`` (pip install highspy).
+"""
+
+import argparse
+import collections
+import json
+import socket
+import sys
+import time
+
+import numpy as np
+
+import water_highs as whs
+import water_model as wm
+import water_multiperiod as wmp
+
+
+class RollingHorizon:
+    """Persistent T-period model re-solved for every reading.
+
+    ``storage`` is the initial storage per source (default empty) and
+    ``storage_capacity`` the cap per source (default 30 periods of ``A``).
+    ``history`` bounds the number of latency records kept.
+    """
+
+    def __init__(self, params=None, periods=4, storage=None, storage_capacity=None, equity="pairwise",
+                 history=10000):
+        p = wm.default_parameters() if params is None else params
+        n, m = len(p["A"]), len(p["D"])
+        self.periods = periods
+        self.inflow = np.tile(np.asarray(p["A"], dtype=float), (periods, 1))
+        self.demand = np.asarray(p["D"], dtype=float).copy()
+        self.storage = np.zeros(n) if storage is None else np.asarray(storage, dtype=float).copy()
+        model = wmp.build_multiperiod(p, periods=periods, inflow=self.inflow, storage_capacity=storage_capacity,
+                                      initial_storage=self.storage, equity=equity)
+        self.pm = whs.PersistentModel(model)
+        self.model = self.pm.compiled
+        balance = self.model.family("Storage_Balance")
+        self._balance = np.arange(balance.start, balance.stop)
+        demand = self.model.family("Sector_Demand")
+        self._demand = np.arange(demand.start, demand.stop)
+        self._equity = self.pm.has_equity()
+        self.step_count = 0
+        self.latencies = collections.deque(maxlen=history)
+        self.pushed = 0
+        self.skipped = 0
+        self.pm.solve()
+
+    def _apply(self, reading):
+        """Merge a reading into the current inflow, demand and storage; returns whether D changed.
+
+        The whole reading is parsed before any state changes, so a bad
+        one (KeyError, ValueError or TypeError) leaves the model as it was.
+        """
+        if not isinstance(reading, dict):
+            raise ValueError("a reading must be a JSON object, got %s" % type(reading).__name__)
+        inflow, demand, storage = self.inflow.copy(), self.demand.copy(), self.storage.copy()
+        for key, value in reading.items():
+            name, index = key, None
+            if key.endswith("]") and "[" in key:
+                name, index = key[:-1].split("[", 1)
+                index = int(index) - 1
+            target = {"A": inflow[0], "D": demand, "storage": storage}.get(name)
+            if target is None:
+                if name != "time":
+                    raise KeyError("unknown reading %r" % key)
+                continue
+            if index is not None and not 0 <= index < len(target):
+                raise ValueError("index of %r out of range 1..%d" % (key, len(target)))
+            if name == "A":
+                if index is not None:
+                    inflow[:, index] = float(value)
+                else:
+                    inflow[:] = np.broadcast_to(np.asarray(value, dtype=float), inflow.shape)
+            elif index is not None:
+                target[index] = float(value)
+            else:
+                target[:] = np.broadcast_to(np.asarray(value, dtype=float), target.shape)
+        changed = not np.array_equal(demand, self.demand)
+        self.inflow, self.demand, self.storage = inflow, demand, storage
+        return changed
+
+    def _push(self, rows, values):
+        """Set the right-hand sides of ``rows`` that differ from ``values``."""
+        diff = self.model.rhs[rows] != values
+        if diff.any():
+            self.pm.set_rhs_row(rows[diff], values[diff])
+            self.pushed += int(diff.sum())
+
+    def step(self, reading, received=None):
+        """Apply one reading, re-solve and return the allocation record.
+
+        ``received`` is the ``time.perf_counter()`` at which the reading
+        arrived (default: now); the record's ``latency_ms`` counts from it.
+        """
+        received = time.perf_counter() if received is None else received
+        demand_changed = self._apply(reading)
+        rhs = self.inflow.ravel().copy()
+        rhs[:len(self.storage)] += self.storage
+        self._push(self._balance, rhs)
+        self._push(self._demand, np.tile(self.demand, self.periods))
+        if demand_changed and self._equity:
+            self.pm.scale_equity(self.demand)
+        updated = time.perf_counter()
+        result = self.pm.solve()
+        solved = time.perf_counter()
+
+        record = {"step": self.step_count, "time": reading.get("time"), "status": result["status"],
+                  "objective": None, "x": None, "storage": None}
+        if result["status"] == "Optimal":
+            record["objective"] = float(result["objective"])
+            record["x"] = self.model.x_matrix(result["values"])[0].tolist()
+            end = self.model.storage(result["values"])[0]
+            record["storage"] = end.tolist()
+            # roll: the next period starts from the predicted storage
+            self.storage = end.copy()
+        self.inflow = np.vstack([self.inflow[1:], self.inflow[-1:]])
+        self.step_count += 1
+        record["latency_ms"] = {"update": (updated - received) * 1e3, "solve": (solved - updated) * 1e3}
+        return record
+
+    def run(self, lines, out, log=None):
+        """Process JSON lines from ``lines`` and write one allocation line per reading to ``out``.
+
+        A line that is not valid JSON or not a valid reading is reported
+        to ``log`` (default stderr) and skipped, counted in ``skipped``.
+        """
+        for number, line in enumerate(lines, 1):
+            received = time.perf_counter()
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = self.step(json.loads(line), received)
+            except (KeyError, ValueError, TypeError) as exc:
+                # _apply checks the whole reading before changing any state
+                self.skipped += 1
+                (log or sys.stderr).write("skipping reading on line %d: %s\n" % (
+                    number, exc.args[0] if exc.args else exc))
+                continue
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            total = (time.perf_counter() - received) * 1e3
+            update, solve = record["latency_ms"]["update"], record["latency_ms"]["solve"]
+            self.latencies.append((update, solve, total - update - solve, total))
+
+    def latency_summary(self):
+        """Return ``{stage: {"mean", "p50", "p95", "max"}}`` in milliseconds over the recorded steps."""
+        if not self.latencies:
+            return {}
+        table = np.array(self.latencies)
+        summary = {}
+        for k, stage in enumerate(("update", "solve", "publish", "total")):
+            col = table[:, k]
+            summary[stage] = {"mean": col.mean(), "p50": np.percentile(col, 50),
+                              "p95": np.percentile(col, 95), "max": col.max()}
+        return summary
+
+
+def open_stream(spec):
+    """Return a line iterator for ``-`` (stdin), ``tcp:HOST:PORT``, ``unix:PATH`` or a file path."""
+    if spec == "-":
+        return sys.stdin
+    if spec.startswith("tcp:"):
+        host, port = spec[4:].rsplit(":", 1)
+        return socket.create_connection((host, int(port))).makefile("r")
+    if spec.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(spec[5:])
+        return sock.makefile("r")
+    return open(spec)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling-horizon Water_Management re-optimization")
+    parser.add_argument("source", help="readings: file, '-', tcp:HOST:PORT or unix:PATH")
+    parser.add_argument("--periods", type=int, default=4, help="horizon length T")
+    parser.add_argument("--equity", default="pairwise", choices=wm.EQUITY_FORMULATIONS)
+    parser.add_argument("--output", help="allocation file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    rolling = RollingHorizon(periods=args.periods, equity=args.equity)
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        rolling.run(open_stream(args.source), out)
+    finally:
+        if args.output:
+            out.close()
+    for stage, stats in rolling.latency_summary().items():
+        sys.stderr.write("%-7s mean %8.3f ms  p50 %8.3f  p95 %8.3f  max %8.3f\n" % (
+            stage, stats["mean"], stats["p50"], stats["p95"], stats["max"]))
+    sys.stderr.write("%d readings, %d skipped, %d right-hand sides pushed\n" % (
+        rolling.step_count, rolling.skipped, rolling.pushed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
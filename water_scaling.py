@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Row, column and objective scaling of the compiled Water_Management model.
+
+The script mixes units freely: cost coefficients of 0.005 (``CEij``),
+right-hand sides of 5,000,000 liters (``A``), hm3 per year (``Pmax``)
+and mg/L (``N_max``, ``SED_max``), so the constraint matrix spans many
+orders of magnitude.  ``scale`` returns an equivalent model
+
+    (R A C) y  (sense)  R rhs,      minimize  s (C c) . y,
+    lb / C <= y <= ub / C,          x = C y
+
+with diagonal row factors R, column factors C and an objective factor s
+chosen by
+
+- ``"geometric"``: alternate row and column passes dividing by the
+  geometric mean sqrt(min |a| * max |a|) of each row / column until the
+  spread stops shrinking, then one equilibration pass;
+- ``"equilibrate"``: divide every row, then every column, by its largest
+  absolute coefficient.
+
+All factors are rounded to powers of two, so scaling and unscaling are
+exact in floating point.  ``ScaledModel.unscale`` maps a result of the
+scaled model (values, objective, duals, activity, x) back to the units of
+the original one, and ``water_model.solve(compiled, scaling="geometric")``
+does both steps.  ``condition_stats`` summarizes the coefficient ranges
+before and after.
+
+Example:
+    compiled = water_model.build_model()
+    scaled = scale(compiled)
+    print(format_stats(condition_stats(compiled), condition_stats(scaled)))
+    result = water_model.solve(compiled, backend="highs", scaling="geometric")
+"""
+
+import numpy as np
+
+import water_model as wm
+
+METHODS = ("geometric", "equilibrate")
+
+
+def _pow2(factor):
+    """Round positive factors to the nearest power of two."""
+    return np.exp2(np.round(np.log2(factor)))
+
+
+def _extremes(M):
+    """Return (min, max) |a| over the nonzeros of every row of the CSR ``M``; 1 for empty rows."""
+    data = np.abs(M.data)
+    counts = np.diff(M.indptr)
+    lo = np.ones(M.shape[0])
+    hi = np.ones(M.shape[0])
+    full = counts > 0
+    if data.size:
+        starts = M.indptr[:-1][full]
+        lo[full] = np.minimum.reduceat(data, starts)
+        hi[full] = np.maximum.reduceat(data, starts)
+    return lo, hi
+
+
+def _spread(M):
+    """Return the largest max/min ratio over the rows of ``M``."""
+    lo, hi = _extremes(M)
+    return float((hi / lo).max()) if M.shape[0] else 1.0
+
+
+def _range(values):
+    """Return (min, max) |v| over the finite nonzero ``values``, or (nan, nan)."""
+    v = np.abs(np.asarray(values, dtype=float))
+    v = v[np.isfinite(v) & (v > 0)]
+    if not v.size:
+        return np.nan, np.nan
+    return float(v.min()), float(v.max())
+
+
+class ScaledModel(wm.CompiledModel):
+    """Scaled copy of a compiled model.
+
+    ``row_scale``, ``col_scale`` and ``obj_scale`` are the factors R, C and
+    s of the module docstring; ``original`` is the unscaled model.  Rows,
+    columns and names are those of the original model.
+    """
+
+    def __init__(self, original, row_scale, col_scale, obj_scale):
+        R = row_scale
+        C = col_scale
+        A = original.A.tocsr()
+        # R A C without forming the diagonal matrices
+        A = A.multiply(R[:, None]).multiply(C[None, :]).tocsr()
+        with np.errstate(invalid="ignore"):
+            lb = original.lb / C
+            ub = original.ub / C
+        wm.CompiledModel.__init__(self, original.shape, A, original.sense.copy(), original.rhs * R,
+                                  original.c * C * obj_scale, lb, ub, original.families, original.params,
+                                  original.aux_names)
+        self.original = original
+        self.row_scale = row_scale
+        self.col_scale = col_scale
+        self.obj_scale = obj_scale
+
+    def __repr__(self):
+        return "ScaledModel(%r)" % (self.original,)
+
+    @property
+    def blocks(self):
+        return self.original.blocks
+
+    def col_names(self):
+        return self.original.col_names()
+
+    def x_matrix(self, values):
+        return self.original.x_matrix(values)
+
+    def unscale(self, result):
+        """Return ``result`` of the scaled model in the units of the original model."""
+        values = np.asarray(result["values"], dtype=float) * self.col_scale
+        duals = np.asarray(result["duals"], dtype=float) * self.row_scale / self.obj_scale
+        out = dict(result)
+        out.update(objective=result["objective"] / self.obj_scale, values=values, duals=duals,
+                   x=self.original.x_matrix(values), activity=self.original.A @ values)
+        return out
+
+
+def scale(compiled, method="geometric", passes=8):
+    """Return a ``ScaledModel`` of ``compiled``.
+
+    ``passes`` bounds the geometric-mean iterations, which also stop when
+    a pass shrinks the largest row or column spread by less than 10%.
+    """
+    if method not in METHODS:
+        raise ValueError("unknown scaling method %r (expected one of %s)" % (method, ", ".join(METHODS)))
+    with wm._phase("scale", compiled.n_rows, compiled.nnz):
+        A = compiled.A.tocsr()
+        A.eliminate_zeros()
+        A = abs(A)
+        R = np.ones(A.shape[0])
+        C = np.ones(A.shape[1])
+
+        def scaled():
+            return A.multiply(R[:, None]).multiply(C[None, :]).tocsr()
+
+        if method == "geometric":
+            current = scaled()
+            spread = max(_spread(current), _spread(current.T.tocsr()))
+            for _ in range(passes):
+                lo, hi = _extremes(current)
+                R /= np.sqrt(lo * hi)
+                lo, hi = _extremes(scaled().T.tocsr())
+                C /= np.sqrt(lo * hi)
+                current = scaled()
+                new = max(_spread(current), _spread(current.T.tocsr()))
+                if new > 0.9 * spread:
+                    break
+                spread = new
+        # equilibration: largest coefficient of every row, then of every column, becomes 1
+        R /= _extremes(scaled())[1]
+        C /= _extremes(scaled().T.tocsr())[1]
+        R = _pow2(R)
+        C = _pow2(C)
+        cost = np.abs(compiled.c * C)
+        cost = cost[cost > 0]
+        obj_scale = float(_pow2(1.0 / cost.max())) if cost.size else 1.0
+        model = ScaledModel(compiled, R, C, obj_scale)
+    return model
+
+
+def condition_stats(compiled):
+    """Return the coefficient ranges of ``compiled``.
+
+    A dict with ``(min, max)`` absolute nonzero values of the ``matrix``,
+    ``rhs``, ``cost`` and finite ``bounds``, their max/min ``*_ratio``, and
+    the largest max/min ratio within one row (``row_spread``) and one
+    column (``col_spread``).
+    """
+    A = compiled.A.tocsr()
+    A.eliminate_zeros()
+    stats = {"matrix": _range(A.data), "rhs": _range(compiled.rhs), "cost": _range(compiled.c),
+             "bounds": _range(np.concatenate([compiled.lb, compiled.ub]))}
+    for key in ("matrix", "rhs", "cost", "bounds"):
+        lo, hi = stats[key]
+        stats[key + "_ratio"] = hi / lo
+    stats["row_spread"] = _spread(A)
+    stats["col_spread"] = _spread(A.T.tocsr())
+    return stats
+
+
+def format_stats(*columns, labels=None):
+    """Render one or more ``condition_stats`` dicts side by side."""
+    labels = labels or (["before", "after"] if len(columns) == 2 else ["model %d" % k for k in range(len(columns))])
+    lines = ["%-12s" % "" + "".join("%28s" % label for label in labels)]
+    for key in ("matrix", "rhs", "cost", "bounds"):
+        lines.append("%-12s" % key + "".join("%28s" % ("[%.1e, %.1e]" % s[key]) for s in columns))
+        lines.append("%-12s" % (key + " ratio") + "".join("%28.2e" % s[key + "_ratio"] for s in columns))
+    for key in ("row_spread", "col_spread"):
+        lines.append("%-12s" % key.replace("_", " ") + "".join("%28.2e" % s[key] for s in columns))
+    return "\n".join(lines)
+
+
+def solve(compiled, msg=False, backend="cbc", method="geometric"):
+    """Scale ``compiled``, solve it and return the result in the original units."""
+    scaled = compiled if isinstance(compiled, ScaledModel) else scale(compiled, method)
+    return scaled.unscale(wm.solve(scaled, msg=msg, backend=backend))
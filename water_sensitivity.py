@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk sensitivity report for an optimal Water_Management solution.
+
+``sensitivity`` solves the compiled model once with HiGHS and returns, as
+NumPy columns, everything the operators otherwise estimate with
+perturbation re-solves:
+
+- per constraint: activity, slack, dual (shadow price) and the RHS
+  ranging interval over which the optimal basis, and hence the dual,
+  stays valid, with the Total_Cost reached at each end;
+- per variable: value, cost, reduced cost and the cost ranging interval.
+
+Duals follow HiGHS' convention: the change in Total_Cost per unit
+increase of the right-hand side.  For this minimization a binding <= row
+(e.g. ``Storage_Capacity``) has a dual <= 0 and a binding >= row a dual
+>= 0; rows with slack have a zero dual.
+
+Requires ``highspy`` (pip install highspy).
+
+Example:
+    report = sensitivity(water_model.build_model())
+    print(format_sensitivity(report))
+"""
+
+import numpy as np
+
+import water_highs as whs
+import water_model as wm
+
+
+def sensitivity(compiled, highs=None):
+    """Solve ``compiled`` and return its sensitivity report.
+
+    ``highs`` may be an already solved ``highspy.Highs`` instance holding
+    ``compiled`` (e.g. ``PersistentModel.highs``); it is then only queried.
+    The report is a dict with ``"status"``, ``"objective"`` and two
+    columnar tables, ``"rows"`` and ``"cols"`` (dicts of equal-length
+    arrays, the ``"name"`` column being a list).
+    """
+    h = highs
+    if h is None:
+        h = whs.make_highs(compiled)
+        status = whs.run(h)
+    else:
+        status = whs.status_of(h)
+    report = {"status": status, "objective": np.nan, "rows": None, "cols": None}
+    if status != "Optimal":
+        return report
+
+    m, n = compiled.n_rows, compiled.n_cols
+    sol = h.getSolution()
+    values = np.asarray(sol.col_value)
+    activity = np.asarray(sol.row_value)
+    _, rg = h.getRanging()
+
+    def ranging(side, count):
+        return np.asarray(side.value_)[:count], np.asarray(side.objective_)[:count]
+
+    rhs_lo, obj_rhs_lo = ranging(rg.row_bound_dn, m)
+    rhs_hi, obj_rhs_hi = ranging(rg.row_bound_up, m)
+    cost_lo, obj_cost_lo = ranging(rg.col_cost_dn, n)
+    cost_hi, obj_cost_hi = ranging(rg.col_cost_up, n)
+
+    report["objective"] = h.getInfo().objective_function_value
+    report["rows"] = {
+        "name": compiled.row_names(),
+        "sense": compiled.sense.copy(),
+        "rhs": compiled.rhs.copy(),
+        "activity": activity,
+        "slack": wm.row_slack(compiled, activity),
+        "dual": np.asarray(sol.row_dual),
+        "rhs_lower": rhs_lo,
+        "rhs_upper": rhs_hi,
+        "objective_at_rhs_lower": obj_rhs_lo,
+        "objective_at_rhs_upper": obj_rhs_hi,
+    }
+    report["cols"] = {
+        "name": compiled.col_names(),
+        "value": values,
+        "cost": compiled.c.copy(),
+        "reduced_cost": np.asarray(sol.col_dual),
+        "cost_lower": cost_lo,
+        "cost_upper": cost_hi,
+        "objective_at_cost_lower": obj_cost_lo,
+        "objective_at_cost_upper": obj_cost_hi,
+    }
+    return report
+
+
+def format_sensitivity(report, binding_only=True, tol=1e-9):
+    """Render a sensitivity report as text.
+
+    With ``binding_only`` only rows with a non-zero dual and variables with
+    a non-zero value or reduced cost are listed.
+    """
+    if report["rows"] is None:
+        return "Status: %s" % report["status"]
+    lines = ["Status: %s" % report["status"], "Total_Cost = %.6f" % report["objective"], "",
+             "%-40s %14s %14s %12s %14s %14s" % ("constraint", "activity", "rhs", "dual", "rhs from", "rhs to")]
+    rows = report["rows"]
+    for r, name in enumerate(rows["name"]):
+        if binding_only and abs(rows["dual"][r]) <= tol:
+            continue
+        lines.append("%-40s %14.6g %14.6g %12.6g %14.6g %14.6g" % (
+            name, rows["activity"][r], rows["rhs"][r], rows["dual"][r], rows["rhs_lower"][r], rows["rhs_upper"][r]))
+    lines += ["", "%-40s %14s %14s %12s %14s %14s" % ("variable", "value", "cost", "reduced", "cost from", "cost to")]
+    cols = report["cols"]
+    for k, name in enumerate(cols["name"]):
+        if binding_only and abs(cols["value"][k]) <= tol and abs(cols["reduced_cost"][k]) <= tol:
+            continue
+        lines.append("%-40s %14.6g %14.6g %12.6g %14.6g %14.6g" % (
+            name, cols["value"][k], cols["cost"][k], cols["reduced_cost"][k], cols["cost_lower"][k],
+            cols["cost_upper"][k]))
+    return "\n".join(lines)
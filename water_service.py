@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchronous local solve service with compiled model templates in memory.
+
+Running CODE-JCR-WATER-V7-B-25.py once per dashboard request pays for the
+interpreter, the PuLP import, the model build and the CBC subprocess
+every time.  This service starts once, compiles its templates (the
+script's parameters as ``default``, plus any ``--template NAME=CONFIG``
+file read by ``water_cli.load_config``) and keeps a warm-started
+``water_highs.PersistentModel`` of every template in each worker
+process.  It speaks HTTP/1.1 (keep-alive) over TCP or a Unix socket:
+
+    POST /solve      {"template": "default", "overrides": {"A[2]": 2e6, "D": [4000, 3000, 8000]}}
+    GET  /templates  names and shapes of the templates
+    GET  /stats      requests, coalesced, rejected, queue and latency percentiles
+
+Overrides use the keys of ``water_model.apply_overrides``.  Right-hand
+side parameters and ``D`` (``water_model.RHS_PARAMETERS``) are pushed
+into the worker's warm model and reset after the solve; any other
+parameter rebuilds the model for that request.  Override values are
+converted and checked with ``water_model.check_parameters`` before a
+request is admitted; a bad one gets 400.  The answer holds
+``status``, ``objective``, ``x``, ``path`` ("warm" or "rebuild"),
+``coalesced`` and ``solve_ms``.
+
+Solves run in a pool of ``workers`` processes.  At most ``workers +
+queue_size`` distinct solves are admitted at a time; beyond that the
+service answers 503 with ``Retry-After`` instead of queueing without
+bound.  Requests identical to one already in flight (same template and
+overrides) wait for its result instead of solving again.
+
+    python water_service.py --port 8750 --workers 4
+    python water_service.py --unix /tmp/water.sock --template dry=dry.toml
+    curl -s localhost:8750/solve -d '{"overrides": {"Ct": 500000}}'
+
+``benchmarks/bench_service.py`` is the load generator.
+
+Requires ``highspy`` (pip install highspy).
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import signal
+import sys
+import time
+
+import numpy as np
+
+import water_highs as whs
+import water_model as wm
+
+# Status line text of the HTTP codes the service answers with
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+# Largest accepted request body, in bytes
+MAX_BODY = 1 << 20
+
+
+class Busy(Exception):
+    """Raised when the queue of admitted solves is full."""
+
+
+def _warm_parameters(overrides):
+    """Names of the parameters ``overrides`` touch, and whether all are right-hand sides."""
+    names = {key.split("[", 1)[0] for key in overrides}
+    return names, all(name in wm.RHS_PARAMETERS or name == "D" for name in names)
+
+
+def _normalize(params, overrides):
+    """Return ``overrides`` with numeric values as floats; raises ValueError/TypeError for bad ones.
+
+    The parameters they change are checked with
+    ``water_model.check_parameters`` (shapes, finite numbers, positive
+    demands), so a request that cannot be solved is rejected before it
+    takes a slot.
+    """
+    out = {}
+    for key, value in overrides.items():
+        if key.split("[", 1)[0] in wm.INDEX_PARAMETERS:
+            out[key] = value
+        elif np.ndim(value):
+            out[key] = np.asarray(value, dtype=float).tolist()
+        else:
+            out[key] = float(value)
+    problems = wm.check_parameters(wm.apply_overrides(params, out), _warm_parameters(out)[0])
+    if problems:
+        raise ValueError("; ".join(problems))
+    return out
+
+
+def _init_worker(templates):
+    global _templates
+    _templates = {name: (whs.PersistentModel(compiled), dict(compiled.params), equity)
+                  for name, (compiled, equity) in templates.items()}
+
+
+def _solve(template, overrides):
+    """Solve ``template`` with ``overrides`` in a worker; returns a JSON-ready dict."""
+    pm, base, equity = _templates[template]
+    start = time.perf_counter()
+    p = wm.apply_overrides(base, overrides)
+    names, warm = _warm_parameters(overrides)
+    if warm:
+        try:
+            for name in names:
+                pm.set_parameter(name, p[name])
+            result = pm.solve()
+        finally:
+            # a failed set must not leave a changed parameter in the warm model
+            for name in names:
+                pm.set_parameter(name, base[name])
+    else:
+        compiled = wm.build_model(p, equity=equity)
+        result = wm.solve(compiled, backend="highs")
+    optimal = result["status"] == "Optimal"
+    return {"status": result["status"], "objective": float(result["objective"]) if optimal else None,
+            "x": result["x"].tolist() if optimal else None, "path": "warm" if warm else "rebuild",
+            "solve_ms": (time.perf_counter() - start) * 1e3}
+
+
+class SolveService:
+    """Templates, the worker pool, admission control and request coalescing.
+
+    ``templates`` maps a name to a parameter set; ``workers`` is the pool
+    size (default: all cores) and ``queue_size`` the number of admitted
+    solves waiting for a worker.
+    """
+
+    def __init__(self, templates=None, workers=None, queue_size=64, equity="pairwise", history=100000):
+        templates = {"default": wm.default_parameters()} if templates is None else templates
+        self.params = templates
+        self.compiled = {name: wm.build_model(p, equity=equity) for name, p in templates.items()}
+        self.workers = workers or os.cpu_count() or 1
+        self.limit = self.workers + queue_size
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=_init_worker,
+            initargs=({name: (c, equity) for name, c in self.compiled.items()},))
+        self.inflight = {}
+        self.pending = 0
+        self.counts = collections.Counter()
+        self.latencies = collections.deque(maxlen=history)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def warm_up(self):
+        """Start every worker process (and load its templates) before serving."""
+        name = "default" if "default" in self.params else next(iter(self.params))
+        futures = [self.executor.submit(_solve, name, {}) for _ in range(self.workers)]
+        concurrent.futures.wait(futures)
+
+    async def solve(self, template, overrides):
+        """Return ``(result, coalesced)``; raises KeyError/ValueError for bad input, ``Busy`` when full."""
+        if template not in self.params:
+            raise KeyError("unknown template %r" % template)
+        if not isinstance(overrides, dict):
+            raise ValueError("overrides must be a JSON object")
+        # fail fast on unknown parameters, bad indices or values, before taking a slot
+        overrides = _normalize(self.params[template], overrides)
+        key = json.dumps([template, overrides], sort_keys=True)
+        future = self.inflight.get(key)
+        if future is not None:
+            self.counts["coalesced"] += 1
+            return await asyncio.shield(future), True
+        if self.pending >= self.limit:
+            self.counts["rejected"] += 1
+            raise Busy()
+        self.pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, _solve, template, overrides)
+        self.inflight[key] = future
+
+        def done(_):
+            self.inflight.pop(key, None)
+            self.pending -= 1
+
+        future.add_done_callback(done)
+        self.counts["solved"] += 1
+        return await asyncio.shield(future), False
+
+    def stats(self):
+        lat = np.asarray(self.latencies) if self.latencies else np.zeros(1)
+        return {"requests": self.counts["requests"], "solved": self.counts["solved"],
+                "coalesced": self.counts["coalesced"], "rejected": self.counts["rejected"],
+                "errors": self.counts["errors"], "pending": self.pending, "limit": self.limit,
+                "workers": self.workers, "latency_ms": {"p50": float(np.percentile(lat, 50)),
+                                                        "p99": float(np.percentile(lat, 99)),
+                                                        "max": float(lat.max())}}
+
+    async def _route(self, method, path, body):
+        """Return ``(code, payload, headers)`` for one request."""
+        if path == "/solve":
+            if method != "POST":
+                return 405, {"error": "use POST"}, {}
+            try:
+                request = json.loads(body or b"{}")
+                result, coalesced = await self.solve(request.get("template", "default"),
+                                                     request.get("overrides", {}))
+            except Busy:
+                return 503, {"error": "queue full"}, {"Retry-After": "1"}
+            except KeyError as exc:
+                return 400, {"error": str(exc.args[0]) if exc.args else "unknown key"}, {}
+            except (ValueError, IndexError, TypeError, AttributeError) as exc:
+                return 400, {"error": str(exc)}, {}
+            return 200, dict(result, coalesced=coalesced), {}
+        if method != "GET":
+            return 405, {"error": "use GET"}, {}
+        if path == "/stats":
+            return 200, self.stats(), {}
+        if path == "/templates":
+            return 200, {name: {"shape": list(c.shape), "rows": c.n_rows, "cols": c.n_cols}
+                         for name, c in self.compiled.items()}, {}
+        return 404, {"error": "unknown path %r" % path}, {}
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    await self._respond(writer, 413, {"error": "request line too large"}, {}, False)
+                    break
+                if not line:
+                    break
+                received = time.perf_counter()
+                try:
+                    method, path, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "bad request line"}, {}, False)
+                    break
+                headers = {}
+                try:
+                    while True:
+                        h = await reader.readline()
+                        if h in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = h.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # a header line longer than the stream limit
+                    await self._respond(writer, 413, {"error": "header too large"}, {}, False)
+                    break
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                keep = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "bad Content-Length"}, {}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "body too large"}, {}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                self.counts["requests"] += 1
+                try:
+                    code, payload, extra = await self._route(method, path.split("?", 1)[0], body)
+                except Exception as exc:
+                    self.counts["errors"] += 1
+                    code, payload, extra = 500, {"error": repr(exc)}, {}
+                await self._respond(writer, code, payload, extra, keep)
+                if path.startswith("/solve") and code == 200:
+                    self.latencies.append((time.perf_counter() - received) * 1e3)
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, code, payload, extra, keep):
+        body = json.dumps(payload).encode()
+        head = ["HTTP/1.1 %d %s" % (code, _REASONS[code]), "Content-Type: application/json",
+                "Content-Length: %d" % len(body), "Connection: %s" % ("keep-alive" if keep else "close")]
+        head += ["%s: %s" % item for item in extra.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8750, unix=None, ready=None):
+        """Serve until cancelled; ``ready`` (an asyncio.Event) is set once listening."""
+        if unix is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    import water_cli
+
+    parser = argparse.ArgumentParser(description="Water_Management solve service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8750)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, help="solver processes (default: all cores)")
+    parser.add_argument("--queue-size", type=int, default=64, help="admitted solves waiting for a worker")
+    parser.add_argument("--equity", default="pairwise", choices=wm.EQUITY_FORMULATIONS)
+    parser.add_argument("--template", action="append", default=[], metavar="NAME=CONFIG",
+                        help="extra template from a JSON/TOML parameter file")
+    args = parser.parse_args(argv)
+
+    templates = {"default": wm.default_parameters()}
+    for item in args.template:
+        name, sep, path = item.partition("=")
+        if not sep:
+            parser.error("--template expects NAME=CONFIG, got %r" % item)
+        templates[name] = water_cli.load_config(path)[0]
+    service = SolveService(templates, args.workers, args.queue_size, args.equity)
+    service.warm_up()
+    # shut the worker pool down on SIGTERM too, so no worker outlives the service
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    where = args.unix or "%s:%d" % (args.host, args.port)
+    sys.stderr.write("serving %d templates on %s with %d workers\n" % (len(templates), where, service.workers))
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
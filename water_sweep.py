@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel scenario sweeps over the Water_Management parameters.
+
+Each scenario is a dict of parameter overrides (see
+``water_model.apply_overrides``), e.g. ``{"Ct": 500000, "A[2]": 2e6}``.
+``sweep`` solves every scenario across a process pool: the workers load
+the base parameter set and PuLP once and then only rebuild and solve,
+so planners no longer edit module globals and re-run the script.
+
+Example:
+    scenarios = grid({"Ct": [400000, 600000], "E_safe": [250000, 350000]})
+    table = sweep(scenarios, processes=4)
+    print(format_table(table))
+"""
+
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+
+import water_model as wm
+
+# Base parameter set and solver backend of the current worker process
+_base_params = None
+_backend = "cbc"
+
+
+def grid(axes):
+    """Return the Cartesian product of ``axes`` as a list of overrides.
+
+    ``axes`` maps a parameter key to the list of values to try, e.g.
+    ``{"Ct": [5e5, 6e5], "D": [[4360, 3052, 8720], [5000, 3000, 9000]]}``.
+    """
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[k] for k in keys))]
+
+
+def _init_worker(base, backend):
+    global _base_params, _backend
+    _base_params = base
+    _backend = backend
+
+
+def _solve_scenario(item):
+    index, overrides, full = item
+    params = wm.apply_overrides(_base_params, overrides)
+    result = wm.solve(wm.build_model(params), backend=_backend)
+    if not full:
+        # only x travels back when nothing is written
+        result = {"status": result["status"], "objective": result["objective"], "x": result["x"]}
+    return index, result
+
+
+def sweep(scenarios, base=None, processes=None, chunksize=None, backend="cbc", writer=None):
+    """Solve every scenario of ``scenarios`` and return one result table.
+
+    ``base`` is the parameter set the overrides apply to (default
+    ``water_model.default_parameters()``).  ``processes`` is the pool size
+    (default: all cores); ``processes=1`` solves in the calling process.
+    ``backend`` is passed to ``water_model.solve``.
+
+    The table is a dict of columns, one entry per scenario in input order:
+    ``"scenario"`` (index), one column per overridden key, ``"status"``,
+    ``"objective"`` and ``"x"`` (array K x N x M).
+
+    With a ``water_export.ResultWriter`` as ``writer``, every result (column
+    values, activities, duals and the overrides) is written to it as it
+    arrives, in completion order, and the table has no ``"x"`` column, so
+    memory does not grow with the number of scenarios beyond the status
+    and objective columns.
+    """
+    scenarios = list(scenarios)
+    base = wm.default_parameters() if base is None else base
+    n, m = len(base["A"]), len(base["D"])
+    k = len(scenarios)
+
+    status = [None] * k
+    objective = np.full(k, np.nan)
+    x = None if writer is not None else np.full((k, n, m), np.nan)
+
+    items = [(index, overrides, writer is not None) for index, overrides in enumerate(scenarios)]
+    if processes == 1 or k <= 1:
+        _init_worker(base, backend)
+        results = map(_solve_scenario, items)
+        pool = None
+    else:
+        processes = processes or os.cpu_count() or 1
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(base, backend))
+        if chunksize is None:
+            chunksize = max(1, k // (4 * processes))
+        results = pool.imap_unordered(_solve_scenario, items, chunksize)
+    try:
+        for index, result in results:
+            status[index] = result["status"]
+            objective[index] = result["objective"]
+            if writer is None:
+                x[index] = result["x"]
+            else:
+                writer.write(index, result, scenarios[index])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    table = {"scenario": np.arange(k)}
+    for key in sorted({key for s in scenarios for key in s}):
+        table[key] = [s.get(key) for s in scenarios]
+    table["status"] = status
+    table["objective"] = objective
+    if writer is None:
+        table["x"] = x
+    else:
+        writer.flush()
+    return table
+
+
+def format_table(table):
+    """Render a sweep table as text, one line per scenario (x columns only when the table has ``"x"``)."""
+    k = len(table["scenario"])
+    x = table.get("x")
+    keys = [key for key in table if key not in ("scenario", "status", "objective", "x")]
+    header = ["scenario"] + keys + ["status", "objective"]
+    if x is not None:
+        n, m = x.shape[1:]
+        header += ["x_(%d,_%d)" % (i, j) for i in range(1, n + 1) for j in range(1, m + 1)]
+    lines = ["\t".join(header)]
+    for s in range(k):
+        cells = [str(s)] + [str(table[key][s]) for key in keys] + [table["status"][s], "%.6g" % table["objective"][s]]
+        if x is not None:
+            cells += ["%.6g" % v for v in x[s].ravel()]
+        lines.append("\t".join(cells))
+    return "\n".join(lines)
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Constraint violations of candidate allocations, without a solve.
+
+Operators propose allocations by hand and want to know which conditions
+they break.  ``evaluate`` takes a batch of K candidate N x M matrices and
+computes the activity of every compiled row with one matrix product,
+
+    activity = X A^T        (K x n_rows),
+
+then the slack (``water_model.row_slack``, negative when violated) and
+the violation ``max(0, -slack)``.  ``screen`` does the same in chunks of
+``chunk_size`` candidates and keeps only per-candidate and per-row
+summaries, so millions of candidates fit in memory, e.g. to discard
+infeasible scenarios before sending the rest to the solver.
+
+Auxiliary columns are filled in from the candidates when the model
+defines them (``Aggregate_Definition`` rows of ``water_aggregates``);
+other auxiliary columns, such as the common ratio of
+``equity="common"``, have no value in an allocation, so build the model
+with ``equity="pairwise"`` (the default) to check allocations.
+
+A row counts as violated when its violation exceeds
+``tol * max(1, |rhs|)``.
+
+Example:
+    compiled = water_model.build_model()
+    X = np.random.default_rng(0).uniform(0, 5000, (100000, 3, 3))
+    report = screen(compiled, X)
+    print(report["feasible"].sum(), "feasible")
+    print(format_violations(compiled, evaluate(compiled, X[:1])))
+"""
+
+import numpy as np
+
+import water_model as wm
+
+# Dense constraint matrices up to this many entries use a BLAS product
+DENSE_LIMIT = 4000000
+
+
+class _Evaluator:
+    """Maps flattened candidates (K x N*M) to row activities (K x n_rows).
+
+    Auxiliary columns defined by ``g . x`` are folded into the x
+    coefficients once, ``A_x + A_aux G``, so every product is K x N*M by
+    N*M x n_rows.
+    """
+
+    def __init__(self, compiled):
+        n, m = compiled.shape
+        ncell = n * m
+        A = compiled.A.tocsr()
+        A_x = A[:, :ncell]
+        c = np.asarray(compiled.c, dtype=float)
+        self.c = c[:ncell].copy()
+        if A.shape[1] > ncell:
+            G = self._definitions(compiled, A, ncell)
+            A_x = (A_x + A[:, ncell:] @ G).tocsr()
+            self.c += G.T @ c[ncell:]
+        self.A_x = A_x
+        self.dense = A.shape[0] * ncell <= DENSE_LIMIT
+        if self.dense:
+            # K x N*M times N*M x n_rows is a single GEMM
+            self.A_xT = np.ascontiguousarray(A_x.T.toarray())
+
+        # every row as "row . x <= bound", relative to max(1, |rhs|); equalities twice
+        sense, rhs = compiled.sense, compiled.rhs
+        scale = np.maximum(1.0, np.abs(rhs))
+        eq = np.flatnonzero(sense == wm.EQ)
+        self.origin = np.concatenate([np.arange(A.shape[0]), eq])
+        sign = np.concatenate([np.where(sense == wm.GE, -1.0, 1.0), -np.ones(eq.size)]) / scale[self.origin]
+        self.bound = rhs[self.origin] * sign
+        W = A_x[self.origin].multiply(sign[:, None]).tocsr()
+        self.W = np.ascontiguousarray(W.T.toarray()) if self.dense else W
+
+    @staticmethod
+    def _definitions(compiled, A, ncell):
+        """Rows g of the defining equations aux = g . x, one per auxiliary column."""
+        naux = A.shape[1] - ncell
+        try:
+            fam = compiled.family("Aggregate_Definition")
+        except KeyError:
+            fam = None
+        defining = np.full(naux, -1)
+        if fam is not None:
+            for r in range(fam.start, fam.stop):
+                lo, hi = A.indptr[r], A.indptr[r + 1]
+                cols, vals = A.indices[lo:hi], A.data[lo:hi]
+                aux = cols >= ncell
+                if aux.sum() == 1 and vals[aux][0] == -1.0:
+                    defining[cols[aux][0] - ncell] = r
+        missing = np.flatnonzero(defining < 0)
+        if missing.size:
+            raise ValueError("auxiliary column %r has no value in an allocation; build the model with "
+                             "equity='pairwise' to check allocations" % compiled.aux_names[missing[0]])
+        return A[defining][:, :ncell]
+
+    def activity(self, Xf):
+        if self.dense:
+            return Xf @ self.A_xT
+        return (self.A_x @ Xf.T).T
+
+    def excess(self, Xf):
+        """Relative violation of the "<=" rows (negative when satisfied), K x len(origin)."""
+        act = Xf @ self.W if self.dense else (self.W @ Xf.T).T
+        act -= self.bound
+        return act
+
+
+def _flatten(compiled, X):
+    n, m = compiled.shape
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 2:
+        X = X[None]
+    if X.shape[1:] != (n, m):
+        raise ValueError("candidates must have shape (K, %d, %d), got %r" % (n, m, X.shape))
+    return X.reshape(X.shape[0], n * m)
+
+
+def _violation(compiled, slack, tol):
+    """Violation per row, and whether it exceeds ``tol * max(1, |rhs|)``."""
+    violation = np.maximum(-slack, 0.0)
+    return violation, violation > tol * np.maximum(1.0, np.abs(compiled.rhs))
+
+
+def evaluate(compiled, X, tol=1e-6):
+    """Evaluate a batch of candidates ``X`` of shape (K, N, M) (or one N x M matrix).
+
+    Returns a dict of K x n_rows arrays ``activity``, ``slack``,
+    ``violation`` and ``violated`` (bool), the K-vectors ``cost``
+    (Total_Cost of each candidate), ``feasible`` and ``n_violated``, and
+    ``negative``: candidates with a negative entry (x >= 0 is a bound, not a
+    row).
+    """
+    Xf = _flatten(compiled, X)
+    ev = _Evaluator(compiled)
+    activity = ev.activity(Xf)
+    slack = wm.row_slack(compiled, activity)
+    violation, violated = _violation(compiled, slack, tol)
+    negative = (Xf < -tol).any(axis=1)
+    return {"activity": activity, "slack": slack, "violation": violation, "violated": violated,
+            "cost": Xf @ ev.c, "n_violated": violated.sum(axis=1),
+            "feasible": ~violated.any(axis=1) & ~negative, "negative": negative}
+
+
+def screen(compiled, X, tol=1e-6, chunk_size=2048):
+    """Check a large batch of candidates chunk by chunk.
+
+    Returns ``feasible`` and ``worst`` (largest violation relative to
+    ``max(1, |rhs|)``) per candidate, ``worst_row`` (its row number, -1 when
+    feasible), the Total_Cost ``cost`` per candidate and ``row_counts``,
+    the number of candidates violating each row.
+    """
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 2:
+        X = X[None]
+    K = X.shape[0]
+    ev = _Evaluator(compiled)
+    worst = np.empty(K)
+    worst_row = np.empty(K, dtype=np.int64)
+    negative = np.empty(K, dtype=bool)
+    cost = np.empty(K)
+    counts = np.zeros(ev.origin.size, dtype=np.int64)
+    for lo in range(0, K, chunk_size):
+        hi = min(lo + chunk_size, K)
+        Xf = _flatten(compiled, X[lo:hi])
+        excess = ev.excess(Xf)
+        counts += (excess > tol).sum(axis=0)
+        k = np.argmax(excess, axis=1)
+        worst_row[lo:hi] = k
+        worst[lo:hi] = excess[np.arange(hi - lo), k]
+        negative[lo:hi] = Xf.min(axis=1) < -tol
+        cost[lo:hi] = Xf @ ev.c
+    worst_row = ev.origin[worst_row]
+    worst = np.maximum(worst, 0.0)
+    feasible = (worst <= tol) & ~negative
+    worst_row[worst <= tol] = -1
+    row_counts = np.bincount(ev.origin, weights=counts, minlength=compiled.n_rows).astype(np.int64)
+    return {"feasible": feasible, "worst": worst, "worst_row": worst_row, "cost": cost, "row_counts": row_counts}
+
+
+def family_violations(compiled, violated):
+    """Collapse a K x n_rows ``violated`` array to K x n_families counts, in ``compiled.families`` order."""
+    violated = np.atleast_2d(violated)
+    total = np.zeros((violated.shape[0], violated.shape[1] + 1), dtype=np.int64)
+    np.cumsum(violated, axis=1, out=total[:, 1:])
+    starts = np.array([fam.start for fam in compiled.families], dtype=np.int64)
+    stops = np.array([fam.stop for fam in compiled.families], dtype=np.int64)
+    return total[:, stops] - total[:, starts]
+
+
+def format_violations(compiled, result, candidate=0, limit=50):
+    """Render the violated rows of one candidate of an ``evaluate`` result."""
+    names = compiled.row_names()
+    rows = np.flatnonzero(result["violated"][candidate])
+    symbol = {wm.LE: "<=", wm.EQ: "==", wm.GE: ">="}
+    if not rows.size:
+        return "candidate %d: no condition violated (Total_Cost = %.6f)" % (candidate, result["cost"][candidate])
+    lines = ["candidate %d: %d rows violated (Total_Cost = %.6f)" % (
+        candidate, rows.size, result["cost"][candidate])]
+    lines.append("%-45s %5s %14s %2s %14s %14s" % ("constraint", "cond", "activity", "", "rhs", "violation"))
+    condition = np.concatenate([np.full(len(fam), fam.condition) for fam in compiled.families])
+    order = rows[np.argsort(-result["violation"][candidate, rows])]
+    for r in order[:limit]:
+        lines.append("%-45s %5d %14.6g %2s %14.6g %14.6g" % (
+            names[r], condition[r], result["activity"][candidate, r], symbol[int(compiled.sense[r])],
+            compiled.rhs[r], result["violation"][candidate, r]))
+    if rows.size > limit:
+        lines.append("... %d more" % (rows.size - limit))
+    return "\n".join(lines)